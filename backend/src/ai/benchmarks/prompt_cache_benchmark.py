@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import statistics
+from api.config.ai_config import ai_client, ai_model, ai_num_ctx, ai_keep_alive
+from ai.models.prompt.sdg_label_prompt import sdg_label_prompt, sdg_label_messages
+from ai.models.prompt.sdg_citation_prompt import sdg_citation_prompt, sdg_citation_messages
+
+
+DEFAULT_TESTSET_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "testsets", "testset_v3_en_labeled.jsonl")
+
+# "generate": one prompt with the text in the middle of the instructions, the previous calling mode
+# "chat": a fixed system prompt followed by the text, with keep-alive
+MODES = ["generate", "chat"]
+
+
+def load_texts(path: str, count: int) -> list[str]:
+    """
+    Loads the texts of the benchmark from a test set.
+
+    Args:
+        path (str): The path of a JSONL test set with a `description_text` field.
+        count (int): The number of texts.
+
+    Returns:
+        list[str]: The texts.
+    """
+    texts = []
+    with open(path) as f:
+        for line in f:
+            texts.append(json.loads(line)["description_text"])
+            if len(texts) == count:
+                break
+    return texts
+
+
+def run_request(mode: str, step: str, text: str, sdg: str, prompt_name: str, num_ctx: int, keep_alive: str, num_predict: int) -> dict:
+    """
+    Sends a classification or citation request and measures its prompt evaluation.
+
+    Args:
+        mode (str): "generate" or "chat", see `MODES`.
+        step (str): "classification" or "citation".
+        text (str): The analyzed text.
+        sdg (str): The SDG of a citation.
+        prompt_name (str): The name of the classification prompt.
+        num_ctx (int): The context size, identical in both modes so that only the layout differs.
+        keep_alive (str): The keep-alive duration of the "chat" mode.
+        num_predict (int): The maximum number of generated tokens.
+
+    Returns:
+        dict: The number of evaluated prompt tokens and the durations in milliseconds.
+    """
+    options = {"temperature": 0.2, "num_ctx": num_ctx,
+               "num_predict": num_predict}
+
+    if mode == "generate":
+        prompt = sdg_label_prompt(
+            prompt_name, text) if step == "classification" else sdg_citation_prompt(text, sdg)
+        response = ai_client.generate(
+            model=ai_model, prompt=prompt, options=options)
+    else:
+        messages = sdg_label_messages(
+            prompt_name, text) if step == "classification" else sdg_citation_messages(text, sdg)
+        response = ai_client.chat(
+            model=ai_model, messages=messages, options=options, keep_alive=keep_alive)
+
+    return {
+        "mode": mode,
+        "step": step,
+        "sdg": sdg,
+        "prompt_eval_count": response["prompt_eval_count"] or 0,
+        "prompt_eval_ms": (response["prompt_eval_duration"] or 0) / 1e6,
+        "load_ms": (response["load_duration"] or 0) / 1e6,
+        "total_ms": (response["total_duration"] or 0) / 1e6,
+    }
+
+
+def summarize(results: list[dict]) -> list[dict]:
+    """
+    Summarizes the prompt evaluation of the requests by mode and step.
+
+    Args:
+        results (list[dict]): The results of `run_request`.
+
+    Returns:
+        list[dict]: The number of requests and the mean evaluated tokens and durations of each mode and step.
+    """
+    summary = []
+    for mode in MODES:
+        for step in ["classification", "citation"]:
+            requests = [result for result in results if result["mode"]
+                        == mode and result["step"] == step]
+            if not requests:
+                continue
+            prompt_eval_ms = [result["prompt_eval_ms"] for result in requests]
+            summary.append({
+                "mode": mode,
+                "step": step,
+                "requests": len(requests),
+                "prompt_eval_count": round(statistics.mean(result["prompt_eval_count"] for result in requests)),
+                "prompt_eval_ms": round(statistics.mean(prompt_eval_ms), 1),
+                "prompt_eval_ms_median": round(statistics.median(prompt_eval_ms), 1),
+                "total_ms": round(statistics.mean(result["total_ms"] for result in requests), 1),
+            })
+    return summary
+
+
+def main():
+    """
+    Command line entry point of the benchmark, run from `backend/src`, e.g.:
+    `python -m ai.benchmarks.prompt_cache_benchmark --texts 20 --sdgs SDG7,SDG13`
+
+    Each text is classified and then cited for each SDG, first with the previous
+    single prompt layout and then with the chat layout. A small `--num-predict`
+    restricts the durations to the evaluation of the prompts.
+    """
+    parser = argparse.ArgumentParser(
+        description="Compare the prompt evaluation time of the single prompt and chat layouts.")
+    parser.add_argument("--testset", type=str, default=DEFAULT_TESTSET_PATH,
+                        help="JSONL test set with a description_text field.")
+    parser.add_argument("--texts", type=int, default=10,
+                        help="Number of texts of the test set.")
+    parser.add_argument("--sdgs", type=str, default="SDG7,SDG13",
+                        help="Comma separated SDGs of the citations, empty to only classify.")
+    parser.add_argument("--prompt-name", type=str, default="sdg_label_prompt",
+                        help="Name of the classification prompt.")
+    parser.add_argument("--num-ctx", type=int, default=ai_num_ctx,
+                        help="Context size of the requests.")
+    parser.add_argument("--keep-alive", type=str, default=ai_keep_alive,
+                        help="Keep-alive duration of the chat requests.")
+    parser.add_argument("--num-predict", type=int, default=1,
+                        help="Maximum number of generated tokens.")
+    parser.add_argument("--output", type=str, default=None,
+                        help="JSONL file of the results of each request.")
+    args = parser.parse_args()
+
+    texts = load_texts(args.testset, args.texts)
+    sdgs = [sdg for sdg in args.sdgs.split(",") if sdg]
+
+    results = []
+    for mode in MODES:
+        for text in texts:
+            for step, sdg in [("classification", None)] + [("citation", sdg) for sdg in sdgs]:
+                result = run_request(mode, step, text, sdg, args.prompt_name,
+                                     args.num_ctx, args.keep_alive, args.num_predict)
+                results.append(result)
+                print(f"{mode:<9} {step:<15} {sdg or '':<6} {result['prompt_eval_count']:>6} tokens "
+                      f"{result['prompt_eval_ms']:>9.1f} ms prompt eval {result['load_ms']:>8.1f} ms load")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+
+    print()
+    for row in summarize(results):
+        print(f"{row['mode']:<9} {row['step']:<15} {row['requests']:>4} requests, {row['prompt_eval_count']:>6} tokens evaluated, "
+              f"{row['prompt_eval_ms']:>9.1f} ms prompt eval (median {row['prompt_eval_ms_median']:.1f} ms), {row['total_ms']:>9.1f} ms total")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 import re
 import os
-from typing import Tuple, List, Any  # Added Any for the client type
+import threading
+from typing import Callable, Tuple, List, Any  # Added Any for the client type
 from api.config.logging_config import logger
-from ai.models.prompt.sdg_citation_prompt import sdg_citation_prompt
+from ai.models.prompt.sdg_citation_prompt import sdg_citation_prompt_parts, sdg_short_description, SDG_CITATION_PROMPT_VERSION
 
 
 class CitationPatent():
@@ -10,10 +11,15 @@ class CitationPatent():
     A class to generate citations and explanations for patents based on Sustainable Development Goals (SDGs).
 
     This class interacts with a language model to analyze patent text and identify relevant
-    citations and explanations linked to a specific SDG.
+    citations and explanations linked to a specific SDG. The static parts of the
+    prompts of the SDGs are rendered once, when the instance is created, and the
+    system prompt is the same for every SDG.
+
+    An instance holds no state of an analysis and can be shared between threads,
+    see `api.services.model_registry`.
     """
 
-    def __init__(self, client: Any, model_name: str, temperature: float = 0.2, max_tokens: int = 20000):
+    def __init__(self, client: Any, model_name: str, temperature: float = 0.2, max_tokens: int = 20000, cache: Any = None, num_ctx: int = None, keep_alive: str = None):
         """
         Initializes the CitationPatent class.
 
@@ -26,11 +32,25 @@ class CitationPatent():
                                            Defaults to 0.2.
             max_tokens (int, optional): The maximum number of tokens to generate in the response.
                                         Defaults to 20000.
+            cache (InferenceCache, optional): The cache of the responses of the model,
+                                              see `api.services.inference_cache`.
+                                              Responses are not cached if None.
+            num_ctx (int, optional): The context size of the model, the server default if None.
+            keep_alive (str, optional): How long the server keeps the model loaded after a
+                                        request (e.g. "30m"), the server default if None.
         """
         self.model_name: str = model_name
         self.client: Any = client
         self.temperature: float = temperature
         self.max_tokens: int = max_tokens
+        self.cache: Any = cache
+        self.num_ctx: int = num_ctx
+        self.keep_alive: str = keep_alive
+        # Token usage of the requests sent by the instance, see `get_usage`
+        self._usage_lock = threading.Lock()
+        self._usage = {"requests": 0, "prompt_tokens": 0, "generated_tokens": 0}
+        self.prompt_parts: dict = {sdg: sdg_citation_prompt_parts(sdg)
+                                   for sdg in sdg_short_description}
 
     def _get_citation_explanation(self, text: str) -> Tuple[str, str]:
         """
@@ -96,7 +116,72 @@ class CitationPatent():
 
         return summary_content, formatted_citations_explanations
 
-    def generate_response(self, patent_text: str, sdg: str, reason: str) -> Tuple[str, str]:
+    def _generate(self, messages: List[dict], on_token: Callable[[str], None] = None) -> str:
+        """
+        Sends chat messages to the language model and returns its whole response.
+
+        The model is kept loaded for `keep_alive` and always run with the same
+        context size, so that the server neither reloads it nor re-evaluates the
+        system prompt shared by the requests.
+
+        Args:
+            messages (List[dict]): The system and user messages.
+            on_token (Callable[[str], None], optional): Called with each chunk of
+                the response as it is generated. The response is not streamed if None.
+
+        Returns:
+            str: The response of the model.
+        """
+        options = {"temperature": self.temperature,
+                   "max_tokens": self.max_tokens}
+        if self.num_ctx:
+            options["num_ctx"] = self.num_ctx
+
+        if on_token is None:
+            output = self.client.chat(
+                model=self.model_name,
+                messages=messages,
+                options=options,
+                keep_alive=self.keep_alive
+            )
+            self._record_usage(output)
+            return output["message"]["content"].strip()
+
+        chunks = []
+        for chunk in self.client.chat(model=self.model_name, messages=messages, options=options, keep_alive=self.keep_alive, stream=True):
+            token = chunk["message"]["content"]
+            if token:
+                chunks.append(token)
+                on_token(token)
+            if chunk.get("done"):
+                self._record_usage(chunk)
+        return "".join(chunks).strip()
+
+    def _record_usage(self, output) -> None:
+        """
+        Adds the token counts of a response to the usage of the instance.
+
+        Args:
+            output: The final response of the model, with its `prompt_eval_count` and `eval_count`.
+        """
+        with self._usage_lock:
+            self._usage["requests"] += 1
+            self._usage["prompt_tokens"] += output.get("prompt_eval_count") or 0
+            self._usage["generated_tokens"] += output.get("eval_count") or 0
+
+    def get_usage(self) -> dict:
+        """
+        Gets the token usage of the requests sent by the instance since its creation.
+
+        Cached responses are not counted.
+
+        Returns:
+            dict: The number of requests, of evaluated prompt tokens and of generated tokens.
+        """
+        with self._usage_lock:
+            return dict(self._usage)
+
+    def generate_response(self, patent_text: str, sdg: str, reason: str, on_token: Callable[[str], None] = None, refresh: bool = False) -> Tuple[str, str]:
         """
         Generates a citation and explanation for a given patent text and SDG.
 
@@ -107,6 +192,9 @@ class CitationPatent():
         Args:
             patent_text (str): The text of the patent to be analyzed.
             sdg (str): The Sustainable Development Goal to which the patent relates.
+            on_token (Callable[[str], None], optional): Called with each generated chunk, see `_generate`.
+            refresh (bool, optional): Ask the model again instead of reading the inference
+                cache, whose entry is then replaced by the new response.
 
         Returns:
             Tuple[str, str]: A tuple containing the generated citation string
@@ -116,30 +204,31 @@ class CitationPatent():
             f"Generating response for SDG: {sdg} with reason: {reason}")
 
         if sdg != "None":
-            formatted_prompt: str = sdg_citation_prompt(patent_text, sdg)
-            # Assuming self.client.generate returns a dictionary-like object
-            # with a 'response' key, or a string directly.
-            output: Any = self.client.generate(
-                model=self.model_name,
-                prompt=formatted_prompt,
-                options={"temperature": self.temperature,
-                         "max_tokens": self.max_tokens}
-            )
-            # Handle different possible output types from self.client.generate
-            response: str
-            if isinstance(output, dict):
-                response = output.get('response', '').strip()
-            elif isinstance(output, str):
-                response = output.strip()
+            cache_key = (self.model_name, "sdg_citation_prompt",
+                         SDG_CITATION_PROMPT_VERSION, self.temperature, patent_text, sdg)
+            response: str = self.cache.get(
+                *cache_key) if self.cache is not None and not refresh else None
+            cached = response is not None
+
+            if cached:
+                logger.debug(f"Citation for {sdg} found in the inference cache")
+                if on_token is not None:
+                    on_token(response)
             else:
-                # Fallback for unexpected output types
-                logger.warning(
-                    f"Unexpected output type from LLM client: {type(output)}. Converting to string.")
-                response = str(output).strip()
+                system_prompt, user_prefix, user_suffix = self.prompt_parts[sdg]
+                messages: List[dict] = [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prefix + patent_text + user_suffix},
+                ]
+                response = self._generate(messages, on_token)
 
             summary_content, formatted_citations_explanations = self._get_citation_explanation(
                 response)
 
+            # Only cache the new responses from which citations could be extracted
+            if self.cache is not None and not cached and formatted_citations_explanations:
+                self.cache.set(*cache_key, response)
+
         # If not a SDG the previous model already made an explanation
         else:
             summary_content, formatted_citations_explanations = reason, ""
@@ -147,7 +236,7 @@ class CitationPatent():
         return summary_content, formatted_citations_explanations
 
     # Modified to return str for citation_content based on _get_citation_explanation
-    def citation(self, patent_text: str, sdg: str, reason: str) -> Tuple[str, str]:
+    def citation(self, patent_text: str, sdg: str, reason: str, on_token: Callable[[str], None] = None, refresh: bool = False) -> Tuple[str, str]:
         """
         Provides a citation and explanation for a patent concerning a specific SDG.
 
@@ -158,6 +247,10 @@ class CitationPatent():
         Args:
             patent_text (str): The text of the patent.
             sdg (str): The Sustainable Development Goal.
+            on_token (Callable[[str], None], optional): Called with each chunk of the
+                response as it is generated, e.g. to stream it to a client.
+            refresh (bool, optional): Ask the model again even if the citation is in the
+                inference cache, see `generate_response`.
 
         Returns:
             Tuple[str, str]: A tuple where the first element is the citation string
@@ -168,7 +261,7 @@ class CitationPatent():
         logger.debug(
             f"Generating citation for SDG: {sdg} with reason: {reason}")
         summary_content, formatted_citations_explanations = self.generate_response(
-            patent_text, sdg, reason)
+            patent_text, sdg, reason, on_token, refresh)
         logger.debug(f"Citation: {summary_content}")
         logger.debug(f"Explanation: {formatted_citations_explanations}")
 
@@ -1,8 +1,9 @@
 import re
 import os
-from typing import Tuple, List
+import threading
+from typing import Callable, Tuple, List
 from api.config.logging_config import logger
-from ai.models.prompt.sdg_label_prompt import sdg_label_prompt
+from ai.models.prompt.sdg_label_prompt import sdg_label_prompt_parts, SDG_LABEL_PROMPT_VERSION
 
 
 class ClassifyPatent():
@@ -11,25 +12,40 @@ class ClassifyPatent():
 
     This class uses a language model to analyze patent descriptions and
     extract the SDGs they pertain to, along with a justification for the
-    classification. It reads a prompt template from a file, formats it
-    with the patent text, and then queries a specified model.
+    classification. The static parts of the prompt are rendered once: the
+    instructions are sent as the system prompt and the patent text as the user
+    message to a specified model.
+
+    An instance holds no state of an analysis and can be shared between threads,
+    see `api.services.model_registry`.
     """
 
-    def __init__(self, client, model_name: str, prompt_name: str, temperature=0.2, max_tokens=20000):
+    def __init__(self, client, model_name: str, prompt_name: str, temperature=0.2, max_tokens=20000, cache=None, num_ctx=None, keep_alive=None):
         """Initializes the ClassifyPatent instance.
 
         Args:
             client: The client object used to interact with the language model.
             model_name (str): The name or identifier of the language model to be used.
-            prompt_template_path (str): The file path to the prompt template.
-                This template should contain a placeholder "{description}"
-                which will be replaced by the patent text.
+            prompt_name (str): The name of the prompt, see `sdg_label_prompt`.
+            cache (InferenceCache, optional): The cache of the responses of the model,
+                see `api.services.inference_cache`. Responses are not cached if None.
+            num_ctx (int, optional): The context size of the model, the server default if None.
+            keep_alive (str, optional): How long the server keeps the model loaded after a
+                request (e.g. "30m"), the server default if None.
         """
         self.prompt_name = prompt_name
         self.model_name = model_name
         self.client = client
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.cache = cache
+        self.num_ctx = num_ctx
+        self.keep_alive = keep_alive
+        # Token usage of the requests sent by the instance, see `get_usage`
+        self._usage_lock = threading.Lock()
+        self._usage = {"requests": 0, "prompt_tokens": 0, "generated_tokens": 0}
+        self.system_prompt, self.user_prefix, self.user_suffix = sdg_label_prompt_parts(
+            prompt_name)
 
     def _get_sdg_reason(self, text: str) -> Tuple[str, str]:
         """Extracts SDG (Sustainable Development Goal) and reason from a text.
@@ -124,7 +140,72 @@ class ClassifyPatent():
 
         return ["None"] if not result else result
 
-    def generate_response(self, patent_text: str) -> Tuple[str, str]:
+    def _generate(self, messages: List[dict], on_token: Callable[[str], None] = None) -> str:
+        """
+        Sends chat messages to the language model and returns its whole response.
+
+        The model is kept loaded for `keep_alive` and always run with the same
+        context size, so that the server neither reloads it nor re-evaluates the
+        system prompt shared by the requests.
+
+        Args:
+            messages (List[dict]): The system and user messages.
+            on_token (Callable[[str], None], optional): Called with each chunk of
+                the response as it is generated. The response is not streamed if None.
+
+        Returns:
+            str: The response of the model.
+        """
+        options = {"temperature": self.temperature,
+                   "max_tokens": self.max_tokens}
+        if self.num_ctx:
+            options["num_ctx"] = self.num_ctx
+
+        if on_token is None:
+            output = self.client.chat(
+                model=self.model_name,
+                messages=messages,
+                options=options,
+                keep_alive=self.keep_alive
+            )
+            self._record_usage(output)
+            return output["message"]["content"].strip()
+
+        chunks = []
+        for chunk in self.client.chat(model=self.model_name, messages=messages, options=options, keep_alive=self.keep_alive, stream=True):
+            token = chunk["message"]["content"]
+            if token:
+                chunks.append(token)
+                on_token(token)
+            if chunk.get("done"):
+                self._record_usage(chunk)
+        return "".join(chunks).strip()
+
+    def _record_usage(self, output) -> None:
+        """
+        Adds the token counts of a response to the usage of the instance.
+
+        Args:
+            output: The final response of the model, with its `prompt_eval_count` and `eval_count`.
+        """
+        with self._usage_lock:
+            self._usage["requests"] += 1
+            self._usage["prompt_tokens"] += output.get("prompt_eval_count") or 0
+            self._usage["generated_tokens"] += output.get("eval_count") or 0
+
+    def get_usage(self) -> dict:
+        """
+        Gets the token usage of the requests sent by the instance since its creation.
+
+        Cached responses are not counted.
+
+        Returns:
+            dict: The number of requests, of evaluated prompt tokens and of generated tokens.
+        """
+        with self._usage_lock:
+            return dict(self._usage)
+
+    def generate_response(self, patent_text: str, on_token: Callable[[str], None] = None, refresh: bool = False) -> Tuple[str, str]:
         """
         Generates a response from the language model for a given patent text.
 
@@ -134,26 +215,38 @@ class ClassifyPatent():
 
         Args:
             patent_text (str): The text of the patent to be analyzed.
+            on_token (Callable[[str], None], optional): Called with each generated chunk, see `_generate`.
+            refresh (bool, optional): Ask the model again instead of reading the inference
+                cache, whose entry is then replaced by the new response.
 
         Returns:
             Tuple[str, str]: A tuple containing:
                 - The content extracted from the <sdg> tag in the model's response.
                 - The content extracted from the <reason> tag in the model's response.
         """
-        formatted_prompt = sdg_label_prompt(self.prompt_name, patent_text)
-        # Assuming self.client.generate returns a dictionary-like object
-        # with a 'response' key.
-        output = self.client.generate(
-            model=self.model_name,
-            prompt=formatted_prompt,
-            options={"temperature": self.temperature,
-                     "max_tokens": self.max_tokens}  # Example option
-        )
-        response = output.get('response', '').strip() if isinstance(
-            output, dict) else str(output).strip()
-        return self._get_sdg_reason(response)
-
-    def analyze_patent(self, patent_text: str) -> Tuple[List[str], str]:
+        cache_key = (self.model_name, self.prompt_name,
+                     SDG_LABEL_PROMPT_VERSION, self.temperature, patent_text)
+        if self.cache is not None and not refresh:
+            response = self.cache.get(*cache_key)
+            if response is not None:
+                logger.debug("Classification found in the inference cache")
+                if on_token is not None:
+                    on_token(response)
+                return self._get_sdg_reason(response)
+
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": self.user_prefix + patent_text + self.user_suffix},
+        ]
+        response = self._generate(messages, on_token)
+        sdg_content, reason = self._get_sdg_reason(response)
+
+        # Only cache the responses from which SDGs could be extracted
+        if self.cache is not None and sdg_content:
+            self.cache.set(*cache_key, "", response)
+        return sdg_content, reason
+
+    def analyze_patent(self, patent_text: str, on_token: Callable[[str], None] = None, refresh: bool = False) -> Tuple[List[str], str]:
         """
         Classifies a patent text to determine relevant SDGs and the reasoning.
 
@@ -163,6 +256,10 @@ class ClassifyPatent():
 
         Args:
             patent_text (str): The text of the patent to classify.
+            on_token (Callable[[str], None], optional): Called with each chunk of the
+                response as it is generated, e.g. to stream it to a client.
+            refresh (bool, optional): Ask the model again even if the classification is in
+                the inference cache, see `generate_response`.
 
         Returns:
             Tuple[List[str], str]: A tuple containing:
@@ -171,7 +268,8 @@ class ClassifyPatent():
                 - A string containing the reason for the classification.
         """
         logger.debug(f"Analyzing patent text: {patent_text[:100]}...")
-        sdg_tag_content, reason = self.generate_response(patent_text)
+        sdg_tag_content, reason = self.generate_response(
+            patent_text, on_token, refresh)
         logger.debug(f"SDG Tag Content: {sdg_tag_content}")
         list_sdg = self._extract_sdgs(sdg_tag_content)
 
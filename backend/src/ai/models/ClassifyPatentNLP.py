@@ -1,4 +1,5 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
+import torch
 from transformers import pipeline
 from api.config.ai_config import ai_huggingface_token
 
@@ -6,7 +7,7 @@ class ClassifyPatentNLP():
     """
     Example concrete implementation of Model_base.
     """
-    def __init__(self, ai_huggingface_token: str, model_name):
+    def __init__(self, ai_huggingface_token: str, model_name, hypothesis_template: str = "This example is {}."):
         # Initialize the classifier once with explicit task specification
         self.model_name = model_name
         
@@ -40,13 +41,102 @@ class ClassifyPatentNLP():
         
         # Precompute candidate label values
         self.candidate_label_values = list(self.sdg_labels_dict.values())
+        self.sdg_codes = list(self.sdg_labels_dict.keys())
+        self.sdg_codes_by_label = {text: code for code, text in self.sdg_labels_dict.items()}
+
+        # Pre-tokenize the hypotheses of the pipeline once, see `classify_batch`
+        self.hypothesis_template = hypothesis_template
+        tokenizer = self.classifier.tokenizer
+        self.hypothesis_ids = [
+            tokenizer(hypothesis_template.format(label), add_special_tokens=False)["input_ids"]
+            for label in self.candidate_label_values
+        ]
+        # Same truncation of the premise as the zero-shot pipeline
+        self.max_length = tokenizer.model_max_length
+        # Same entailment label lookup as the zero-shot pipeline
+        self.entailment_id = next(
+            (index for label, index in self.classifier.model.config.label2id.items()
+             if label.lower().startswith("entail")), -1)
 
     def get_sdg_code_from_label(self, label: str) -> str:
         """Reverse lookup SDG code from full label text."""
-        for code, text in self.sdg_labels_dict.items():
-            if label == text:
-                return code
-        return "None"
+        return self.sdg_codes_by_label.get(label, "None")
+
+    def _prepare_pairs(self, premise_ids: List[int]) -> List[dict]:
+        """
+        Pairs a tokenized description with each hypothesis, as the zero-shot pipeline does.
+
+        Args:
+            premise_ids (List[int]): The token ids of the description, without special tokens.
+
+        Returns:
+            List[dict]: The model inputs of the pair of each SDG, the description being truncated.
+        """
+        tokenizer = self.classifier.tokenizer
+        return [tokenizer.prepare_for_model(premise_ids, hypothesis, truncation="only_first", max_length=self.max_length)
+                for hypothesis in self.hypothesis_ids]
+
+    def classify_batch(self, descriptions: List[str], batch_size: int = 8) -> List[Dict[str, float]]:
+        """
+        Scores many descriptions against the 17 SDGs.
+
+        Gives the scores of the zero-shot pipeline (softmax of the entailment
+        logits over the SDGs), but tokenizes each description once, pairs it with
+        the pre-tokenized hypotheses and runs the premise/hypothesis pairs of
+        `batch_size` descriptions in a single forward pass. The descriptions are
+        sorted by length so that a batch holds little padding.
+
+        Args:
+            descriptions (List[str]): The descriptions to classify.
+            batch_size (int, optional): The number of descriptions of a forward pass,
+                each with 17 pairs. Defaults to 8.
+
+        Returns:
+            List[Dict[str, float]]: The score of each SDG code for each description, in the input order.
+        """
+        if not descriptions:
+            return []
+
+        tokenizer = self.classifier.tokenizer
+        model = self.classifier.model
+        premise_ids = tokenizer(descriptions, add_special_tokens=False)["input_ids"]
+        order = sorted(range(len(descriptions)), key=lambda index: len(premise_ids[index]))
+
+        results = [None] * len(descriptions)
+        with torch.inference_mode():
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                features = [pair for index in batch for pair in self._prepare_pairs(premise_ids[index])]
+                inputs = tokenizer.pad(features, return_tensors="pt").to(model.device)
+                entailment_logits = model(**inputs).logits[:, self.entailment_id]
+                scores = entailment_logits.view(len(batch), len(self.sdg_codes)).softmax(dim=-1).tolist()
+                for index, row in zip(batch, scores):
+                    results[index] = dict(zip(self.sdg_codes, row))
+
+        return results
+
+    def classify_descriptions(self, descriptions: List[str], threshold=0.18, batch_size: int = 8) -> List[str]:
+        """
+        Batched variant of `classify_description`, e.g. to label a test set.
+
+        Args:
+            descriptions (List[str]): The descriptions to classify.
+            threshold (float, optional): The minimum score of the predicted SDG. Defaults to 0.18.
+            batch_size (int, optional): See `classify_batch`. Defaults to 8.
+
+        Returns:
+            List[str]: The most relevant SDG code of each description, "None" below the threshold
+                or for descriptions of 20 words or less.
+        """
+        predictions = ["None"] * len(descriptions)
+        indexes = [index for index, description in enumerate(descriptions) if len(description.split()) > 20]
+
+        for index, scores in zip(indexes, self.classify_batch([descriptions[index] for index in indexes], batch_size)):
+            sdg_code, score = max(scores.items(), key=lambda item: item[1])
+            if score >= threshold:
+                predictions[index] = sdg_code
+
+        return predictions
 
     def classify_description(self, description: str, threshold=0.18) -> str:
         """
@@ -57,7 +147,8 @@ class ClassifyPatentNLP():
         # If desc size > 20 words
         if len(description.split()) > 20:
             try:
-                result = self.classifier(description, candidate_labels=self.candidate_label_values)
+                result = self.classifier(description, candidate_labels=self.candidate_label_values,
+                                         hypothesis_template=self.hypothesis_template)
                 
                 if result["scores"][0] >= threshold:
                     top_label = result["labels"][0]
@@ -67,4 +158,40 @@ class ClassifyPatentNLP():
                 print(f"Model: {self.model_name}")
                 sdg_pred = "Error"
                 
-        return sdg_pred
\ No newline at end of file
+        return sdg_pred
+
+
+if __name__ == "__main__":
+    import json
+    import os
+    import sys
+
+    # Parity check of `classify_batch` with the zero-shot pipeline, on short and long
+    # (truncated) descriptions of a test set, e.g.:
+    # `python -m ai.models.ClassifyPatentNLP facebook/bart-large-mnli`
+    model_name = sys.argv[1] if len(sys.argv) > 1 else "facebook/bart-large-mnli"
+    testset_path = os.path.join(os.path.dirname(__file__), "..", "testsets", "testset_v3_en_labeled.jsonl")
+    with open(testset_path) as f:
+        texts = [json.loads(line)["description_text"] for line in f]
+    descriptions = texts[:12] + sorted(texts, key=lambda text: len(text.split()))[-4:]
+
+    classifier = ClassifyPatentNLP(ai_huggingface_token, model_name)
+    tokenizer = classifier.classifier.tokenizer
+    batch_scores = classifier.classify_batch(descriptions)
+
+    max_difference = 0.0
+    for description, scores in zip(descriptions, batch_scores):
+        # Same inputs as the pipeline, including the truncation of the long descriptions
+        pipeline_ids = tokenizer([[description, classifier.hypothesis_template.format(label)]
+                                  for label in classifier.candidate_label_values], truncation="only_first")["input_ids"]
+        premise_ids = tokenizer(description, add_special_tokens=False)["input_ids"]
+        assert [pair["input_ids"] for pair in classifier._prepare_pairs(premise_ids)] == pipeline_ids, \
+            "classify_batch inputs differ from the zero-shot pipeline"
+
+        result = classifier.classifier(description, candidate_labels=classifier.candidate_label_values,
+                                       hypothesis_template=classifier.hypothesis_template)
+        for label, score in zip(result["labels"], result["scores"]):
+            max_difference = max(max_difference, abs(scores[classifier.get_sdg_code_from_label(label)] - score))
+
+    print(f"{model_name}: {len(descriptions)} descriptions, max score difference {max_difference:.2e}")
+    assert max_difference < 1e-4, "classify_batch differs from the zero-shot pipeline"
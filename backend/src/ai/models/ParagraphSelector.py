@@ -0,0 +1,133 @@
+import math
+import re
+from collections import Counter
+from typing import List
+from api.config.logging_config import logger
+from ai.models.prompt.sdg_citation_prompt import sdg_description
+
+
+# Words of at least 3 letters, in any language
+WORD_PATTERN = re.compile(r"[^\W\d_]{3,}")
+
+# Frequent english words which carry no meaning for the SDGs
+STOP_WORDS = frozenset("""
+about above after again also among and any are been before being below between both but can could
+during each either for from further had has have having here how into its may might more most
+much must not now only other our out over same should since some such than that the their them
+then there these they this those through thus under until upon very was were what when where
+which while who whom why will with within without would
+""".split())
+
+
+class ParagraphSelector():
+    """
+    Selects the paragraphs of a patent which are the most related to the SDGs.
+
+    Each paragraph is scored with BM25 against the targets and example
+    innovations of each SDG, and keeps its best score. The best paragraphs
+    are then selected within a word budget, so that the language model reads
+    the relevant parts of a long description instead of its first paragraphs.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """Initializes the paragraph selector.
+
+        Args:
+            k1 (float, optional): The term frequency saturation of BM25. Defaults to 1.5.
+            b (float, optional): The length normalization of BM25. Defaults to 0.75.
+        """
+        self.k1 = k1
+        self.b = b
+        # The terms of the descriptions of the SDGs, tokenized once
+        self.sdg_terms = {sdg: frozenset(self._tokenize(description))
+                          for sdg, description in sdg_description.items()}
+
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        """
+        Splits a text into lower-cased terms, without stop words and plural marks.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            List[str]: The terms of the text.
+        """
+        terms = []
+        for word in WORD_PATTERN.findall(text.lower()):
+            if word in STOP_WORDS:
+                continue
+            if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+                word = word[:-1]
+            terms.append(word)
+        return terms
+
+    def score(self, paragraphs: List[str]) -> List[float]:
+        """
+        Scores the paragraphs of a patent against the SDGs.
+
+        The document frequencies are computed on the paragraphs, so that the
+        terms found in most of the patent weigh less than its distinctive terms.
+
+        Args:
+            paragraphs (List[str]): The paragraphs.
+
+        Returns:
+            List[float]: The best BM25 score of each paragraph over the SDGs.
+        """
+        documents = [Counter(self._tokenize(paragraph))
+                     for paragraph in paragraphs]
+        if not documents:
+            return []
+
+        lengths = [sum(document.values()) for document in documents]
+        average_length = sum(lengths) / len(documents) or 1
+        document_frequencies = Counter(
+            term for document in documents for term in document)
+        idf = {term: math.log(1 + (len(documents) - frequency + 0.5) / (frequency + 0.5))
+               for term, frequency in document_frequencies.items()}
+
+        scores = []
+        for document, length in zip(documents, lengths):
+            normalization = self.k1 * \
+                (1 - self.b + self.b * length / average_length)
+            term_scores = {term: idf[term] * frequency * (self.k1 + 1) / (frequency + normalization)
+                           for term, frequency in document.items()}
+            scores.append(max((sum(term_score for term, term_score in term_scores.items() if term in terms)
+                               for terms in self.sdg_terms.values()), default=0.0))
+        return scores
+
+    def select(self, paragraphs: List[str], max_words: int) -> List[int]:
+        """
+        Selects the best paragraphs within a word budget.
+
+        All the paragraphs are kept if they fit in the budget. Otherwise the
+        paragraphs are taken by decreasing score, skipping those which do not
+        fit in the remaining budget.
+
+        Args:
+            paragraphs (List[str]): The paragraphs.
+            max_words (int): The maximum number of words of the selected paragraphs.
+
+        Returns:
+            List[int]: The indexes of the selected paragraphs, in their original order.
+        """
+        lengths = [len(paragraph.split()) for paragraph in paragraphs]
+        if sum(lengths) <= max_words:
+            return list(range(len(paragraphs)))
+
+        scores = self.score(paragraphs)
+        ranking = sorted(range(len(paragraphs)),
+                         key=lambda index: (-scores[index], index))
+
+        selected = []
+        words = 0
+        for index in ranking:
+            if words + lengths[index] <= max_words:
+                selected.append(index)
+                words += lengths[index]
+
+        logger.debug(
+            f"Selected {len(selected)} of {len(paragraphs)} paragraphs ({words} of {sum(lengths)} words)")
+
+        return sorted(selected)
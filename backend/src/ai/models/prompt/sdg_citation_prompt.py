@@ -1,3 +1,12 @@
+from functools import lru_cache
+
+# Version of the citation prompt, part of the key of the inference cache:
+# increment it whenever the prompt changes so that cached responses are not reused
+SDG_CITATION_PROMPT_VERSION = 2
+
+# Placeholder of the text when rendering the static parts of a prompt
+TEXT_PLACEHOLDER = "\x00text\x00"
+
 
 sdg_description = {
     "SDG1": """**SDG 1: No Poverty:** End poverty in all its forms everywhere.\nTarget 1.1 – Eradicate extreme poverty\n*Example innovations*:\nMobile micro-banking systems for low-income users\nBiometric identification tools for aid distribution\nDigital platforms for cash transfer programs\nTarget 1.2 – Reduce poverty by half for all\n*Example innovations*:\nJob-matching platforms tailored for informal workers\nTools for measuring multidimensional poverty indicators\nAffordable rural housing construction kits\nTarget 1.3 – Implement social protection systems\n*Example innovations*:\nBlockchain systems for secure social benefit disbursement\nInsurance platforms for informal workers\nMobile registration systems for pension schemes\nTarget 1.4 – Ensure access to basic services and property rights\n*Example innovations*:\nLand registration systems using geospatial blockchain\nCommunity-managed utility service platforms\nPortable water filtration and delivery systems\nTarget 1.5 – Build resilience to economic, social, and environmental shocks\n*Example innovations*:\nEarly warning systems for natural disasters in low-income areas\nCrop insurance via satellite monitoring\nCommunity-based risk assessment and response platforms\nTarget 1.a – Mobilize resources to end poverty\n*Example innovations*:\nOpen-data platforms for aid transparency\nAI-driven tools for identifying funding gaps in poverty programs\nDonor coordination dashboards for NGOs\nTarget 1.b – Pro-poor and gender-sensitive policy tools\n*Example innovations*:\nSimulation tools for poverty policy impact analysis\nDigital inclusion programs for women entrepreneurs\nApps promoting civic engagement for marginalized groups""",
@@ -63,7 +72,8 @@ sdg_short_description = {
 
 
 def sdg_citation_prompt(text, sdg):
-
+    # Single prompt with the text in the middle of the instructions, kept for the
+    # `generate` endpoint, see `sdg_citation_messages` for the chat layout
     prompt = f"""You are an AI assistant specialized in Sustainable Development Goals (SDG) analysis. Your task is to justify precisely why a given text is related to a specific SDG.
 
     ## CRITICAL INSTRUCTION: 
@@ -101,4 +111,83 @@ def sdg_citation_prompt(text, sdg):
 
     Begin your analysis now."""
 
-    return prompt
\ No newline at end of file
+    return prompt
+
+
+# System prompt of the citations, identical for every text and SDG so that the
+# language model server reuses its evaluation from one request to the next
+SDG_CITATION_SYSTEM_PROMPT = """You are an AI assistant specialized in Sustainable Development Goals (SDG) analysis. Your task is to justify precisely why a given text is related to a specific SDG.
+
+## CRITICAL INSTRUCTION:
+You MUST accept and work with the given SDG classification. Your role is NOT to evaluate or question whether the text might be better suited for another SDG. You must find and explain the connections between the text and the specified SDG only.
+
+## Instructions:
+
+1. **Analyze the provided context:**
+- The text to analyze is given within <text> </text> tags.
+- The target SDG is given within <sdg> </sdg> tags.
+
+2. **Produce a structured analysis with exactly two parts:**
+
+### Part 1 - Summary of the relationship
+Provide a summary explaining clearly and exclusively why this text is linked to the target SDG. You must focus exclusively on this SDG and never mention or suggest other SDGs, even if you think they might be more relevant.
+
+Required format: <summary>YOUR_SUMMARY</summary>
+
+### Part 2 - Relevant citations
+Identify and cite passages from the original text that demonstrate the link to the SDG. For each citation:
+- Reproduce the text exactly without modification
+- Include reference numbers [description number] if they exist
+- Add an explanation of the relevance
+
+Required format:
+<citation>EXACT_TEXT_EXCERPT</citation>
+<explanation>EXPLANATION_OF_RELEVANCE</explanation>
+
+## Quality criteria:
+- Acceptance: Fully accept the given SDG classification without question
+- Precision: Find direct and verifiable links to the specified SDG only
+- Accuracy: Faithful citations from the original text
+- Relevance: Exclusive focus on the specified SDG - do not mention other SDGs
+- Clarity: Concise and understandable explanations"""
+
+
+def sdg_citation_messages(text, sdg):
+    """
+    Builds the chat messages of the citation of a text for an SDG.
+
+    The text comes before the SDG, so that the citations of the SDGs of a
+    text share the evaluation of the system prompt and of the text.
+
+    Args:
+        text (str): The text to cite.
+        sdg (str): The SDG, e.g. "SDG7".
+
+    Returns:
+        list[dict]: The system and user messages.
+    """
+    return [
+        {"role": "system", "content": SDG_CITATION_SYSTEM_PROMPT},
+        {"role": "user", "content": f"""Text to analyze: <text>{text}</text>
+Target SDG: <sdg>{sdg_short_description[sdg]}</sdg>
+
+Begin your analysis now."""},
+    ]
+
+
+@lru_cache(maxsize=None)
+def sdg_citation_prompt_parts(sdg):
+    """
+    Renders once the static text of the citation messages of an SDG.
+
+    Args:
+        sdg (str): The SDG, e.g. "SDG7".
+
+    Returns:
+        tuple[str, str, str]: The system prompt, and the prefix and the suffix of the
+            text in the user message, see `sdg_citation_messages`.
+    """
+    system_prompt, user_prompt = (message["content"] for message in sdg_citation_messages(
+        TEXT_PLACEHOLDER, sdg))
+    user_prefix, user_suffix = user_prompt.split(TEXT_PLACEHOLDER)
+    return system_prompt, user_prefix, user_suffix
@@ -1,3 +1,17 @@
+from functools import lru_cache
+
+# Version of the classification prompts, part of the key of the inference cache:
+# increment it whenever a prompt changes so that cached responses are not reused
+SDG_LABEL_PROMPT_VERSION = 2
+
+# Placeholder of the text when rendering the static parts of a prompt
+TEXT_PLACEHOLDER = "\x00text\x00"
+
+# Start of the request in the classification prompts: the instructions before it
+# are the system prompt of the chat layout
+TEXT_REQUEST_MARKER = "The text to be classified is:"
+
+
 def sdg_label_prompt(prompt_name, description):
     if prompt_name == "sdg_label_prompt":
         prompt = f"""A conversation between User and Assistant. The user provides a text, and the Assistant classifies it 
@@ -58,4 +72,51 @@ def sdg_label_prompt(prompt_name, description):
         [{description}]
 
         Please identify the most relevant SDG(s) for this text, providing your reasoning and classification in the specified format."""
+    else:
+        raise ValueError(f"Unknown classification prompt: {prompt_name}")
     return prompt
+
+
+@lru_cache(maxsize=None)
+def sdg_label_prompt_parts(prompt_name):
+    """
+    Renders once the static text of a classification prompt, laid out as chat
+    messages: the instructions and the SDG descriptions are the system prompt,
+    identical for every text so that the language model server reuses its
+    evaluation, and the text and the request are the user message.
+
+    Args:
+        prompt_name (str): The name of the prompt.
+
+    Returns:
+        tuple[str, str, str]: The system prompt, and the prefix and the suffix of the
+            text in the user message, see `sdg_label_messages`.
+    """
+    instructions, request = sdg_label_prompt(
+        prompt_name, TEXT_PLACEHOLDER).split(TEXT_REQUEST_MARKER)
+    before_text, after_text = request.split(TEXT_PLACEHOLDER)
+    # Drop the indentation of the prompt template
+    system_prompt = "\n".join(line.strip()
+                              for line in instructions.strip().splitlines())
+    user_prefix = f"{TEXT_REQUEST_MARKER}\n{before_text.strip()}"
+    user_suffix = "\n".join(line.strip() for line in after_text.splitlines())
+    return system_prompt, user_prefix, user_suffix
+
+
+def sdg_label_messages(prompt_name, description):
+    """
+    Builds the chat messages of the classification of a text.
+
+    Args:
+        prompt_name (str): The name of the prompt.
+        description (str): The text to classify.
+
+    Returns:
+        list[dict]: The system and user messages.
+    """
+    system_prompt, user_prefix, user_suffix = sdg_label_prompt_parts(
+        prompt_name)
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prefix + description + user_suffix},
+    ]
@@ -0,0 +1,198 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from api.config.ai_config import ai_num_parallel
+from api.config.logging_config import logger
+from api.models.Patent import FullPatent
+from api.repositories import patent_repository, sdg_summary_repository
+from api.services import patent_service
+from api.services.model_registry import model_registry, DEFAULT_MODEL
+
+
+def classify_patent(patent: dict, classifier, model_citation) -> list[dict]:
+    """Classifies a patent and generates the citation of each of its SDGs.
+
+    The requests of a patent are sent one after the other, so that the number
+    of requests in flight is the number of patents analyzed concurrently.
+
+    Args:
+        patent (dict): The full patent, see `patent_repository.get_unanalyzed_patents`.
+        classifier (ClassifyPatent): The classification model.
+        model_citation (CitationPatent): The citation model.
+
+    Returns:
+        list[dict]: The SDG summaries of the patent, None if it has no text.
+    """
+    patent_text = patent_service.build_patent_text(FullPatent(**patent))
+    if not patent_text:
+        logger.warning(f"Patent {patent['number']} has no text to analyze")
+        return None
+
+    sdgs, reason = classifier.analyze_patent(patent_text)
+    return [patent_service.build_sdg_summary(patent["number"], sdg, model_citation.citation(patent_text, sdg, reason), classifier)
+            for sdg in sdgs]
+
+
+def get_throughput(stats: dict, usage: dict, elapsed: float) -> dict:
+    """Computes the throughput of a batch classification.
+
+    Args:
+        stats (dict): The number of patents analyzed.
+        usage (dict): The number of tokens evaluated and generated.
+        elapsed (float): The number of seconds since the start.
+
+    Returns:
+        dict: The patents per hour and the prompt and generated tokens per second.
+    """
+    elapsed = max(elapsed, 1e-9)
+    return {
+        "patents_per_hour": round(stats["analyzed"] * 3600 / elapsed, 1),
+        "prompt_tokens_per_second": round(usage["prompt_tokens"] / elapsed, 1),
+        "generated_tokens_per_second": round(usage["generated_tokens"] / elapsed, 1),
+    }
+
+
+def classify(limit: int = None, concurrency: int = ai_num_parallel, batch_size: int = 50, model: str = DEFAULT_MODEL, after: str = None) -> dict:
+    """Classifies the patents of the database which have not been analyzed.
+
+    The patents are read by number and analyzed by `concurrency` threads; their
+    SDG summaries are written every `batch_size` patents in a single transaction,
+    which also marks the patents as analyzed. An interrupted classification
+    therefore resumes with the patents which were not written.
+
+    Args:
+        limit (int, optional): The maximum number of patents, all of them if None.
+        concurrency (int, optional): The number of patents analyzed concurrently, which should
+            match the parallelism of Ollama. Defaults to `ai.num_parallel`.
+        batch_size (int, optional): The number of patents read and written at once. Defaults to 50.
+        model (str, optional): The name of the model configuration, see `model_registry`.
+        after (str, optional): Only classify the patents after this number.
+
+    Returns:
+        dict: The number of patents analyzed, failed and skipped, the tokens used, the throughput
+            and the highest patent number written.
+    """
+    classifier = model_registry.get_classifier(model)
+    model_citation = model_registry.get_citation_model(model)
+    usage_start = [classifier.get_usage(), model_citation.get_usage()]
+
+    stats = {"analyzed": 0, "failed": 0, "skipped": 0, "summaries": 0}
+    start = time.monotonic()
+    completed = {}
+    pending = {}
+    exhausted = False
+    submitted = 0
+    # Highest patent number written, see `write_completed`
+    last_written = None
+
+    def get_usage() -> dict:
+        usage = {"requests": 0, "prompt_tokens": 0, "generated_tokens": 0}
+        for model_instance, before in zip([classifier, model_citation], usage_start):
+            for key, value in model_instance.get_usage().items():
+                usage[key] += value - before[key]
+        return usage
+
+    def collect(future, patent_number: str) -> None:
+        try:
+            sdg_summaries = future.result()
+        except Exception as e:
+            logger.error(
+                f"Failed to classify patent {patent_number}: {e}")
+            stats["failed"] += 1
+            return
+        if sdg_summaries:
+            completed[patent_number] = sdg_summaries
+        else:
+            stats["skipped"] += 1
+
+    def write_completed() -> None:
+        nonlocal last_written
+        if not completed:
+            return
+        sdg_summary_repository.replace_sdg_summaries_batch(completed)
+        batch_last = max(completed)
+        last_written = batch_last if last_written is None else max(
+            last_written, batch_last)
+        stats["analyzed"] += len(completed)
+        stats["summaries"] += sum(len(summaries)
+                                  for summaries in completed.values())
+        completed.clear()
+
+        throughput = get_throughput(
+            stats, get_usage(), time.monotonic() - start)
+        logger.info(
+            f"{stats['analyzed']} patents analyzed, {stats['failed']} failed, {stats['skipped']} skipped (last written {last_written}): "
+            f"{throughput['patents_per_hour']} patents/hour, {throughput['prompt_tokens_per_second']} prompt tokens/s, "
+            f"{throughput['generated_tokens_per_second']} generated tokens/s")
+
+    executor = ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="classify")
+    try:
+        while pending or not exhausted:
+            # Read the next patents before the workers run out of patents to analyze
+            if not exhausted and len(pending) < 2 * concurrency:
+                size = batch_size if limit is None else min(
+                    batch_size, limit - submitted)
+                patents = patent_repository.get_unanalyzed_patents(
+                    after, size) if size > 0 else []
+                if not patents:
+                    exhausted = True
+                else:
+                    after = patents[-1]["number"]
+                    submitted += len(patents)
+                    for patent in patents:
+                        future = executor.submit(
+                            classify_patent, patent, classifier, model_citation)
+                        pending[future] = patent["number"]
+
+            if not pending:
+                continue
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                collect(future, pending.pop(future))
+
+            if len(completed) >= batch_size:
+                write_completed()
+    finally:
+        # Keep the patents analyzed before an interruption, including those
+        # which were still running and finished during the shutdown
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future, patent_number in pending.items():
+            if future.done() and not future.cancelled():
+                collect(future, patent_number)
+        write_completed()
+
+    usage = get_usage()
+    result = {**stats, **usage, **
+              get_throughput(stats, usage, time.monotonic() - start), "last": last_written}
+    logger.info(f"Batch classification completed: {result}")
+
+    return result
+
+
+def main():
+    """
+    Command line entry point of the batch classification, e.g.:
+    `poetry run classify --concurrency 4 --limit 10000`
+    """
+    parser = argparse.ArgumentParser(
+        description="Classify the patents of the database which have not been analyzed.")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="Maximum number of patents to classify.")
+    parser.add_argument("--concurrency", type=int, default=ai_num_parallel,
+                        help="Number of patents analyzed concurrently (should match OLLAMA_NUM_PARALLEL).")
+    parser.add_argument("--batch-size", type=int, default=50,
+                        help="Number of patents read and written at once.")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL,
+                        help=f"Model configuration, one of: {', '.join(model_registry.get_names())}.")
+    parser.add_argument("--after", type=str, default=None,
+                        help="Only classify the patents after this patent number.")
+    args = parser.parse_args()
+
+    classify(limit=args.limit, concurrency=args.concurrency,
+             batch_size=args.batch_size, model=args.model, after=args.after)
+
+
+if __name__ == "__main__":
+    main()
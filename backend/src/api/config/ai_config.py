@@ -102,7 +102,10 @@ def get_ai_config():
     Load the AI configuration and initialize the Ollama client.
 
     Returns:
-        tuple: A tuple containing the AI host, model, and client object.
+        tuple: A tuple containing the AI host, model, client object, prompt name,
+            Hugging Face token, number of parallel requests, the named model
+            configurations (see `api.services.model_registry`), the context size
+            and the keep-alive duration of the models.
 
     Raises:
         Exception: If configuration loading or client initialization fails.
@@ -116,6 +119,14 @@ def get_ai_config():
     ai_model = ai_config.get('model')
     ai_huggingface_token = ai_config.get('huggingface_token')
     prompt_name = ai_config.get('prompt_name')
+    # Should match OLLAMA_NUM_PARALLEL, the number of requests served concurrently by Ollama
+    ai_num_parallel = int(ai_config.get('num_parallel', 4))
+    # Additional model and prompt configurations by name, e.g. {"short": {"prompt_name": "sdg_label_prompt_short"}}
+    ai_models = ai_config.get('models') or {}
+    # The same context size for every request, otherwise Ollama reloads the model
+    ai_num_ctx = int(ai_config.get('num_ctx', 24576))
+    # How long Ollama keeps the model loaded, with its prompt cache, after a request
+    ai_keep_alive = ai_config.get('keep_alive', "30m")
 
     if not ai_host or not ai_model:
         raise ValueError(
@@ -124,9 +135,10 @@ def get_ai_config():
     logger.debug(f"Loaded AI configuration: host={ai_host}, model={ai_model}")
 
     ai_client = get_ai_client(ai_host)
-    return ai_host, ai_model, ai_client, prompt_name, ai_huggingface_token
+    return ai_host, ai_model, ai_client, prompt_name, ai_huggingface_token, ai_num_parallel, ai_models, ai_num_ctx, ai_keep_alive
 
 
-# On module load: initialize the AI client, ensure the model is available (download if missing)
-ai_host, ai_model, ai_client, prompt_name, ai_huggingface_token = get_ai_config()
-initialize_ollama_model(ai_model, ai_client)
+# On module load: initialize the AI client, ensure the models are available (download if missing)
+ai_host, ai_model, ai_client, prompt_name, ai_huggingface_token, ai_num_parallel, ai_models, ai_num_ctx, ai_keep_alive = get_ai_config()
+for model_name in {ai_model, *(model.get('model', ai_model) for model in ai_models.values())}:
+    initialize_ollama_model(model_name, ai_client)
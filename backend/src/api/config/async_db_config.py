@@ -0,0 +1,76 @@
+from contextlib import asynccontextmanager
+from psycopg_pool import AsyncConnectionPool
+from api.config.logging_config import logger
+from api.config.db_config import (db_host, db_port, db_name, db_user, db_password, db_pool_min_size,
+                                  db_pool_max_size, db_pool_idle_timeout, db_pool_checkout_timeout)
+
+
+# The pool is opened by the FastAPI application on startup (see `api.main`)
+async_db_pool = AsyncConnectionPool(
+    kwargs={
+        "host": db_host,
+        "port": db_port,
+        "dbname": db_name,
+        "user": db_user,
+        "password": db_password,
+    },
+    min_size=db_pool_min_size,
+    max_size=db_pool_max_size,
+    max_idle=db_pool_idle_timeout,
+    timeout=db_pool_checkout_timeout,
+    check=AsyncConnectionPool.check_connection,
+    name="cep_async",
+    open=False,
+)
+
+
+async def open_async_db_pool() -> None:
+    """
+    Open the asynchronous connection pool and wait for its minimum connections.
+
+    Raises:
+        Exception: If the connection to the database fails.
+    """
+    logger.debug(
+        f"Opening async database pool to {db_host}:{db_port}/{db_name} as user {db_user}")
+
+    try:
+        await async_db_pool.open(wait=True)
+    except Exception as e:
+        raise Exception(f"Failed to connect to the database: {e}")
+
+
+async def close_async_db_pool() -> None:
+    """
+    Close the asynchronous connection pool.
+    """
+    logger.debug("Closing async database pool")
+    await async_db_pool.close()
+
+
+@asynccontextmanager
+async def async_db_connection():
+    """
+    Borrow a connection from the asynchronous pool used by the API endpoints.
+
+    Example:
+        ```
+        async with async_db_connection() as conn:
+            cursor = await conn.execute("SELECT 1;")
+        ```
+
+    Yields:
+        psycopg.AsyncConnection: A connection to the PostgreSQL database.
+    """
+    async with async_db_pool.connection() as conn:
+        yield conn
+
+
+def get_async_pool_stats() -> dict:
+    """
+    Get the statistics of the asynchronous connection pool.
+
+    Returns:
+        dict: The pool statistics (size, available connections, waiting requests, wait time...).
+    """
+    return async_db_pool.get_stats()
@@ -1,30 +1,63 @@
 import psycopg2
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from psycopg2 import extensions
 from api.config.logging_config import logger
 from api.config.config import load_config
 
 
-def get_db_connection():
+# Load configuration once per process
+config_path = os.path.join(os.path.dirname(__file__), 'config.yaml')
+config = load_config(config_path)
+
+db_config = config.get('database', {})
+db_host = db_config.get('host')
+db_port = db_config.get('port')
+db_name = db_config.get('name')
+db_user = db_config.get('user')
+db_password = db_config.get('password')
+
+db_pool_config = db_config.get('pool', {}) or {}
+db_pool_min_size = int(db_pool_config.get('min_size', 1))
+db_pool_max_size = int(db_pool_config.get('max_size', 10))
+db_pool_idle_timeout = float(db_pool_config.get('idle_timeout', 300))
+db_pool_checkout_timeout = float(db_pool_config.get('checkout_timeout', 30))
+db_pool_health_check_after = float(
+    db_pool_config.get('health_check_after', 10))
+# Count the statements of the pooled connections, for the round-trip benchmarks
+db_pool_count_queries = bool(db_pool_config.get('count_queries', False))
+
+db_count_cache_config = db_config.get('count_cache', {}) or {}
+db_count_cache_ttl = float(db_count_cache_config.get('ttl', 60))
+db_count_cache_max_entries = int(
+    db_count_cache_config.get('max_entries', 1024))
+
+db_inference_cache_config = db_config.get('inference_cache', {}) or {}
+db_inference_cache_enabled = bool(
+    db_inference_cache_config.get('enabled', True))
+db_inference_cache_max_entries = int(
+    db_inference_cache_config.get('max_entries', 100000))
+
+
+def get_db_connection(cursor_factory=None):
     """
     Get a database connection using the provided YAML configuration.
 
+    The connection is not pooled: the caller is responsible for closing it.
+    Repositories should use `db_connection()` instead.
+
+    Args:
+        cursor_factory (type, optional): The default cursor class of the connection.
+
     Returns:
         psycopg2.extensions.connection: A connection object to the PostgreSQL database.
 
     Raises:
         Exception: If the connection fails.
     """
-    # Load configuration
-    config_path = os.path.join(os.path.dirname(__file__), 'config.yaml')
-    config = load_config(config_path)
-
-    db_config = config.get('database', {})
-    db_host = db_config.get('host')
-    db_port = db_config.get('port')
-    db_name = db_config.get('name')
-    db_user = db_config.get('user')
-    db_password = db_config.get('password')
-
     logger.debug(
         f"Connecting to database at {db_host}:{db_port}/{db_name} as user {db_user}")
 
@@ -35,9 +68,317 @@ def get_db_connection():
             port=db_port,
             dbname=db_name,
             user=db_user,
-            password=db_password
+            password=db_password,
+            cursor_factory=cursor_factory
         )
         return conn
 
     except Exception as e:
         raise Exception(f"Failed to connect to the database: {e}")
+
+
+class CountingCursor(extensions.cursor):
+    """
+    Cursor counting the statements sent to the server by pooled connections.
+
+    Only used when the pool counts its queries, as every statement then takes
+    the pool lock.
+    """
+
+    def execute(self, query, vars=None):
+        db_pool.count_query()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        db_pool.count_query()
+        return super().executemany(query, vars_list)
+
+
+class ConnectionPool():
+    """
+    Thread-safe pool of PostgreSQL connections shared by the whole process.
+
+    Connections are created lazily up to `max_size`, kept open while idle and
+    checked before being handed out. Idle connections above `min_size` are
+    closed once they have not been used for `idle_timeout` seconds.
+    """
+
+    def __init__(self, min_size: int = 1, max_size: int = 10, idle_timeout: float = 300, checkout_timeout: float = 30, health_check_after: float = 10, count_queries: bool = False):
+        """Initializes the connection pool.
+
+        Args:
+            min_size (int): The number of idle connections kept open.
+            max_size (int): The maximum number of open connections.
+            idle_timeout (float): Seconds after which an idle connection above `min_size` is closed.
+            checkout_timeout (float): Seconds to wait for a free connection before failing.
+            health_check_after (float): Seconds of inactivity after which a connection is
+                pinged before being handed out (0 to ping on every checkout).
+            count_queries (bool): Count the statements executed on the connections created
+                from now on, see `CountingCursor`. Meant for benchmarks only.
+        """
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(
+                "Invalid pool size: expected 0 <= min_size <= max_size and max_size >= 1")
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+        self.count_queries = count_queries
+
+        # Idle connections with the time they were returned to the pool
+        self._idle = deque()
+        self._size = 0
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+
+        # Monitoring counters
+        self._checkouts = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+        self._timeouts = 0
+        self._discarded = 0
+        self._queries = 0
+
+    def _is_healthy(self, conn) -> bool:
+        """Checks that a connection is still usable.
+
+        Args:
+            conn (psycopg2.extensions.connection): The connection to check.
+
+        Returns:
+            bool: True if the connection answered a trivial query, False otherwise.
+        """
+        if conn.closed:
+            return False
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1;")
+            cursor.fetchone()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding broken database connection: {e}")
+            return False
+
+    def _close(self, conn) -> None:
+        """Closes a connection, ignoring errors on already broken connections."""
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _reap_idle(self) -> list:
+        """Removes idle connections which exceeded the idle timeout.
+
+        Must be called with the pool lock held.
+
+        Returns:
+            list: The connections to close outside the lock.
+        """
+        expired = []
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size:
+            conn, returned_at = self._idle[0]
+            if now - returned_at < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            expired.append(conn)
+        return expired
+
+    def getconn(self):
+        """Checks out a healthy connection from the pool.
+
+        Returns:
+            psycopg2.extensions.connection: A connection to the PostgreSQL database.
+
+        Raises:
+            Exception: If no connection became available within the checkout timeout.
+        """
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+
+        while True:
+            conn = None
+            returned_at = None
+            expired = []
+            with self._lock:
+                expired = self._reap_idle()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise Exception(
+                            f"Timed out after {self.checkout_timeout}s waiting for a database connection")
+                    self._waiting += 1
+                    try:
+                        self._available.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+
+                if self._idle:
+                    # Most recently returned connection first, so the oldest ones can expire
+                    conn, returned_at = self._idle.pop()
+                else:
+                    # Reserve a slot before connecting outside the lock
+                    self._size += 1
+
+            for expired_conn in expired:
+                self._close(expired_conn)
+
+            if conn is None:
+                try:
+                    conn = get_db_connection(
+                        cursor_factory=CountingCursor if self.count_queries else None)
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._available.notify()
+                    raise
+            elif conn.closed or (time.monotonic() - returned_at >= self.health_check_after and not self._is_healthy(conn)):
+                self._close(conn)
+                with self._lock:
+                    self._size -= 1
+                    self._discarded += 1
+                    self._available.notify()
+                continue
+
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self._checkouts += 1
+                self._checkout_time_total += elapsed
+                self._checkout_time_max = max(
+                    self._checkout_time_max, elapsed)
+            return conn
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        """Returns a connection to the pool.
+
+        Any transaction left open by the caller is rolled back.
+
+        Args:
+            conn (psycopg2.extensions.connection): The connection to return.
+            discard (bool): Close the connection instead of keeping it.
+        """
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard or conn.closed:
+            self._close(conn)
+            with self._lock:
+                self._size -= 1
+                self._discarded += 1
+                self._available.notify()
+            return
+
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+            self._available.notify()
+
+    def closeall(self) -> None:
+        """Closes every idle connection of the pool."""
+        with self._lock:
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+        for conn in idle:
+            self._close(conn)
+
+    def count_query(self) -> None:
+        """Records a statement executed on a pooled connection, see `count_queries`."""
+        with self._lock:
+            self._queries += 1
+
+    def get_stats(self) -> dict:
+        """Gets the pool statistics.
+
+        Returns:
+            dict: The pool statistics, with the number of statements executed if the
+                pool counts them (None otherwise).
+
+        Example:
+            ```
+            {
+                "min_size": 1,
+                "max_size": 10,
+                "size": 4,
+                "in_use": 3,
+                "idle": 1,
+                "waiting": 0,
+                "checkouts": 1520,
+                "checkout_timeouts": 0,
+                "discarded": 2,
+                "queries": None,
+                "checkout_time_avg_ms": 0.12,
+                "checkout_time_max_ms": 35.4
+            }
+            ```
+        """
+        with self._lock:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._size - len(self._idle),
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "checkout_timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "queries": self._queries if self.count_queries else None,
+                "checkout_time_avg_ms": round(self._checkout_time_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "checkout_time_max_ms": round(self._checkout_time_max * 1000, 3),
+            }
+
+
+db_pool = ConnectionPool(
+    min_size=db_pool_min_size,
+    max_size=db_pool_max_size,
+    idle_timeout=db_pool_idle_timeout,
+    checkout_timeout=db_pool_checkout_timeout,
+    health_check_after=db_pool_health_check_after,
+    count_queries=db_pool_count_queries
+)
+
+
+@contextmanager
+def db_connection():
+    """
+    Borrow a connection from the process-wide pool.
+
+    The connection is returned to the pool when the block exits. Uncommitted
+    work is rolled back, and connections left broken by an error are discarded.
+
+    Example:
+        ```
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1;")
+        ```
+
+    Yields:
+        psycopg2.extensions.connection: A connection to the PostgreSQL database.
+    """
+    conn = db_pool.getconn()
+    try:
+        yield conn
+    finally:
+        db_pool.putconn(conn)
+
+
+def get_pool_stats() -> dict:
+    """
+    Get the statistics of the database connection pool.
+
+    Returns:
+        dict: The pool statistics (size, in use, waiting, checkout latency...).
+    """
+    return db_pool.get_stats()
@@ -0,0 +1,13 @@
+from api.config.logging_config import load_config
+import os
+
+
+# Load configuration
+config_path = os.path.join(os.path.dirname(__file__), 'config.yaml')
+config = load_config(config_path)
+
+job_config = config.get('jobs', {}) or {}
+job_workers = int(job_config.get('workers', 1))
+job_poll_interval = float(job_config.get('poll_interval', 2))
+job_max_attempts = int(job_config.get('max_attempts', 2))
+job_stale_after = float(job_config.get('stale_after', 3600))
@@ -10,3 +10,16 @@ ops_config = config.get('ops', {})
 ops_consumer_key = ops_config.get('consumer_key')
 ops_consumer_secret_key = ops_config.get('consumer_secret_key')
 ops_api_url = ops_config.get('ops_api_url')
+ops_pool_size = int(ops_config.get('pool_size', 10))
+ops_timeout = float(ops_config.get('timeout', 30))
+ops_token_refresh_margin = float(ops_config.get('token_refresh_margin', 60))
+ops_max_workers = int(ops_config.get('max_workers', 4))
+ops_max_retries = int(ops_config.get('max_retries', 3))
+ops_backoff_base = float(ops_config.get('backoff_base', 1))
+ops_backoff_max = float(ops_config.get('backoff_max', 60))
+
+ops_cache_config = ops_config.get('cache', {})
+ops_cache_enabled = bool(ops_cache_config.get('enabled', True))
+ops_cache_path = ops_cache_config.get('path', 'data/ops_cache.sqlite3')
+ops_cache_max_size = int(ops_cache_config.get(
+    'max_size_mb', 512)) * 1024 * 1024
@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+from datetime import date, datetime, timedelta
+from api.config.logging_config import logger
+from api.repositories import patent_repository
+from api.services import ops_service
+from api.services.ops_client import OpsClient, ops_client
+
+
+# OPS returns at most 2000 results of a search, by windows of at most 100 results
+OPS_SEARCH_MAX_RESULTS = 2000
+OPS_SEARCH_WINDOW = 100
+OPS_DATE_FORMAT = "%Y%m%d"
+
+DEFAULT_CHECKPOINT_PATH = "data/ingest_checkpoint.json"
+
+
+def parse_date(value: str) -> date:
+    """Parses a date in the OPS format.
+
+    Args:
+        value (str): The date as 'YYYYMMDD'.
+
+    Returns:
+        date: The parsed date.
+    """
+    return datetime.strptime(value, OPS_DATE_FORMAT).date()
+
+
+def build_slice_query(query: str, start: str, end: str) -> str:
+    """Restricts a CQL query to a publication date range.
+
+    Args:
+        query (str): The CQL query.
+        start (str): The first publication date as 'YYYYMMDD'.
+        end (str): The last publication date as 'YYYYMMDD'.
+
+    Returns:
+        str: The CQL query of the publications of the range.
+    """
+    return f"({query}) and pd within \"{start} {end}\""
+
+
+def split_date_range(start: str, end: str, days: int) -> list[list[str]]:
+    """Splits a publication date range into slices.
+
+    Args:
+        start (str): The first date as 'YYYYMMDD'.
+        end (str): The last date as 'YYYYMMDD'.
+        days (int): The number of days of each slice.
+
+    Returns:
+        list[list[str]]: The [start, end] slices, in chronological order.
+    """
+    first_day, last_day = parse_date(start), parse_date(end)
+    slices = []
+    while first_day <= last_day:
+        slice_end = min(first_day + timedelta(days=days - 1), last_day)
+        slices.append([first_day.strftime(OPS_DATE_FORMAT),
+                      slice_end.strftime(OPS_DATE_FORMAT)])
+        first_day = slice_end + timedelta(days=1)
+    return slices
+
+
+def load_checkpoint(path: str, query: str, start: str, end: str, slice_days: int) -> dict:
+    """Loads the checkpoint of an ingestion, or creates a new one.
+
+    A checkpoint is only resumed if it was created for the same query and dates.
+
+    Args:
+        path (str): The path of the JSON checkpoint file.
+        query (str): The CQL query.
+        start (str): The first publication date as 'YYYYMMDD'.
+        end (str): The last publication date as 'YYYYMMDD'.
+        slice_days (int): The number of days of the initial slices.
+
+    Returns:
+        dict: The checkpoint, with the remaining date slices and the next result of the first one.
+    """
+    if path and os.path.exists(path):
+        with open(path) as f:
+            checkpoint = json.load(f)
+        if (checkpoint.get("query"), checkpoint.get("start"), checkpoint.get("end")) == (query, start, end):
+            logger.info(
+                f"Resuming ingestion from {path}: {len(checkpoint['slices'])} slices left, {checkpoint['inserted']} patents inserted")
+            return checkpoint
+        logger.warning(
+            f"Ignoring checkpoint {path} of another ingestion ({checkpoint.get('query')}, {checkpoint.get('start')}-{checkpoint.get('end')})")
+
+    return {
+        "query": query,
+        "start": start,
+        "end": end,
+        "slices": split_date_range(start, end, slice_days),
+        "next": 1,
+        "retrieved": 0,
+        "inserted": 0,
+        "failed": [],
+    }
+
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    """Saves the checkpoint of an ingestion.
+
+    The file is replaced atomically, so a crash leaves the previous checkpoint.
+
+    Args:
+        path (str): The path of the JSON checkpoint file.
+        checkpoint (dict): The checkpoint.
+    """
+    if not path:
+        return
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temporary_path, path)
+
+
+def ingest(query: str, start: str, end: str, checkpoint_path: str = DEFAULT_CHECKPOINT_PATH, slice_days: int = 7, use_cache: bool = True, client: OpsClient = ops_client) -> dict:
+    """Ingests the full patents of an OPS query published in a date range.
+
+    The date range is walked slice by slice, and each slice by windows of 100
+    results. Slices with more than the 2000 results OPS can return are split in
+    two. The patents of each window are fetched concurrently, inserted in bulk
+    and then recorded in the checkpoint, so an interrupted ingestion resumes at
+    the first window which was not inserted.
+
+    Args:
+        query (str): The CQL query (e.g. 'pn=EP and ta=microwave').
+        start (str): The first publication date as 'YYYYMMDD'.
+        end (str): The last publication date as 'YYYYMMDD'.
+        checkpoint_path (str, optional): The path of the JSON checkpoint file, None to disable it.
+        slice_days (int, optional): The number of days of the initial slices. Defaults to 7.
+        use_cache (bool, optional): False to bypass the OPS cache. Defaults to True.
+        client (OpsClient, optional): The Ops API client.
+
+    Returns:
+        dict: The final checkpoint, with the number of patents retrieved and inserted
+            and the numbers of the patents which could not be retrieved.
+
+    Raises:
+        ValueError: If the dates are invalid.
+    """
+    if parse_date(start) > parse_date(end):
+        raise ValueError(f"Invalid date range: {start} is after {end}.")
+
+    checkpoint = load_checkpoint(
+        checkpoint_path, query, start, end, slice_days)
+    slices = checkpoint["slices"]
+
+    while slices:
+        slice_start, slice_end = slices[0]
+        first = checkpoint["next"]
+        last = min(first + OPS_SEARCH_WINDOW - 1, OPS_SEARCH_MAX_RESULTS)
+
+        total_count, references = ops_service.search_publications(
+            client, build_slice_query(query, slice_start, slice_end), first, last)
+
+        if total_count > OPS_SEARCH_MAX_RESULTS:
+            if first == 1 and slice_start != slice_end:
+                # Split the slice so that each half can be walked to the end
+                middle = parse_date(slice_start) + \
+                    (parse_date(slice_end) - parse_date(slice_start)) / 2
+                slices[0:1] = [
+                    [slice_start, middle.strftime(OPS_DATE_FORMAT)],
+                    [(middle + timedelta(days=1)).strftime(OPS_DATE_FORMAT), slice_end]]
+                logger.info(
+                    f"Splitting {slice_start}-{slice_end} with {total_count} results")
+                save_checkpoint(checkpoint_path, checkpoint)
+                continue
+            if first == 1:
+                logger.warning(
+                    f"Only the first {OPS_SEARCH_MAX_RESULTS} of the {total_count} results published on {slice_start} can be retrieved")
+
+        if references:
+            patents, failed = ops_service.get_full_patents(
+                client, references, use_cache)
+            inserted = patent_repository.create_patents(
+                [patent.model_dump() for patent in patents]) if patents else 0
+
+            checkpoint["retrieved"] += len(patents)
+            checkpoint["inserted"] += inserted
+            checkpoint["failed"].extend(failed)
+            logger.info(
+                f"{slice_start}-{slice_end} results {first}-{first + len(references) - 1} of {total_count}: {len(patents)} retrieved, {inserted} inserted, {len(failed)} failed")
+
+        # Move to the next window, or to the next slice once this one is complete
+        last_result = first + len(references) - 1
+        if not references or last_result >= min(total_count, OPS_SEARCH_MAX_RESULTS):
+            slices.pop(0)
+            checkpoint["next"] = 1
+        else:
+            checkpoint["next"] = last_result + 1
+
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    logger.info(
+        f"Ingestion of {query} from {start} to {end} completed: {checkpoint['retrieved']} patents retrieved, {checkpoint['inserted']} inserted, {len(checkpoint['failed'])} failed")
+
+    return checkpoint
+
+
+def main():
+    """
+    Command line entry point of the ingestion, e.g.:
+    `poetry run ingest "pn=EP and ta=microwave" --start 20240101 --end 20240630`
+    """
+    parser = argparse.ArgumentParser(
+        description="Ingest the patents of an OPS query published in a date range.")
+    parser.add_argument(
+        "query", type=str, help="CQL query of the patents, e.g. 'pn=EP and ta=microwave'.")
+    parser.add_argument("--start", type=str, required=True,
+                        help="First publication date (YYYYMMDD).")
+    parser.add_argument("--end", type=str, required=True,
+                        help="Last publication date (YYYYMMDD).")
+    parser.add_argument("--checkpoint", type=str, default=DEFAULT_CHECKPOINT_PATH,
+                        help="Checkpoint file used to resume an interrupted ingestion.")
+    parser.add_argument("--slice-days", type=int, default=7,
+                        help="Number of days of the date slices searched in OPS.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the local cache of OPS responses.")
+    args = parser.parse_args()
+
+    ingest(args.query, args.start, args.end, checkpoint_path=args.checkpoint,
+           slice_days=args.slice_days, use_cache=not args.no_cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
+import sys
 from api.config.db_config import get_db_connection
 from api.config.logging_config import logger
+from api.repositories.patent_repository import PATENT_TEXT_EXPRESSION
+from api.repositories.sdg_summary_repository import rebuild_sdg_country_stats
 
 
 def drop_database_tables():
@@ -22,6 +25,9 @@ def drop_database_tables():
         cursor.execute("DROP TABLE IF EXISTS patent_description")
         cursor.execute("DROP TABLE IF EXISTS patent_applicant")
         cursor.execute("DROP TABLE IF EXISTS patent_sdg_summary")
+        cursor.execute("DROP TABLE IF EXISTS patent_sdg_country_stats")
+        cursor.execute("DROP TABLE IF EXISTS analysis_job")
+        cursor.execute("DROP TABLE IF EXISTS llm_inference_cache")
 
         # Commit the changes to the database
         conn.commit()
@@ -192,6 +198,11 @@ def create_sdg_summary_table():
     - `sdg`: the SDG of the patent (PK)
     - `sdg_reason`: the reason why the patent is related to the SDG
     - `sdg_details`: the text related to the SDG in the patent
+    - `model_name`, `prompt_version`: the model and the prompt versions which produced the summary
+    - `analyzed_at`: when the summary was produced
+
+    The provenance columns are added to an existing table by the migration.
+
     Returns:
         None
     """
@@ -207,10 +218,16 @@ def create_sdg_summary_table():
         sdg VARCHAR(255),
         sdg_reason TEXT,
         sdg_details TEXT,
+        model_name VARCHAR(255),
+        prompt_version VARCHAR(255),
+        analyzed_at TIMESTAMPTZ DEFAULT now(),
         PRIMARY KEY (patent_number, sdg)
     );
     """
     cursor.execute(create_table_query)
+    for column, definition in [("model_name", "VARCHAR(255)"), ("prompt_version", "VARCHAR(255)"), ("analyzed_at", "TIMESTAMPTZ DEFAULT now()")]:
+        cursor.execute(
+            f"ALTER TABLE patent_sdg_summary ADD COLUMN IF NOT EXISTS {column} {definition};")
     conn.commit()
     cursor.close()
     conn.close()
@@ -218,7 +235,279 @@ def create_sdg_summary_table():
     logger.info("Patent SDG summary table created successfully.")
 
 
+def create_sdg_country_stats_table():
+    """
+    Create the rollup table of the number of patents by SDG and country, and fill it
+    from the existing SDG summaries.
+
+    Description:
+    - `sdg`: the SDG (PK)
+    - `country`: the country of the patents (PK)
+    - `patent_count`: the number of patents of the country related to the SDG
+
+    The table is updated incrementally when SDG summaries are created, so that the
+    statistics endpoint does not scan the summaries.
+
+    Returns:
+        None
+    """
+    logger.info("Creating SDG country statistics table...")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    # Create the statistics table if it doesn't exist
+    create_table_query = """
+    CREATE TABLE IF NOT EXISTS patent_sdg_country_stats (
+        sdg VARCHAR(255),
+        country VARCHAR(10),
+        patent_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (sdg, country)
+    );
+    """
+    cursor.execute(create_table_query)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    rebuild_sdg_country_stats()
+
+    logger.info("SDG country statistics table created successfully.")
+
+
+def create_patent_search_index():
+    """
+    Create the full-text and trigram search indexes of the patent table.
+
+    Description:
+    - `en_tsv`, `fr_tsv`, `de_tsv`: generated tsvector columns of the titles and abstracts
+      with the english, french and german text search configurations, indexed with GIN
+    - a pg_trgm GIN index on the lower-cased titles and abstracts for substring matching
+    - pg_trgm GIN indexes on the patent number and the applicant names
+    - an index on `patent_applicant.patent_number` for the applicant lookups of a page
+
+    The generated columns are maintained by PostgreSQL on every insert and update.
+    The migration is idempotent and can be applied on an existing database.
+
+    Returns:
+        None
+    """
+    logger.info("Creating patent search indexes...")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+
+    # Add one tsvector column per language, kept up to date by PostgreSQL
+    for column, language, lang in [("en_tsv", "english", "en"), ("fr_tsv", "french", "fr"), ("de_tsv", "german", "de")]:
+        cursor.execute(f"""
+        ALTER TABLE patent ADD COLUMN IF NOT EXISTS {column} tsvector
+        GENERATED ALWAYS AS (
+            to_tsvector('{language}'::regconfig, COALESCE({lang}_title, '') || ' ' || COALESCE({lang}_abstract, ''))
+        ) STORED;
+        """)
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS patent_{column}_idx ON patent USING GIN ({column});")
+
+    # Trigram indexes for substring and partial number matching
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS patent_text_trgm_idx ON patent USING GIN (({PATENT_TEXT_EXPRESSION}) gin_trgm_ops);")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS patent_number_trgm_idx ON patent USING GIN (number gin_trgm_ops);")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS patent_applicant_name_trgm_idx ON patent_applicant USING GIN (LOWER(applicant_name) gin_trgm_ops);")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS patent_applicant_patent_number_idx ON patent_applicant (patent_number);")
+
+    conn.commit()
+    cursor.execute("ANALYZE patent;")
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    logger.info("Patent search indexes created successfully.")
+
+
+def create_patent_pagination_index():
+    """
+    Create the index of the patent listing order.
+
+    Description:
+    - `patent_publication_date_number_idx`: the (publication_date DESC, number ASC) order of
+      the listings, so that cursor pages are read directly from the index
+
+    Returns:
+        None
+    """
+    logger.info("Creating patent pagination index...")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS patent_publication_date_number_idx ON patent (publication_date DESC, number ASC);")
+
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    logger.info("Patent pagination index created successfully.")
+
+
+def create_patent_details_index():
+    """
+    Create the indexes of the claims and descriptions of a patent.
+
+    Description:
+    - `patent_claim_patent_number_idx`, `patent_description_patent_number_idx`: lookups by
+      patent number when fetching a full patent (the primary keys start with the paragraph number)
+    - `patent_unanalyzed_idx`: the patents which have not been analyzed, walked by number
+      by the batch classification (`api.classify`)
+
+    Returns:
+        None
+    """
+    logger.info("Creating patent details indexes...")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS patent_claim_patent_number_idx ON patent_claim (patent_number);")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS patent_description_patent_number_idx ON patent_description (patent_number);")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS patent_unanalyzed_idx ON patent (number) WHERE NOT is_analyzed;")
+
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    logger.info("Patent details indexes created successfully.")
+
+
+def create_analysis_job_table():
+    """
+    Create a table for the queue of patent analysis jobs run by the API workers.
+
+    Description:
+    - `id`: the job identifier returned to the client (PK)
+    - `kind`: what is analyzed ('patent' for a patent number, 'pdf' for an uploaded file)
+    - `status`: 'queued', 'running', 'succeeded' or 'failed'
+    - `patent_number`, `filename`, `pdf`: the input of the job (the PDF is deleted once the job is done)
+    - `force`: whether a patent is analyzed again even if it has stored SDG summaries
+    - `result`: the SDG summaries of a succeeded job
+    - `error`: the error of the last failed attempt
+    - `attempts`, `worker`: the number of runs of the job and the worker of the last run
+    - `analysis_job_queued_idx`: the queued jobs, claimed in submission order
+
+    Returns:
+        None
+    """
+    logger.info("Creating analysis job table...")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    create_table_query = """
+    CREATE TABLE IF NOT EXISTS analysis_job (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        kind VARCHAR(16) NOT NULL,
+        status VARCHAR(16) NOT NULL DEFAULT 'queued',
+        patent_number VARCHAR(255),
+        filename TEXT,
+        pdf BYTEA,
+        force BOOLEAN NOT NULL DEFAULT FALSE,
+        result JSONB,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker VARCHAR(255),
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        started_at TIMESTAMPTZ,
+        finished_at TIMESTAMPTZ
+    );
+    """
+    cursor.execute(create_table_query)
+    cursor.execute(
+        "ALTER TABLE analysis_job ADD COLUMN IF NOT EXISTS force BOOLEAN NOT NULL DEFAULT FALSE;")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS analysis_job_queued_idx ON analysis_job (created_at) WHERE status = 'queued';")
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    logger.info("Analysis job table created successfully.")
+
+
+def create_inference_cache_table():
+    """
+    Create a table for caching the responses of the language model.
+
+    Description:
+    - `key`: the SHA-256 hash of the other key columns (PK)
+    - `model`, `prompt_name`, `prompt_version`, `temperature`: the generation settings
+    - `text_hash`: the SHA-256 hash of the analyzed text
+    - `sdg`: the SDG of a citation ('' for a classification)
+    - `response`: the raw response of the model
+    - `hits`, `accessed_at`: the usage of the entry, the least recently used entries are evicted
+    - `llm_inference_cache_accessed_at_idx`: the entries by last access, for the eviction
+
+    Returns:
+        None
+    """
+    logger.info("Creating inference cache table...")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    create_table_query = """
+    CREATE TABLE IF NOT EXISTS llm_inference_cache (
+        key CHAR(64) PRIMARY KEY,
+        model VARCHAR(255) NOT NULL,
+        prompt_name VARCHAR(255) NOT NULL,
+        prompt_version INTEGER NOT NULL,
+        temperature REAL NOT NULL,
+        text_hash CHAR(64) NOT NULL,
+        sdg VARCHAR(255) NOT NULL DEFAULT '',
+        response TEXT NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        accessed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    """
+    cursor.execute(create_table_query)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS llm_inference_cache_accessed_at_idx ON llm_inference_cache (accessed_at);")
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    logger.info("Inference cache table created successfully.")
+
+
+def migrate_database():
+    """
+    Apply the idempotent migrations (indexes, derived columns) on an existing database.
+
+    Returns:
+        None
+    """
+    create_patent_search_index()
+    create_patent_pagination_index()
+    create_patent_details_index()
+    create_sdg_summary_table()
+    create_sdg_country_stats_table()
+    create_analysis_job_table()
+    create_inference_cache_table()
+
+
 if __name__ == "__main__":
+    # Only migrate an existing database: python -m api.init_db migrate
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        migrate_database()
+        sys.exit(0)
+
     # Drop existing tables
     drop_database_tables()
 
@@ -228,3 +517,6 @@ if __name__ == "__main__":
     create_claim_table()
     create_applicant_table()
     create_sdg_summary_table()
+
+    # Create indexes
+    migrate_database()
@@ -1,8 +1,15 @@
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 
-from api.resources import patent_resource
+from api.resources import patent_resource, job_resource
+from api.config.db_config import get_pool_stats
+from api.config.async_db_config import open_async_db_pool, close_async_db_pool, get_async_pool_stats
+from api.services.ops_client import ops_client
+from api.services.ops_cache import ops_cache
+from api.services.job_service import start_workers, stop_workers
+from api.services.inference_cache import inference_cache
 
 
 tags_metadata = [
@@ -10,18 +17,38 @@ tags_metadata = [
         "name": "Patents",
         "description": "Operations with patents.",
     },
+    {
+        "name": "Jobs",
+        "description": "Background patent analyses.",
+    },
     {
         "name": "Health",
         "description": "Health check endpoint.",
     },
 ]
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open the database connection pool used by the endpoints and run the analysis
+    workers for the lifetime of the application.
+    """
+    await open_async_db_pool()
+    start_workers()
+    yield
+    stop_workers()
+    await close_async_db_pool()
+    ops_client.close()
+    ops_cache.close()
+
+
 app = FastAPI(
     title="Compass for European Patents",
     description="API for managing and retrieving European patents.",
     version="1.0.0",
     openapi_tags=tags_metadata,
     docs_url="/api/docs",
+    lifespan=lifespan,
 )
 
 origins = [
@@ -42,6 +69,7 @@ router = APIRouter(
     prefix="/api",
 )
 router.include_router(patent_resource.router)
+router.include_router(job_resource.router)
 
 
 @router.get("/health", tags=["Health"])
@@ -52,6 +80,34 @@ async def health_check():
     return {"status": "ok"}
 
 
+@router.get("/health/database", tags=["Health"])
+async def database_health_check():
+    """
+    Database connection pools statistics (connections in use, waiting requests, checkout latency).
+    """
+    return {
+        "async_pool": get_async_pool_stats(),
+        "sync_pool": get_pool_stats(),
+    }
+
+
+@router.get("/health/ops", tags=["Health"])
+async def ops_health_check():
+    """
+    EPO OPS throttling state by service and quota usage reported by the last responses,
+    and usage of the local cache of OPS responses.
+    """
+    return {**ops_client.get_quota(), "cache": ops_cache.get_stats()}
+
+
+@router.get("/health/ai", tags=["Health"])
+async def ai_health_check():
+    """
+    Hits and misses of the cache of the language model responses since the start of the API.
+    """
+    return {"inference_cache": inference_cache.get_stats()}
+
+
 app.include_router(router)
 
 
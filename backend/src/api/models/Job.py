@@ -0,0 +1,34 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Optional
+from api.models.SDGSummary import SDGSummary
+
+
+class Job(BaseModel):
+    """
+    Model representing an asynchronous patent analysis job.
+    """
+    id: str = Field(..., title="Job ID",
+                    description="The identifier of the job, used to poll its status.", examples=["0b6f5a36-2f5c-4d6e-9a55-1f7c7d2e0c44"])
+    kind: str = Field(..., title="Kind",
+                      description="What is analyzed: 'patent' for a patent number, 'pdf' for an uploaded file.", examples=["patent"])
+    status: str = Field(..., title="Status",
+                        description="'queued', 'running', 'succeeded' or 'failed'.", examples=["queued"])
+    patent_number: Optional[str] = Field(None, title="Patent Number",
+                                         description="The analyzed patent number.", examples=["EP4322066A1"])
+    filename: Optional[str] = Field(None, title="File Name",
+                                    description="The name of the analyzed PDF file.")
+    force: bool = Field(False, title="Force",
+                        description="Whether the patent is analyzed again even if it has stored SDG summaries.")
+    result: Optional[list[SDGSummary]] = Field(None, title="Result",
+                                               description="The SDG summaries of a succeeded job.")
+    error: Optional[str] = Field(None, title="Error",
+                                 description="The error of the last failed attempt.")
+    attempts: int = Field(0, title="Attempts",
+                          description="The number of runs of the job.")
+    created_at: datetime = Field(..., title="Created At",
+                                 description="When the job was submitted.")
+    started_at: Optional[datetime] = Field(None, title="Started At",
+                                           description="When the last run of the job started.")
+    finished_at: Optional[datetime] = Field(None, title="Finished At",
+                                            description="When the last run of the job ended.")
@@ -95,6 +95,10 @@ class FullPatent(Patent):
 class PatentList(BaseModel):
     total_count: int = Field(
         0, title="Total Count", description="The total number of patents.")
+    total_count_exact: bool = Field(
+        True, title="Total Count Exact", description="Whether the total count is exact, or an estimate or lower bound.")
+    has_more: Optional[bool] = Field(
+        None, title="Has More", description="Whether more patents follow the list, when known without counting.")
     first: int = Field(
         0, title="First", description="The index of the first patent in the list.")
     last: int = Field(
@@ -103,6 +107,8 @@ class PatentList(BaseModel):
         0, title="Total Results", description="The total number of results.")
     patents: List[Patent] = Field(
         [], title="Patents", description="A list of patents.")
+    next_cursor: Optional[str] = Field(
+        None, title="Next Cursor", description="The cursor to pass as `after` to get the next page, if any.")
 
     model_config = {
         "json_schema_extra": {
@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import Optional
 
@@ -11,3 +12,9 @@ class SDGSummary(BaseModel):
                             description="The reason why the patent is related to the SDG.", examples=["This patent relates to..."])
     sdg_details: str = Field(..., title="SDG Details",
                              description="The text related to the SDG in the patent.", examples=["This patent addresses..."])
+    model_name: Optional[str] = Field(None, title="Model Name",
+                                      description="The language model which produced the summary.", examples=["llama3.1:8b"])
+    prompt_version: Optional[str] = Field(None, title="Prompt Version",
+                                          description="The versions of the prompts which produced the summary.", examples=["sdg_label_prompt:v1,sdg_citation_prompt:v1"])
+    analyzed_at: Optional[datetime] = Field(None, title="Analyzed At",
+                                            description="When the summary was produced.")
@@ -0,0 +1,49 @@
+from api.config.async_db_config import async_db_connection
+from api.config.logging_config import logger
+from api.repositories.job_repository import INSERT_JOB_QUERY, FETCH_JOB_QUERY, job_from_row
+
+
+# Asynchronous variant of `job_repository` used by the API endpoints.
+# The workers run in threads and use the synchronous repository.
+
+
+async def create_job(kind: str, patent_number: str = None, filename: str = None, pdf: bytes = None, force: bool = False) -> dict:
+    """
+    Queue a new analysis job in the PostgreSQL database.
+
+    Args:
+        kind (str): What is analyzed ('patent' or 'pdf').
+        patent_number (str, optional): The patent number of a 'patent' job.
+        filename (str, optional): The file name of a 'pdf' job.
+        pdf (bytes, optional): The content of the PDF file of a 'pdf' job.
+        force (bool, optional): True to analyze a patent again even if it has stored SDG summaries.
+
+    Returns:
+        dict: The queued job.
+    """
+    logger.debug(f"Queuing {kind} analysis job")
+
+    async with async_db_connection() as conn:
+        cursor = await conn.execute(INSERT_JOB_QUERY, (kind, patent_number, filename, pdf, force))
+        job = job_from_row(await cursor.fetchone())
+
+    logger.debug(f"Analysis job {job['id']} queued")
+
+    return job
+
+
+async def get_job(job_id: str) -> dict:
+    """
+    Get an analysis job from the PostgreSQL database.
+
+    Args:
+        job_id (str): The job identifier.
+
+    Returns:
+        dict: The job, None if it does not exist.
+    """
+    async with async_db_connection() as conn:
+        cursor = await conn.execute(FETCH_JOB_QUERY, (job_id,))
+        row = await cursor.fetchone()
+
+    return job_from_row(row) if row else None
@@ -0,0 +1,274 @@
+from api.config.async_db_config import async_db_connection
+from api.config.logging_config import logger
+from api.repositories.patent_repository import (
+    FETCH_PATENT_QUERY, FETCH_APPLICANTS_QUERY, FETCH_SDGS_QUERY, FETCH_PATENTS_BY_APPLICANT_QUERY,
+    ESTIMATE_PATENTS_COUNT_QUERY, count_cache, patent_from_row, add_applicants_and_sdgs,
+    build_full_patent_query, full_patent_from_row, build_search_queries, check_count_strategy, split_extra_row, build_page)
+
+
+# Asynchronous variant of `patent_repository` used by the API endpoints.
+# Both modules share the same queries and return the same data structures.
+
+
+async def _attach_applicants_and_sdgs(conn, patents: list[dict]) -> None:
+    """
+    Fetch the applicants and SDGs of a page of patents in two queries.
+
+    Args:
+        conn (psycopg.AsyncConnection): The database connection to use.
+        patents (list[dict]): The patents of the page, updated in place.
+
+    Returns:
+        None
+    """
+    if not patents:
+        return
+
+    numbers = [patent["number"] for patent in patents]
+
+    cursor = await conn.execute(FETCH_APPLICANTS_QUERY, (numbers,))
+    applicants = await cursor.fetchall()
+    cursor = await conn.execute(FETCH_SDGS_QUERY, (numbers,))
+    sdgs = await cursor.fetchall()
+
+    add_applicants_and_sdgs(patents, applicants, sdgs)
+
+
+async def get_patent_by_number(number: str) -> dict:
+    """
+    Get patent data from the PostgreSQL database.
+
+    Args:
+        number (str): The patent number.
+
+    Returns:
+        dict: A dictionary containing patent data.
+    """
+    logger.debug(f"Fetching patent data for number: {number}")
+
+    async with async_db_connection() as conn:
+        # Fetch the patent data from the database
+        cursor = await conn.execute(FETCH_PATENT_QUERY, (number,))
+        result = await cursor.fetchone()
+
+        if result is None:
+            logger.debug(f"No patent found for number: {number}")
+            return None
+
+        patent = patent_from_row(result)
+        await _attach_applicants_and_sdgs(conn, [patent])
+
+    logger.debug(f"Patent data fetched successfully for number: {number}")
+
+    return patent
+
+
+async def get_full_patent_by_number(number: str, fields: list[str] = None) -> dict:
+    """
+    Get patent data with description and claims from the PostgreSQL database.
+
+    Args:
+        number (str): The patent number.
+        fields (list[str], optional): The parts of `patent_repository.FULL_PATENT_FIELDS` to fetch.
+            Defaults to all of them.
+
+    Returns:
+        dict: A dictionary containing patent data.
+
+    Raises:
+        ValueError: If a field is unknown.
+    """
+    logger.debug(f"Fetching full patent data for number: {number}")
+
+    query = build_full_patent_query(fields)
+
+    async with async_db_connection() as conn:
+        # Fetch the patent with its applicants, claims, description and SDG summary
+        cursor = await conn.execute(query, (number,))
+        result = await cursor.fetchone()
+
+    if result is None:
+        logger.debug(f"No patent found for number: {number}")
+        return None
+
+    patent = full_patent_from_row(result)
+
+    logger.debug(f"Full patent data fetched successfully for number: {number}")
+
+    return patent
+
+
+async def _count_patents(conn, count_query: str, count_params: list, count_strategy: str) -> tuple:
+    """
+    Count the patents of a listing, see `patent_repository._count_patents`.
+
+    Args:
+        conn (psycopg.AsyncConnection): The database connection to use.
+        count_query (str): The count query built by `build_search_queries`.
+        count_params (list): The parameters of the count query.
+        count_strategy (str): The count strategy.
+
+    Returns:
+        tuple: The number of patents and whether it is exact.
+    """
+    # Unfiltered listings have no parameters and can use the planner estimate
+    if count_strategy == "estimated" and not count_params:
+        cursor = await conn.execute(ESTIMATE_PATENTS_COUNT_QUERY)
+        estimate = (await cursor.fetchone())[0]
+        if estimate >= 0:
+            return estimate, False
+
+    total_count = count_cache.get(count_query, count_params)
+    if total_count is None:
+        cursor = await conn.execute(count_query, count_params)
+        total_count = (await cursor.fetchone())[0]
+        count_cache.set(count_query, count_params, total_count)
+
+    return total_count, True
+
+
+async def get_all_patents(first: int = 0, last: int = 99, after: str = None, count_strategy: str = "exact") -> dict:
+    """
+    Get all patents from the PostgreSQL database order by publication date.
+
+    Args:
+        first (int): The starting index for pagination.
+        last (int): The ending index for pagination.
+        after (str, optional): Cursor of the last patent of the previous page. Defaults to None.
+        count_strategy (str, optional): How `total_count` is computed. Defaults to "exact".
+
+    Returns:
+        dict: A dictionary containing patent data, see `patent_repository.get_all_patents`.
+
+    Raises:
+        ValueError: If the cursor or the count strategy is invalid.
+    """
+    logger.debug("Fetching all patents")
+
+    check_count_strategy(count_strategy)
+    page_last = last + 1 if count_strategy == "has_more" else last
+    count_query, count_params, page_query, page_params = build_search_queries(
+        first=first, last=page_last, after=after)
+
+    async with async_db_connection() as conn:
+        # Fetch the total number of patents
+        total_patents, total_count_exact = None, False
+        if count_strategy != "has_more":
+            total_patents, total_count_exact = await _count_patents(
+                conn, count_query, count_params, count_strategy)
+
+        # Fetch the patent data from the database
+        cursor = await conn.execute(page_query, page_params)
+        results = await cursor.fetchall()
+
+        if not results:
+            logger.debug("No patents found")
+            return None
+
+        results, has_more = split_extra_row(
+            results, last - first, count_strategy)
+        patents = [patent_from_row(result) for result in results]
+        await _attach_applicants_and_sdgs(conn, patents)
+
+    logger.debug("All patents fetched successfully")
+
+    return build_page(patents, first, last, total_patents, total_count_exact, has_more, keyset=True)
+
+
+async def get_all_patents_by_applicant(applicant_name: str, first: int = 0, last: int = 99) -> dict:
+    """
+    Get all patents by applicant name from the PostgreSQL database order by publication date.
+
+    Args:
+        applicant_name (str): The applicant name.
+        first (int): The starting index for pagination.
+        last (int): The ending index for pagination.
+
+    Returns:
+        dict: A dictionary containing patent data, see `patent_repository.get_all_patents_by_applicant`.
+    """
+    logger.debug(f"Fetching all patents for applicant: {applicant_name}")
+
+    async with async_db_connection() as conn:
+        # Fetch the patent data from the database
+        cursor = await conn.execute(FETCH_PATENTS_BY_APPLICANT_QUERY,
+                                    (applicant_name, last - first, first))
+        results = await cursor.fetchall()
+
+        if not results:
+            logger.debug(f"No patents found for applicant: {applicant_name}")
+            return None
+
+        patents = [patent_from_row(result) for result in results]
+        await _attach_applicants_and_sdgs(conn, patents)
+
+    logger.debug(
+        f"All patents fetched successfully for applicant: {applicant_name}")
+
+    return {
+        "patents": patents,
+        "total_count": len(patents),
+        "first": first,
+        "last": min(last, len(patents)),
+        "total_results": len(patents)
+    }
+
+
+async def search_patents(text: str = None, patent_number: str = None, publication_date: str = None, country: str = None, applicant: str = None, sdgs: list[str] = None, first: int = 0, last: int = 99, after: str = None, count_strategy: str = "exact") -> dict:
+    """Search patents in the PostgreSQL database based on various criteria.
+
+    Args:
+        text (str, optional): Text to search in titles and abstracts. Defaults to None.
+        patent_number (str, optional): Patent number to search for. Defaults to None.
+        publication_date (str, optional): Publication date to search for in the format 'YYYYMMDD'. Defaults to None.
+        country (str, optional): Country code to search for. Defaults to None.
+        applicant (str, optional): Applicant name to search for. Defaults to None.
+        sdgs (list[str], optional): List of SDGs to search for. Defaults to None.
+        first (int, optional): Starting index for pagination. Defaults to 0.
+        last (int, optional): Ending index for pagination. Defaults to 99.
+        after (str, optional): Cursor of the last patent of the previous page, see
+            `patent_repository.build_search_queries`. Defaults to None.
+        count_strategy (str, optional): How `total_count` is computed. Defaults to "exact".
+
+    Returns:
+        dict: A dictionary containing search results with pagination.
+
+    Raises:
+        ValueError: If the cursor or the count strategy is invalid.
+    """
+    logger.debug("Searching patents with criteria: "
+                 f"text={text}, patent_number={patent_number}, publication_date={publication_date}, country={country}, applicant={applicant}, sdgs={sdgs}")
+
+    check_count_strategy(count_strategy)
+    page_last = last + 1 if count_strategy == "has_more" else last
+    count_query, count_params, page_query, page_params = build_search_queries(
+        text, patent_number, publication_date, country, applicant, sdgs, first, page_last, after)
+    no_results = build_page([], first, last, 0, True, False, keyset=False)
+
+    async with async_db_connection() as conn:
+        # Get total count of patents matching the search criteria
+        total_patents, total_count_exact = None, False
+        if count_strategy != "has_more":
+            total_patents, total_count_exact = await _count_patents(
+                conn, count_query, count_params, count_strategy)
+            logger.debug(f"Total patents matching criteria: {total_patents}")
+            if total_patents == 0 and total_count_exact:
+                logger.debug("No patents found matching the search criteria.")
+                return no_results
+
+        cursor = await conn.execute(page_query, page_params)
+        results = await cursor.fetchall()
+
+        if not results:
+            logger.debug("No patents found matching the search criteria.")
+            return no_results
+
+        results, has_more = split_extra_row(
+            results, last - first, count_strategy)
+        patents = [patent_from_row(result) for result in results]
+        await _attach_applicants_and_sdgs(conn, patents)
+
+    logger.debug("Patent search completed successfully")
+
+    return build_page(patents, first, last, total_patents, total_count_exact, has_more,
+                      keyset=after is not None or not text)
@@ -0,0 +1,66 @@
+from api.config.async_db_config import async_db_connection
+from api.config.logging_config import logger
+from api.repositories.sdg_summary_repository import FETCH_SDG_SUMMARY_QUERY, FETCH_SDG_COUNTRY_STATS_QUERY, sdg_summary_from_row, build_stats
+
+
+# Asynchronous variant of `sdg_summary_repository` used by the API endpoints.
+# Both modules share the same queries and return the same data structures.
+
+
+async def get_sdg_summary_by_patent_number(patent_number: str) -> list:
+    """
+    Retrieve SDG summary data for a specific patent number from the PostgreSQL database.
+
+    Args:
+        patent_number (str): The patent number to search for.
+
+    Returns:
+        list: A list of dictionaries containing SDG summary data.
+    """
+    logger.debug(
+        f"Retrieving SDG summary data for patent number: {patent_number}")
+
+    async with async_db_connection() as conn:
+        # Retrieve SDG summary data for the specified patent number
+        cursor = await conn.execute(FETCH_SDG_SUMMARY_QUERY, (patent_number,))
+        rows = await cursor.fetchall()
+
+    # Convert the result to a list of dictionaries
+    sdg_summary_list = [sdg_summary_from_row(row) for row in rows]
+
+    logger.debug(
+        f"SDG summary data retrieved successfully for patent number: {patent_number}")
+
+    return sdg_summary_list
+
+
+async def get_stats(sdgs: list[int]) -> dict:
+    """
+    Get patent statistics by SDG and country from the PostgreSQL database.
+
+    Args:
+        sdgs (list[int]): List of SDG numbers (1-17) to get statistics for.
+
+    Returns:
+        dict: A dictionary containing patent statistics organized by SDG and country,
+            see `sdg_summary_repository.get_stats`.
+    """
+    logger.debug(f"Fetching patent statistics for SDGs: {sdgs}")
+
+    # Validate SDG numbers
+    valid_sdgs = [sdg for sdg in sdgs if 1 <= sdg <= 17]
+    if not valid_sdgs:
+        logger.warning(
+            "No valid SDG numbers provided (must be between 1 and 17)")
+        return build_stats([], [])
+
+    async with async_db_connection() as conn:
+        # Read the counts of every requested SDG from the rollup table
+        cursor = await conn.execute(FETCH_SDG_COUNTRY_STATS_QUERY,
+                                    ([f"SDG{sdg}" for sdg in valid_sdgs],))
+        results = await cursor.fetchall()
+
+    logger.debug(
+        f"Patent statistics fetched successfully for {len(valid_sdgs)} SDGs")
+
+    return build_stats(valid_sdgs, results)
@@ -0,0 +1,275 @@
+from psycopg2.extras import Json
+from api.config.db_config import db_connection
+from api.config.logging_config import logger
+
+
+# Queries shared by the synchronous and asynchronous repositories
+
+JOB_COLUMNS = "id, kind, status, patent_number, filename, result, error, attempts, created_at, started_at, finished_at, force"
+
+INSERT_JOB_QUERY = f"""
+INSERT INTO analysis_job (kind, patent_number, filename, pdf, force)
+VALUES (%s, %s, %s, %s, %s)
+RETURNING {JOB_COLUMNS};
+"""
+
+FETCH_JOB_QUERY = f"""
+SELECT {JOB_COLUMNS}
+FROM analysis_job
+WHERE id = %s;
+"""
+
+# Claims the oldest queued job, skipping the jobs being claimed by other workers
+CLAIM_JOB_QUERY = f"""
+UPDATE analysis_job
+SET status = 'running', started_at = now(), finished_at = NULL, attempts = attempts + 1, worker = %s
+WHERE id = (
+    SELECT id
+    FROM analysis_job
+    WHERE status = 'queued'
+    ORDER BY created_at
+    FOR UPDATE SKIP LOCKED
+    LIMIT 1
+)
+RETURNING {JOB_COLUMNS}, pdf;
+"""
+
+COMPLETE_JOB_QUERY = """
+UPDATE analysis_job
+SET status = 'succeeded', result = %s, error = NULL, pdf = NULL, finished_at = now()
+WHERE id = %s;
+"""
+
+# Failed jobs are queued again until they reach the maximum number of attempts
+FAIL_JOB_QUERY = """
+UPDATE analysis_job
+SET status = CASE WHEN attempts < %s THEN 'queued' ELSE 'failed' END,
+    error = %s,
+    pdf = CASE WHEN attempts < %s THEN pdf ELSE NULL END,
+    finished_at = now()
+WHERE id = %s
+RETURNING status;
+"""
+
+# Jobs left running by a dead worker are queued again until they reach the maximum
+# number of attempts: a job which kills its process is not run forever
+REQUEUE_STALE_JOBS_QUERY = """
+UPDATE analysis_job
+SET status = CASE WHEN attempts < %s THEN 'queued' ELSE 'failed' END,
+    error = CASE WHEN attempts < %s THEN error ELSE 'Interrupted while running' END,
+    pdf = CASE WHEN attempts < %s THEN pdf ELSE NULL END,
+    finished_at = CASE WHEN attempts < %s THEN finished_at ELSE now() END
+WHERE status = 'running' AND started_at < now() - make_interval(secs => %s)
+RETURNING status;
+"""
+
+# Jobs interrupted by the stop of their workers are queued again, without
+# counting the interrupted run as an attempt
+REQUEUE_WORKER_JOBS_QUERY = """
+UPDATE analysis_job
+SET status = 'queued', attempts = attempts - 1
+WHERE status = 'running' AND worker = ANY(%s);
+"""
+
+
+def job_from_row(row: tuple) -> dict:
+    """
+    Convert a row of `JOB_COLUMNS` to a job dictionary.
+
+    Args:
+        row (tuple): The row.
+
+    Returns:
+        dict: The job.
+    """
+    return {
+        "id": str(row[0]),
+        "kind": row[1],
+        "status": row[2],
+        "patent_number": row[3],
+        "filename": row[4],
+        "result": row[5],
+        "error": row[6],
+        "attempts": row[7],
+        "created_at": row[8],
+        "started_at": row[9],
+        "finished_at": row[10],
+        "force": row[11],
+    }
+
+
+def create_job(kind: str, patent_number: str = None, filename: str = None, pdf: bytes = None, force: bool = False) -> dict:
+    """
+    Queue a new analysis job in the PostgreSQL database.
+
+    Args:
+        kind (str): What is analyzed ('patent' or 'pdf').
+        patent_number (str, optional): The patent number of a 'patent' job.
+        filename (str, optional): The file name of a 'pdf' job.
+        pdf (bytes, optional): The content of the PDF file of a 'pdf' job.
+        force (bool, optional): True to analyze a patent again even if it has stored SDG summaries.
+
+    Returns:
+        dict: The queued job.
+    """
+    logger.debug(f"Queuing {kind} analysis job")
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(INSERT_JOB_QUERY, (kind, patent_number, filename, pdf, force))
+        job = job_from_row(cursor.fetchone())
+        conn.commit()
+        cursor.close()
+
+    logger.debug(f"Analysis job {job['id']} queued")
+
+    return job
+
+
+def get_job(job_id: str) -> dict:
+    """
+    Get an analysis job from the PostgreSQL database.
+
+    Args:
+        job_id (str): The job identifier.
+
+    Returns:
+        dict: The job, None if it does not exist.
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(FETCH_JOB_QUERY, (job_id,))
+        row = cursor.fetchone()
+        cursor.close()
+
+    return job_from_row(row) if row else None
+
+
+def claim_job(worker: str) -> dict:
+    """
+    Claim the oldest queued job and mark it as running.
+
+    Several workers, in one or several processes, can claim jobs concurrently:
+    each job is claimed by a single worker.
+
+    Args:
+        worker (str): The name of the worker.
+
+    Returns:
+        dict: The job with its `pdf` content, None if no job is queued.
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(CLAIM_JOB_QUERY, (worker,))
+        row = cursor.fetchone()
+        conn.commit()
+        cursor.close()
+
+    if row is None:
+        return None
+
+    job = job_from_row(row)
+    job["pdf"] = bytes(row[12]) if row[12] is not None else None
+
+    logger.debug(f"Analysis job {job['id']} claimed by {worker}")
+
+    return job
+
+
+def complete_job(job_id: str, result: list[dict]) -> None:
+    """
+    Store the result of a succeeded job.
+
+    Args:
+        job_id (str): The job identifier.
+        result (list[dict]): The SDG summaries of the analysis.
+
+    Returns:
+        None
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(COMPLETE_JOB_QUERY, (Json(result), job_id))
+        conn.commit()
+        cursor.close()
+
+    logger.debug(f"Analysis job {job_id} succeeded")
+
+
+def fail_job(job_id: str, error: str, max_attempts: int) -> str:
+    """
+    Record the error of a failed job, which is queued again if it can be retried.
+
+    Args:
+        job_id (str): The job identifier.
+        error (str): The error message.
+        max_attempts (int): The maximum number of runs of a job.
+
+    Returns:
+        str: The new status of the job ('queued' or 'failed').
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(FAIL_JOB_QUERY,
+                       (max_attempts, error, max_attempts, job_id))
+        status = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+
+    logger.debug(f"Analysis job {job_id} failed, now {status}")
+
+    return status
+
+
+def requeue_stale_jobs(stale_after: float, max_attempts: int) -> int:
+    """
+    Queue again the jobs which have been running for too long, e.g. because
+    the process running them was killed. The jobs which reached the maximum
+    number of attempts are marked as failed instead.
+
+    Args:
+        stale_after (float): The number of seconds after which a running job is stale.
+        max_attempts (int): The maximum number of runs of a job.
+
+    Returns:
+        int: The number of jobs queued again.
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(REQUEUE_STALE_JOBS_QUERY,
+                       (max_attempts, max_attempts, max_attempts, max_attempts, stale_after))
+        statuses = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+        cursor.close()
+
+    requeued = statuses.count("queued")
+    if requeued:
+        logger.info(f"{requeued} stale analysis jobs queued again")
+    if len(statuses) > requeued:
+        logger.warning(
+            f"{len(statuses) - requeued} stale analysis jobs failed after {max_attempts} attempts")
+
+    return requeued
+
+
+def requeue_worker_jobs(workers: list[str]) -> int:
+    """
+    Queue again the jobs still running in stopped workers.
+
+    Args:
+        workers (list[str]): The names of the workers.
+
+    Returns:
+        int: The number of jobs queued again.
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(REQUEUE_WORKER_JOBS_QUERY, (workers,))
+        requeued = cursor.rowcount
+        conn.commit()
+        cursor.close()
+
+    if requeued:
+        logger.info(f"{requeued} interrupted analysis jobs queued again")
+
+    return requeued
@@ -1,120 +1,161 @@
-from api.config.db_config import get_db_connection
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from psycopg2.extras import execute_values
+from api.config.db_config import db_connection, db_pool, get_pool_stats, db_count_cache_ttl, db_count_cache_max_entries
 from api.config.logging_config import logger
 
 
-def create_patent(patent: dict):
+# Queries shared by the synchronous and asynchronous repositories
+
+PATENT_COLUMNS = "patent.number, patent.en_title, patent.fr_title, patent.de_title, patent.en_abstract, patent.fr_abstract, patent.de_abstract, patent.country, patent.publication_date, patent.is_analyzed"
+
+# Lower-cased titles and abstracts in every language, indexed with pg_trgm for
+# substring matching (see `init_db.create_patent_search_index`)
+PATENT_TEXT_EXPRESSION = "LOWER(COALESCE(patent.en_title, '') || ' ' || COALESCE(patent.fr_title, '') || ' ' || COALESCE(patent.de_title, '') || ' ' || COALESCE(patent.en_abstract, '') || ' ' || COALESCE(patent.fr_abstract, '') || ' ' || COALESCE(patent.de_abstract, ''))"
+
+# Full-text search rank of a patent over the english, french and german tsvector columns
+PATENT_TEXT_RANK = "GREATEST(ts_rank(patent.en_tsv, websearch_to_tsquery('english', %s)), ts_rank(patent.fr_tsv, websearch_to_tsquery('french', %s)), ts_rank(patent.de_tsv, websearch_to_tsquery('german', %s)))"
+
+FETCH_PATENT_QUERY = f"""
+SELECT {PATENT_COLUMNS}
+FROM patent
+WHERE patent.number = %s;
+"""
+
+# Heavy parts of a full patent which can be left out of `get_full_patent_by_number`
+FULL_PATENT_FIELDS = ("description", "claims", "sdg_summary")
+
+# Correlated subqueries aggregating the rows of a full patent as JSON arrays,
+# served by the indexes on `patent_number` (see `init_db.create_patent_details_index`)
+FULL_PATENT_APPLICANTS = "(SELECT COALESCE(json_agg(json_build_object('name', applicant_name, 'patent_number', patent_number)), '[]') FROM patent_applicant WHERE patent_number = patent.number)"
+FULL_PATENT_DESCRIPTION = "(SELECT COALESCE(json_agg(json_build_object('description_number', description_number, 'description_text', description_text, 'patent_number', patent_number) ORDER BY description_number), '[]') FROM patent_description WHERE patent_number = patent.number)"
+FULL_PATENT_CLAIMS = "(SELECT COALESCE(json_agg(json_build_object('claim_number', claim_number, 'claim_text', claim_text, 'patent_number', patent_number) ORDER BY claim_number), '[]') FROM patent_claim WHERE patent_number = patent.number)"
+FULL_PATENT_SDG_SUMMARY = "(SELECT COALESCE(json_agg(json_build_object('patent_number', patent_number, 'sdg', sdg, 'sdg_reason', sdg_reason, 'sdg_details', sdg_details) ORDER BY sdg), '[]') FROM patent_sdg_summary WHERE patent_number = patent.number)"
+FULL_PATENT_SDGS = "(SELECT COALESCE(array_agg(DISTINCT sdg), '{}') FROM patent_sdg_summary WHERE patent_number = patent.number)"
+
+FETCH_APPLICANTS_QUERY = """
+SELECT applicant_name, patent_number
+FROM patent_applicant
+WHERE patent_number = ANY(%s);
+"""
+
+FETCH_SDGS_QUERY = """
+SELECT DISTINCT patent_number, sdg
+FROM patent_sdg_summary
+WHERE patent_number = ANY(%s);
+"""
+
+# Listing order of the patents, backed by the `patent_publication_date_number_idx`
+# index (see `init_db.create_patent_pagination_index`)
+PATENT_ORDER = "patent.publication_date DESC, patent.number ASC"
+
+# Planner estimate of the number of patents, maintained by ANALYZE and autovacuum
+# (-1 if the table has never been analyzed)
+ESTIMATE_PATENTS_COUNT_QUERY = """
+SELECT reltuples::bigint FROM pg_class WHERE oid = 'patent'::regclass;
+"""
+
+# How the total number of results of a listing is computed:
+# - exact: COUNT(*) of the matching patents, cached for a few seconds by query
+# - estimated: planner estimate for unfiltered listings, exact count otherwise
+# - has_more: no count, one extra row is fetched to know if a next page exists
+COUNT_STRATEGIES = ("exact", "estimated", "has_more")
+
+FETCH_PATENTS_BY_APPLICANT_QUERY = f"""
+SELECT {PATENT_COLUMNS}
+FROM patent
+JOIN patent_applicant ON patent.number = patent_applicant.patent_number
+WHERE LOWER(patent_applicant.applicant_name) = LOWER(%s)
+ORDER BY {PATENT_ORDER}
+LIMIT %s OFFSET %s;
+"""
+
+
+class CountCache():
     """
-    Insert patent data into the PostgreSQL database.
+    Thread-safe cache of the exact result counts of the patent listings.
 
-    Args:
-        patent (dict): A dictionary containing patent data.
-
-    Returns:
-        None
+    Counts are keyed by count query and parameters and expire after `ttl`
+    seconds. The least recently stored counts are evicted above `max_entries`.
     """
-    logger.debug(f"Inserting patent data for number: {patent['number']}")
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    def __init__(self, ttl: float = 60, max_entries: int = 1024):
+        """Initializes the count cache.
 
-    # Insert patent data into the patent table
-    insert_patent_query = """
-    INSERT INTO patent (number, en_title, fr_title, de_title, en_abstract, fr_abstract, de_abstract, country, publication_date)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-    ON CONFLICT (number) DO NOTHING;
-    """
-    # Extract the title and abstract in different languages
-    cursor.execute(insert_patent_query, (
-        patent["number"],
-        patent["en_title"] if patent["en_title"] else None,
-        patent["fr_title"] if patent["fr_title"] else None,
-        patent["de_title"] if patent["de_title"] else None,
-        patent["en_abstract"] if patent["en_abstract"] else None,
-        patent["fr_abstract"] if patent["fr_abstract"] else None,
-        patent["de_abstract"] if patent["de_abstract"] else None,
-        patent["country"],
-        patent["publication_date"]
-    ))
-
-    # Insert claims into the patent_claim table
-    for claim in patent["claims"]:
-        insert_claim_query = """
-        INSERT INTO patent_claim (claim_number, patent_number, claim_text)
-        VALUES (%s, %s, %s)
-        ON CONFLICT (claim_number, patent_number) DO NOTHING;
+        Args:
+            ttl (float): Seconds a count is reused (0 to disable the cache).
+            max_entries (int): The maximum number of cached counts.
         """
-        cursor.execute(insert_claim_query, (
-            claim["claim_number"],
-            claim["patent_number"],
-            claim["claim_text"]
-        ))
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
 
-    # Insert description into the patent_description table
-    for description in patent["description"]:
-        insert_description_query = """
-        INSERT INTO patent_description (description_number, patent_number, description_text)
-        VALUES (%s, %s, %s)
-        ON CONFLICT (description_number, patent_number) DO NOTHING;
-        """
-        cursor.execute(insert_description_query, (
-            description["description_number"],
-            description["patent_number"],
-            description["description_text"]
-        ))
+    def _key(self, count_query: str, params: list) -> str:
+        return count_query + json.dumps(params, default=str)
+
+    def get(self, count_query: str, params: list) -> int:
+        """Gets a cached count.
 
-    conn.commit()
+        Args:
+            count_query (str): The count query.
+            params (list): The parameters of the query.
 
-    # Insert applicants into the patent_applicant table
-    for applicant in patent["applicants"]:
-        insert_applicant_query = """
-        INSERT INTO patent_applicant (applicant_name, patent_number)
-        VALUES (%s, %s)
-        ON CONFLICT (applicant_name, patent_number) DO NOTHING;
+        Returns:
+            int: The cached count, None if missing or expired.
+        """
+        key = self._key(count_query, params)
+        with self._lock:
+            entry = self._counts.get(key)
+            if entry is None:
+                return None
+            expires_at, count = entry
+            if expires_at <= time.monotonic():
+                del self._counts[key]
+                return None
+            return count
+
+    def set(self, count_query: str, params: list, count: int) -> None:
+        """Stores a count.
+
+        Args:
+            count_query (str): The count query.
+            params (list): The parameters of the query.
+            count (int): The number of matching patents.
         """
+        if self.ttl <= 0:
+            return
+        key = self._key(count_query, params)
+        with self._lock:
+            self._counts.pop(key, None)
+            self._counts[key] = (time.monotonic() + self.ttl, count)
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
 
-        cursor.execute(insert_applicant_query, (
-            applicant["name"],
-            applicant["patent_number"]
-        ))
-    conn.commit()
-    cursor.close()
+    def clear(self) -> None:
+        """Drops every cached count, e.g. after patents were inserted."""
+        with self._lock:
+            self._counts.clear()
 
-    # Close the database connection
-    conn.close()
 
-    logger.debug(
-        f"Patent data inserted successfully for number: {patent['number']}")
+count_cache = CountCache(ttl=db_count_cache_ttl,
+                         max_entries=db_count_cache_max_entries)
 
 
-def get_patent_by_number(number: str) -> dict:
+def patent_from_row(result: tuple) -> dict:
     """
-    Get patent data from the PostgreSQL database.
+    Convert a row selected with `PATENT_COLUMNS` into a patent dictionary.
 
     Args:
-        number (str): The patent number.
+        result (tuple): The row (number, titles, abstracts, country, publication date, is_analyzed).
 
     Returns:
-        dict: A dictionary containing patent data.
-    """
-    logger.debug(f"Fetching patent data for number: {number}")
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Fetch the patent data from the database
-    fetch_patent_query = """
-    SELECT * FROM patent
-    WHERE patent.number = %s;
+        dict: A dictionary containing patent data, without applicants and SDGs.
     """
-
-    cursor.execute(fetch_patent_query, (number,))
-    result = cursor.fetchone()
-
-    if result is None:
-        logger.debug(f"No patent found for number: {number}")
-        return None
-
-    patent = {
+    return {
         "number": result[0],
         "en_title": result[1],
         "fr_title": result[2],
@@ -129,193 +170,630 @@ def get_patent_by_number(number: str) -> dict:
         "sdgs": [],
     }
 
-    cursor.close()
 
-    # Fetch the applicants from the database
-    fetch_applicants_query = """
-    SELECT applicant_name, patent_number
-    FROM patent_applicant
-    WHERE patent_number = %s;
+def add_applicants_and_sdgs(patents: list[dict], applicants: list[tuple], sdgs: list[tuple]) -> None:
     """
-    cursor = conn.cursor()
-    cursor.execute(fetch_applicants_query, (number,))
-    applicants = cursor.fetchall()
+    Attach the rows of `FETCH_APPLICANTS_QUERY` and `FETCH_SDGS_QUERY` to their patents.
+
+    Args:
+        patents (list[dict]): The patents, updated in place.
+        applicants (list[tuple]): The (applicant_name, patent_number) rows.
+        sdgs (list[tuple]): The (patent_number, sdg) rows.
+
+    Returns:
+        None
+    """
+    patents_by_number = {patent["number"]: patent for patent in patents}
+
     for applicant in applicants:
-        patent["applicants"].append({
+        patents_by_number[applicant[1]]["applicants"].append({
             "name": applicant[0],
             "patent_number": applicant[1]
         })
-    cursor.close()
 
-    # Fetch the SDGs for each patent
-    fetch_sdgs_query = """
-    SELECT DISTINCT sdg
-    FROM patent_sdg_summary
-    WHERE patent_number = %s;
+    for sdg in sdgs:
+        if (sdg[1] != 'None'):
+            patents_by_number[sdg[0]]["sdgs"].append(sdg[1])
+
+
+def build_full_patent_query(fields: list[str] = None, where: str = "patent.number = %s") -> str:
     """
-    cursor = conn.cursor()
-    cursor.execute(fetch_sdgs_query, (result[0],))
-    sdgs = cursor.fetchall()
+    Build the query fetching a full patent in a single round trip.
 
-    for sdg in sdgs:
-        if (sdg[0] != 'None'):
-            patent["sdgs"].append(sdg[0])
-    cursor.close()
+    Args:
+        fields (list[str], optional): The parts of `FULL_PATENT_FIELDS` to fetch. Defaults to all of them.
+        where (str, optional): The condition of the patents, with its ORDER BY and LIMIT clauses.
+            Defaults to the patent of a given number.
+
+    Returns:
+        str: The query, taking the parameters of `where` (by default the patent number).
+
+    Raises:
+        ValueError: If a field is unknown.
+    """
+    fields = FULL_PATENT_FIELDS if fields is None else fields
+    for field in fields:
+        if field not in FULL_PATENT_FIELDS:
+            raise ValueError(
+                f"Invalid field: {field}. Use one of {', '.join(FULL_PATENT_FIELDS)}.")
+
+    # Skipped parts are returned as empty arrays. The SDGs of the patent are read
+    # from the summaries when they are fetched, so that the table is read once.
+    columns = [
+        PATENT_COLUMNS,
+        FULL_PATENT_APPLICANTS,
+        FULL_PATENT_DESCRIPTION if "description" in fields else "'[]'::json",
+        FULL_PATENT_CLAIMS if "claims" in fields else "'[]'::json",
+        FULL_PATENT_SDG_SUMMARY if "sdg_summary" in fields else "'[]'::json",
+        "NULL" if "sdg_summary" in fields else FULL_PATENT_SDGS,
+    ]
+
+    return f"SELECT {', '.join(columns)} FROM patent WHERE {where};"
+
+
+def full_patent_from_row(result: tuple) -> dict:
+    """
+    Convert a row selected with `build_full_patent_query` into a full patent dictionary.
+
+    Args:
+        result (tuple): The row (patent columns, applicants, description, claims, SDG summary, SDGs).
+
+    Returns:
+        dict: A dictionary containing full patent data.
+    """
+    patent = patent_from_row(result)
+    patent["applicants"] = result[10]
+    patent["description"] = result[11]
+    patent["claims"] = result[12]
+    patent["sdg_summary"] = result[13]
+
+    sdgs = result[14]
+    if sdgs is None:
+        sdgs = sorted({sdg_summary["sdg"] for sdg_summary in result[13]})
+    patent["sdgs"] = [sdg for sdg in sdgs if sdg != 'None']
+
+    return patent
+
+
+def encode_cursor(publication_date: str, number: str) -> str:
+    """
+    Encode the position of a patent in the listing order into an opaque cursor.
+
+    Args:
+        publication_date (str): The publication date of the patent.
+        number (str): The patent number.
+
+    Returns:
+        str: A URL-safe cursor to pass as `after` to get the following page.
+    """
+    token = json.dumps([publication_date, number], separators=(",", ":"))
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Decode a cursor created by `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        tuple: The publication date and the number of the last patent of the previous page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        publication_date, number = json.loads(
+            base64.urlsafe_b64decode(cursor + padding).decode("utf-8"))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+    if not isinstance(number, str) or not (publication_date is None or isinstance(publication_date, str)):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+    return publication_date, number
+
+
+def build_keyset_condition(after: str) -> tuple:
+    """
+    Build the condition selecting the patents following a cursor in the listing order.
+
+    The publication dates are sorted in descending order with NULLs first, and
+    the numbers in ascending order for patents published the same day.
+
+    Args:
+        after (str): The cursor of the last patent of the previous page.
+
+    Returns:
+        tuple: The SQL condition and its parameters.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    publication_date, number = decode_cursor(after)
+
+    if publication_date is None:
+        return "(patent.publication_date IS NOT NULL OR patent.number > %s)", [number]
+
+    # The first conjunct lets PostgreSQL start an index range scan at the cursor
+    return ("(patent.publication_date <= %s AND (patent.publication_date < %s OR patent.number > %s))",
+            [publication_date, publication_date, number])
+
+
+def get_next_cursor(patents: list[dict], page_size: int, keyset: bool) -> str:
+    """
+    Get the cursor of the page following a page of patents.
+
+    Args:
+        patents (list[dict]): The patents of the page.
+        page_size (int): The requested number of patents.
+        keyset (bool): Whether the page is in listing order (not ranked by relevance).
+
+    Returns:
+        str: The cursor of the next page, None if the page is the last one or ranked.
+    """
+    if not keyset or not patents or len(patents) < page_size:
+        return None
+
+    return encode_cursor(patents[-1]["publication_date"], patents[-1]["number"])
+
+
+def check_count_strategy(count_strategy: str) -> None:
+    """
+    Check that a count strategy is one of `COUNT_STRATEGIES`.
+
+    Args:
+        count_strategy (str): The count strategy.
+
+    Raises:
+        ValueError: If the count strategy is unknown.
+    """
+    if count_strategy not in COUNT_STRATEGIES:
+        raise ValueError(
+            f"Invalid count strategy: {count_strategy}. Use one of {', '.join(COUNT_STRATEGIES)}.")
+
+
+def split_extra_row(results: list, page_size: int, count_strategy: str) -> tuple:
+    """
+    Remove the extra row fetched by the `has_more` count strategy.
+
+    Args:
+        results (list): The rows of the page query.
+        page_size (int): The requested number of patents.
+        count_strategy (str): The count strategy.
+
+    Returns:
+        tuple: The rows of the page and whether more rows follow (None if unknown).
+    """
+    if count_strategy != "has_more":
+        return results, None
+
+    return results[:page_size], len(results) > page_size
+
+
+def build_page(patents: list[dict], first: int, last: int, total_count: int, total_count_exact: bool, has_more: bool, keyset: bool) -> dict:
+    """
+    Build the result of a patent listing.
+
+    Args:
+        patents (list[dict]): The patents of the page.
+        first (int): Starting index for pagination.
+        last (int): Ending index for pagination.
+        total_count (int): The number of matching patents, None if not counted.
+        total_count_exact (bool): Whether `total_count` is exact.
+        has_more (bool): Whether more patents follow, None if unknown.
+        keyset (bool): Whether the page is in listing order (not ranked by relevance).
+
+    Returns:
+        dict: The page, see `get_all_patents`.
+    """
+    if total_count is None:
+        # Lower bound of the number of results, from the rows read so far
+        total_count = first + len(patents) + (1 if has_more else 0)
+
+    next_cursor = None
+    if has_more is not False:
+        next_cursor = get_next_cursor(patents, last - first, keyset)
+
+    return {
+        "patents": patents,
+        "total_count": total_count,
+        "total_count_exact": total_count_exact,
+        "has_more": has_more,
+        "first": first,
+        "last": min(last, total_count),
+        "total_results": len(patents),
+        "next_cursor": next_cursor
+    }
+
+
+def build_search_queries(text: str = None, patent_number: str = None, publication_date: str = None, country: str = None, applicant: str = None, sdgs: list[str] = None, first: int = 0, last: int = 99, after: str = None) -> tuple:
+    """
+    Build the count and page queries of a patent search.
+
+    Text is matched with the per-language full-text indexes or as a substring
+    of the titles and abstracts, and text results are ordered by relevance.
+
+    Pages are selected with `LIMIT`/`OFFSET` by default. When `after` is given,
+    the page starts after the cursor instead and the results are kept in the
+    listing order, so that deep pages cost the same as the first one. An empty
+    `after` starts the cursor pagination from the first page.
+
+    Args:
+        text (str, optional): Text to search in titles and abstracts. Defaults to None.
+        patent_number (str, optional): Patent number to search for. Defaults to None.
+        publication_date (str, optional): Publication date to search for in the format 'YYYYMMDD'. Defaults to None.
+        country (str, optional): Country code to search for. Defaults to None.
+        applicant (str, optional): Applicant name to search for. Defaults to None.
+        sdgs (list[str], optional): List of SDGs to search for. Defaults to None.
+        first (int, optional): Starting index for pagination. Defaults to 0.
+        last (int, optional): Ending index for pagination. Defaults to 99.
+        after (str, optional): Cursor of the last patent of the previous page. Defaults to None.
+
+    Returns:
+        tuple: The count query, its parameters, the page query and its parameters.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    # Initialize conditions and parameters
+    conditions = []
+    params = []
+
+    if text:
+        conditions.append(
+            "(patent.en_tsv @@ websearch_to_tsquery('english', %s) OR patent.fr_tsv @@ websearch_to_tsquery('french', %s) OR patent.de_tsv @@ websearch_to_tsquery('german', %s) "
+            f"OR {PATENT_TEXT_EXPRESSION} LIKE LOWER(%s))")
+        params.extend([text] * 3 + [f"%{text}%"])
+
+    if patent_number:
+        conditions.append("patent.number LIKE %s")
+        params.append(f"%{patent_number}%")
+
+    if publication_date:
+        conditions.append("patent.publication_date LIKE %s")
+        params.append(f"%{publication_date}%")
+
+    if country:
+        conditions.append("patent.country = %s")
+        params.append(country)
+
+    if applicant:
+        conditions.append(
+            "EXISTS (SELECT 1 FROM patent_applicant WHERE patent_applicant.patent_number = patent.number AND LOWER(patent_applicant.applicant_name) LIKE LOWER(%s))")
+        params.append(f"%{applicant}%")
+
+    if sdgs:
+        conditions.append(
+            "EXISTS (SELECT 1 FROM patent_sdg_summary WHERE patent_sdg_summary.patent_number = patent.number AND sdg = ANY(%s))")
+        params.append(sorted(set(sdgs)))
+
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+
+    count_query = "SELECT COUNT(*) FROM patent" + where_clause + ";"
+
+    if after is not None:
+        # Keyset pagination: only the rows following the cursor are read
+        page_conditions = list(conditions)
+        page_params = list(params)
+        if after:
+            keyset_condition, keyset_params = build_keyset_condition(after)
+            page_conditions.append(keyset_condition)
+            page_params.extend(keyset_params)
+
+        page_where_clause = " WHERE " + \
+            " AND ".join(page_conditions) if page_conditions else ""
+        page_query = f"SELECT {PATENT_COLUMNS} FROM patent" + page_where_clause + \
+            f" ORDER BY {PATENT_ORDER} LIMIT %s;"
+
+        return count_query, params, page_query, page_params + [last - first]
+
+    order_clause = f" ORDER BY {PATENT_ORDER}"
+    order_params = []
+    if text:
+        order_clause = f" ORDER BY {PATENT_TEXT_RANK} DESC, {PATENT_ORDER}"
+        order_params = [text] * 3
+
+    page_query = f"SELECT {PATENT_COLUMNS} FROM patent" + where_clause + \
+        order_clause + " LIMIT %s OFFSET %s;"
+
+    return count_query, params, page_query, params + order_params + [last - first, first]
+
+
+INSERT_PATENTS_QUERY = """
+INSERT INTO patent (number, en_title, fr_title, de_title, en_abstract, fr_abstract, de_abstract, country, publication_date)
+VALUES %s
+ON CONFLICT (number) DO NOTHING
+RETURNING number;
+"""
+
+INSERT_CLAIMS_QUERY = """
+INSERT INTO patent_claim (claim_number, patent_number, claim_text)
+VALUES %s
+ON CONFLICT (claim_number, patent_number) DO NOTHING;
+"""
+
+INSERT_DESCRIPTIONS_QUERY = """
+INSERT INTO patent_description (description_number, patent_number, description_text)
+VALUES %s
+ON CONFLICT (description_number, patent_number) DO NOTHING;
+"""
+
+INSERT_APPLICANTS_QUERY = """
+INSERT INTO patent_applicant (applicant_name, patent_number)
+VALUES %s
+ON CONFLICT (applicant_name, patent_number) DO NOTHING;
+"""
+
+# Number of rows sent per INSERT statement by `execute_values`
+INSERT_PAGE_SIZE = 1000
+
+
+def create_patents(patents: list[dict], batch_size: int = 500) -> int:
+    """
+    Insert many patents with their claims, descriptions and applicants.
+
+    Rows are sent with multi-row INSERT statements, so a batch costs a few
+    round trips whatever the number of patents and paragraphs. Each batch is
+    committed in its own transaction. Existing rows are left unchanged, like
+    `create_patent`.
+
+    Args:
+        patents (list[dict]): Dictionaries containing full patent data.
+        batch_size (int, optional): The number of patents per transaction. Defaults to 500.
+
+    Returns:
+        int: The number of new patents inserted.
+    """
+    logger.debug(f"Inserting {len(patents)} patents")
+
+    inserted = 0
+    with db_connection() as conn:
+        cursor = conn.cursor()
+
+        for start in range(0, len(patents), batch_size):
+            batch = patents[start:start + batch_size]
+
+            # Extract the title and abstract in different languages
+            patent_rows = [(
+                patent["number"],
+                patent["en_title"] if patent["en_title"] else None,
+                patent["fr_title"] if patent["fr_title"] else None,
+                patent["de_title"] if patent["de_title"] else None,
+                patent["en_abstract"] if patent["en_abstract"] else None,
+                patent["fr_abstract"] if patent["fr_abstract"] else None,
+                patent["de_abstract"] if patent["de_abstract"] else None,
+                patent["country"],
+                patent["publication_date"]
+            ) for patent in batch]
+            claim_rows = [(
+                claim["claim_number"],
+                claim["patent_number"],
+                claim["claim_text"]
+            ) for patent in batch for claim in patent["claims"]]
+            description_rows = [(
+                description["description_number"],
+                description["patent_number"],
+                description["description_text"]
+            ) for patent in batch for description in patent["description"]]
+            applicant_rows = [(
+                applicant["name"],
+                applicant["patent_number"]
+            ) for patent in batch for applicant in patent["applicants"]]
+
+            inserted += len(execute_values(cursor, INSERT_PATENTS_QUERY, patent_rows,
+                                           page_size=INSERT_PAGE_SIZE, fetch=True))
+            for query, rows in [(INSERT_CLAIMS_QUERY, claim_rows),
+                                (INSERT_DESCRIPTIONS_QUERY, description_rows),
+                                (INSERT_APPLICANTS_QUERY, applicant_rows)]:
+                if rows:
+                    execute_values(cursor, query, rows,
+                                   page_size=INSERT_PAGE_SIZE)
+
+            conn.commit()
+            logger.debug(
+                f"Inserted batch of {len(batch)} patents ({start + len(batch)}/{len(patents)})")
+
+        cursor.close()
+
+    count_cache.clear()
+
+    logger.debug(f"{inserted} new patents inserted out of {len(patents)}")
 
-    # Close the database connection
-    conn.close()
+    return inserted
+
+
+def create_patent(patent: dict):
+    """
+    Insert patent data into the PostgreSQL database.
+
+    Args:
+        patent (dict): A dictionary containing patent data.
+
+    Returns:
+        None
+    """
+    logger.debug(f"Inserting patent data for number: {patent['number']}")
+
+    create_patents([patent])
+
+    logger.debug(
+        f"Patent data inserted successfully for number: {patent['number']}")
+
+
+def get_patent_by_number(number: str) -> dict:
+    """
+    Get patent data from the PostgreSQL database.
+
+    Args:
+        number (str): The patent number.
+
+    Returns:
+        dict: A dictionary containing patent data.
+    """
+    logger.debug(f"Fetching patent data for number: {number}")
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+
+        # Fetch the patent data from the database
+        cursor.execute(FETCH_PATENT_QUERY, (number,))
+        result = cursor.fetchone()
+
+        if result is None:
+            logger.debug(f"No patent found for number: {number}")
+            return None
+
+        patent = patent_from_row(result)
+
+        # Fetch the applicants and the SDGs from the database
+        cursor.execute(FETCH_APPLICANTS_QUERY, ([number],))
+        applicants = cursor.fetchall()
+        cursor.execute(FETCH_SDGS_QUERY, ([number],))
+        sdgs = cursor.fetchall()
+        cursor.close()
+
+        add_applicants_and_sdgs([patent], applicants, sdgs)
 
     logger.debug(f"Patent data fetched successfully for number: {number}")
 
     return patent
 
 
-def get_full_patent_by_number(number: str) -> dict:
+def get_full_patent_by_number(number: str, fields: list[str] = None) -> dict:
     """
     Get patent data with description and claims from the PostgreSQL database.
 
     Args:
         number (str): The patent number.
+        fields (list[str], optional): The parts of `FULL_PATENT_FIELDS` to fetch,
+            the others are left empty. Defaults to all of them.
 
     Returns:
         dict: A dictionary containing patent data.
+
+    Raises:
+        ValueError: If a field is unknown.
     """
     logger.debug(f"Fetching full patent data for number: {number}")
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    query = build_full_patent_query(fields)
 
-    # Fetch the patent data from the database
-    fetch_patent_query = """
-    SELECT * FROM patent
-    WHERE patent.number = %s;
-    """
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute(fetch_patent_query, (number,))
-    result = cursor.fetchone()
+        # Fetch the patent with its applicants, claims, description and SDG summary
+        cursor.execute(query, (number,))
+        result = cursor.fetchone()
+        cursor.close()
 
     if result is None:
         logger.debug(f"No patent found for number: {number}")
         return None
 
-    patent = {
-        "number": result[0],
-        "en_title": result[1],
-        "fr_title": result[2],
-        "de_title": result[3],
-        "en_abstract": result[4],
-        "fr_abstract": result[5],
-        "de_abstract": result[6],
-        "country": result[7],
-        "publication_date": result[8],
-        "is_analyzed": result[9],
-        "applicants": [],
-        "sdgs": [],
-        "description": [],
-        "claims": [],
-        "sdg_summary": []
-    }
+    patent = full_patent_from_row(result)
 
-    cursor.close()
+    logger.debug(f"Full patent data fetched successfully for number: {number}")
 
-    # Fetch the claims from the database
-    fetch_claims_query = """
-    SELECT claim_number, claim_text, patent_number
-    FROM patent_claim
-    WHERE patent_number = %s;
+    return patent
+
+
+def get_unanalyzed_patents(after: str = None, limit: int = 100) -> list[dict]:
     """
-    cursor = conn.cursor()
-    cursor.execute(fetch_claims_query, (number,))
-    claims = cursor.fetchall()
-    for claim in claims:
-        patent["claims"].append({
-            "claim_number": claim[0],
-            "claim_text": claim[1],
-            "patent_number": claim[2]
-        })
-    cursor.close()
+    Get the next patents which have not been analyzed, with their description.
+
+    The patents are returned by patent number, so that a batch analysis walks the
+    table once even if some patents cannot be analyzed.
 
-    # Fetch the description from the database
-    fetch_description_query = """
-    SELECT description_number, description_text, patent_number
-    FROM patent_description
-    WHERE patent_number = %s;
+    Args:
+        after (str, optional): The last patent number of the previous batch.
+        limit (int, optional): The maximum number of patents. Defaults to 100.
+
+    Returns:
+        list[dict]: The full patents, without their claims and SDG summaries.
     """
-    cursor = conn.cursor()
-    cursor.execute(fetch_description_query, (number,))
-    descriptions = cursor.fetchall()
-    for description in descriptions:
-        patent["description"].append({
-            "description_number": description[0],
-            "description_text": description[1],
-            "patent_number": description[2]
-        })
-    cursor.close()
+    logger.debug(f"Fetching {limit} unanalyzed patents after {after}")
+
+    query = build_full_patent_query(
+        ["description"], "NOT patent.is_analyzed AND patent.number > %s ORDER BY patent.number LIMIT %s")
 
-    # Fetch the applicants from the database
-    fetch_applicants_query = """
-    SELECT applicant_name, patent_number
-    FROM patent_applicant
-    WHERE patent_number = %s;
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, (after or "", limit))
+        results = cursor.fetchall()
+        cursor.close()
+
+    return [full_patent_from_row(result) for result in results]
+
+
+def _attach_applicants_and_sdgs(conn, patents: list[dict]) -> None:
     """
-    cursor = conn.cursor()
-    cursor.execute(fetch_applicants_query, (number,))
-    applicants = cursor.fetchall()
-    for applicant in applicants:
-        patent["applicants"].append({
-            "name": applicant[0],
-            "patent_number": applicant[1]
-        })
-    cursor.close()
+    Fetch the applicants and SDGs of a page of patents in two queries.
 
-    # Fetch the SDGs for each patent
-    fetch_sdgs_query = """
-    SELECT DISTINCT sdg
-    FROM patent_sdg_summary
-    WHERE patent_number = %s;
+    Args:
+        conn (psycopg2.extensions.connection): The database connection to use.
+        patents (list[dict]): The patents of the page, updated in place.
+
+    Returns:
+        None
     """
+    if not patents:
+        return
+
+    numbers = [patent["number"] for patent in patents]
+
     cursor = conn.cursor()
-    cursor.execute(fetch_sdgs_query, (result[0],))
+    cursor.execute(FETCH_APPLICANTS_QUERY, (numbers,))
+    applicants = cursor.fetchall()
+    cursor.execute(FETCH_SDGS_QUERY, (numbers,))
     sdgs = cursor.fetchall()
-
-    for sdg in sdgs:
-        if (sdg[0] != 'None'):
-            patent["sdgs"].append(sdg[0])
     cursor.close()
 
-    # Fetch the SDG summary from the database
-    select_sdg_summary_query = """
-    SELECT patent_number, sdg, sdg_reason, sdg_details
-    FROM patent_sdg_summary
-    WHERE patent_number = %s;
+    add_applicants_and_sdgs(patents, applicants, sdgs)
+
+
+def _count_patents(cursor, count_query: str, count_params: list, count_strategy: str) -> tuple:
     """
-    cursor = conn.cursor()
-    cursor.execute(select_sdg_summary_query, (number,))
-    sdg_summary_list = cursor.fetchall()
-    for sdg_summary in sdg_summary_list:
-        patent["sdg_summary"].append({
-            "patent_number": sdg_summary[0],
-            "sdg": sdg_summary[1],
-            "sdg_reason": sdg_summary[2],
-            "sdg_details": sdg_summary[3]
-        })
-    cursor.close()
+    Count the patents of a listing with the `exact` or `estimated` strategy.
 
-    # Close the database connection
-    conn.close()
+    Args:
+        cursor (psycopg2.extensions.cursor): The cursor to use.
+        count_query (str): The count query built by `build_search_queries`.
+        count_params (list): The parameters of the count query.
+        count_strategy (str): The count strategy.
 
-    logger.debug(f"Full patent data fetched successfully for number: {number}")
+    Returns:
+        tuple: The number of patents and whether it is exact.
+    """
+    # Unfiltered listings have no parameters and can use the planner estimate
+    if count_strategy == "estimated" and not count_params:
+        cursor.execute(ESTIMATE_PATENTS_COUNT_QUERY)
+        estimate = cursor.fetchone()[0]
+        if estimate >= 0:
+            return estimate, False
 
-    return patent
+    total_count = count_cache.get(count_query, count_params)
+    if total_count is None:
+        cursor.execute(count_query, count_params)
+        total_count = cursor.fetchone()[0]
+        count_cache.set(count_query, count_params, total_count)
 
+    return total_count, True
 
-def get_all_patents(first: int = 0, last: int = 99) -> dict:
+
+def get_all_patents(first: int = 0, last: int = 99, after: str = None, count_strategy: str = "exact") -> dict:
     """
     Get all patents from the PostgreSQL database order by publication date.
 
     Args:
         first (int): The starting index for pagination.
         last (int): The ending index for pagination.
+        after (str, optional): Cursor of the last patent of the previous page, replacing
+            `first` as the start of the page. Defaults to None.
+        count_strategy (str, optional): How `total_count` is computed, one of
+            `COUNT_STRATEGIES`. Defaults to "exact".
 
     Returns:
         list: A list of dictionaries containing patent data.
@@ -342,102 +820,51 @@ def get_all_patents(first: int = 0, last: int = 99) -> dict:
                 }
             ],
             "total_count": 1000,
+            "total_count_exact": True,
+            "has_more": None,
             "first": 0,
             "last": 100,
-            "total_results": 100
+            "total_results": 100,
+            "next_cursor": "WyIyMDIzMDEwMSIsIlVTMTIzNDU2NyJd"
         }
         ```
-    """
-    logger.debug("Fetching all patents")
-
-    conn = get_db_connection()
-
-    # Fetch the total number of patents
-    fetch_count_query = """
-    SELECT COUNT(*) FROM patent;
-    """
-    cursor = conn.cursor()
-    cursor.execute(fetch_count_query)
-    total_patents = cursor.fetchone()[0]
-    cursor.close()
 
-    # Fetch the patent data from the database
-    fetch_patent_query = """
-    SELECT patent.number, patent.en_title, patent.fr_title, patent.de_title, patent.en_abstract, patent.fr_abstract, patent.de_abstract, patent.country, patent.publication_date, patent.is_analyzed 
-    FROM patent
-    ORDER BY patent.publication_date DESC, patent.number ASC
-    LIMIT %s OFFSET %s;
+    Raises:
+        ValueError: If the cursor or the count strategy is invalid.
     """
+    logger.debug("Fetching all patents")
 
-    cursor = conn.cursor()
-    cursor.execute(fetch_patent_query, (last - first, first))
-    results = cursor.fetchall()
-    cursor.close()
-
-    if not results:
-        logger.debug("No patents found")
-        return None
-
-    patents = []
-    for result in results:
-        patents.append({
-            "number": result[0],
-            "en_title": result[1],
-            "fr_title": result[2],
-            "de_title": result[3],
-            "en_abstract": result[4],
-            "fr_abstract": result[5],
-            "de_abstract": result[6],
-            "country": result[7],
-            "publication_date": result[8],
-            "is_analyzed": result[9],
-            "applicants": [],
-            "sdgs": [],
-        })
+    check_count_strategy(count_strategy)
+    page_last = last + 1 if count_strategy == "has_more" else last
+    count_query, count_params, page_query, page_params = build_search_queries(
+        first=first, last=page_last, after=after)
 
-        # Fetch the applicants for each patent
-        fetch_applicants_query = """
-        SELECT applicant_name, patent_number
-        FROM patent_applicant
-        WHERE patent_number = %s;
-        """
+    with db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(fetch_applicants_query, (result[0],))
-        applicants = cursor.fetchall()
-        for applicant in applicants:
-            patents[-1]["applicants"].append({
-                "name": applicant[0],
-                "patent_number": applicant[1]
-            })
-        cursor.close()
 
-        # Fetch the SDGs for each patent
-        fetch_sdgs_query = """
-        SELECT DISTINCT sdg
-        FROM patent_sdg_summary
-        WHERE patent_number = %s;
-        """
-        cursor = conn.cursor()
-        cursor.execute(fetch_sdgs_query, (result[0],))
-        sdgs = cursor.fetchall()
+        # Fetch the total number of patents
+        total_patents, total_count_exact = None, False
+        if count_strategy != "has_more":
+            total_patents, total_count_exact = _count_patents(
+                cursor, count_query, count_params, count_strategy)
 
-        for sdg in sdgs:
-            if (sdg[0] != 'None'):
-                patents[-1]["sdgs"].append(sdg[0])
+        # Fetch the patent data from the database
+        cursor.execute(page_query, page_params)
+        results = cursor.fetchall()
         cursor.close()
 
-    # Close the database connection
-    conn.close()
+        if not results:
+            logger.debug("No patents found")
+            return None
+
+        results, has_more = split_extra_row(
+            results, last - first, count_strategy)
+        patents = [patent_from_row(result) for result in results]
+        _attach_applicants_and_sdgs(conn, patents)
 
     logger.debug("All patents fetched successfully")
 
-    return {
-        "patents": patents,
-        "total_count": total_patents,
-        "first": first,
-        "last": min(last, total_patents),
-        "total_results": len(patents)
-    }
+    return build_page(patents, first, last, total_patents, total_count_exact, has_more, keyset=True)
 
 
 def get_all_patents_by_applicant(applicant_name: str, first: int = 0, last: int = 99) -> dict:
@@ -481,76 +908,21 @@ def get_all_patents_by_applicant(applicant_name: str, first: int = 0, last: int
     """
     logger.debug(f"Fetching all patents for applicant: {applicant_name}")
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Fetch the patent data from the database
-    fetch_patent_query = """
-    SELECT patent.number, patent.en_title, patent.fr_title, patent.de_title, patent.en_abstract, patent.fr_abstract, patent.de_abstract, patent.country, patent.publication_date, patent.is_analyzed
-    FROM patent
-    JOIN patent_applicant ON patent.number = patent_applicant.patent_number
-    WHERE LOWER(patent_applicant.applicant_name) = LOWER(%s)
-    ORDER BY patent.publication_date DESC
-    LIMIT %s OFFSET %s;
-    """
-
-    cursor.execute(fetch_patent_query, (applicant_name, first, last))
-    results = cursor.fetchall()
-    cursor.close()
-
-    if not results:
-        logger.debug(f"No patents found for applicant: {applicant_name}")
-        return None
-
-    patents = []
-    for result in results:
-        patents.append({
-            "number": result[0],
-            "en_title": result[1],
-            "fr_title": result[2],
-            "de_title": result[3],
-            "en_abstract": result[4],
-            "fr_abstract": result[5],
-            "de_abstract": result[6],
-            "country": result[7],
-            "publication_date": result[8],
-            "is_analyzed": result[9],
-            "applicants": [],
-            "sdgs": [],
-        })
-
-        # Fetch the applicants for each patent
-        fetch_applicants_query = """
-        SELECT applicant_name, patent_number
-        FROM patent_applicant
-        WHERE patent_number = %s;
-        """
+    with db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(fetch_applicants_query, (result[0],))
-        applicants = cursor.fetchall()
-        for applicant in applicants:
-            patents[-1]["applicants"].append({
-                "name": applicant[0],
-                "patent_number": applicant[1]
-            })
-        cursor.close()
 
-        # Fetch the SDGs for each patent
-        fetch_sdgs_query = """
-        SELECT DISTINCT sdg
-        FROM patent_sdg_summary
-        WHERE patent_number = %s;
-        """
-        cursor = conn.cursor()
-        cursor.execute(fetch_sdgs_query, (result[0],))
-        sdgs = cursor.fetchall()
-        for sdg in sdgs:
-            if (sdg[0] != 'None'):
-                patents[-1]["sdgs"].append(sdg[0])
+        # Fetch the patent data from the database
+        cursor.execute(FETCH_PATENTS_BY_APPLICANT_QUERY,
+                       (applicant_name, last - first, first))
+        results = cursor.fetchall()
         cursor.close()
 
-    # Close the database connection
-    conn.close()
+        if not results:
+            logger.debug(f"No patents found for applicant: {applicant_name}")
+            return None
+
+        patents = [patent_from_row(result) for result in results]
+        _attach_applicants_and_sdgs(conn, patents)
 
     logger.debug(
         f"All patents fetched successfully for applicant: {applicant_name}")
@@ -564,7 +936,7 @@ def get_all_patents_by_applicant(applicant_name: str, first: int = 0, last: int
     }
 
 
-def search_patents(text: str = None, patent_number: str = None, publication_date: str = None, country: str = None, applicant: str = None, sdgs: list[str] = None, first: int = 0, last: int = 99) -> dict:
+def search_patents(text: str = None, patent_number: str = None, publication_date: str = None, country: str = None, applicant: str = None, sdgs: list[str] = None, first: int = 0, last: int = 99, after: str = None, count_strategy: str = "exact") -> dict:
     """Search patents in the PostgreSQL database based on various criteria.
 
     Args:
@@ -575,153 +947,57 @@ def search_patents(text: str = None, patent_number: str = None, publication_date
         sdgs (list[str], optional): List of SDGs to search for. Defaults to None.
         first (int, optional): Starting index for pagination. Defaults to 0.
         last (int, optional): Ending index for pagination. Defaults to 100.
+        after (str, optional): Cursor of the last patent of the previous page, see
+            `build_search_queries`. Defaults to None.
+        count_strategy (str, optional): How `total_count` is computed, one of
+            `COUNT_STRATEGIES`. Defaults to "exact".
 
     Returns:
         dict: A dictionary containing search results with pagination.
+
+    Raises:
+        ValueError: If the cursor or the count strategy is invalid.
     """
     logger.debug("Searching patents with criteria: "
                  f"text={text}, patent_number={patent_number}, publication_date={publication_date}, country={country}, applicant={applicant}, sdgs={sdgs}")
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Build the base query
-    base_query = """
-    SELECT patent.number, patent.en_title, patent.fr_title, patent.de_title, patent.en_abstract, patent.fr_abstract, patent.de_abstract, patent.country, patent.publication_date, patent.is_analyzed
-    FROM patent
-    """
-
-    # Initialize conditions and parameters
-    conditions = []
-    params = []
+    check_count_strategy(count_strategy)
+    page_last = last + 1 if count_strategy == "has_more" else last
+    count_query, count_params, page_query, page_params = build_search_queries(
+        text, patent_number, publication_date, country, applicant, sdgs, first, page_last, after)
+    no_results = build_page([], first, last, 0, True, False, keyset=False)
 
-    if text:
-        conditions.append(
-            "(LOWER(patent.en_title) LIKE LOWER(%s) OR LOWER(patent.fr_title) LIKE LOWER(%s) OR LOWER(patent.de_title) LIKE LOWER(%s) OR LOWER(patent.en_abstract) LIKE LOWER(%s) OR LOWER(patent.fr_abstract) LIKE LOWER(%s) OR LOWER(patent.de_abstract) LIKE LOWER(%s))")
-        text_param = f"%{text}%"
-        params.extend([text_param] * 6)
-
-    if patent_number:
-        conditions.append("patent.number LIKE %s")
-        params.append(f"%{patent_number}%")
-
-    if publication_date:
-        conditions.append("patent.publication_date LIKE %s")
-        params.append(f"%{publication_date}%")
-
-    if country:
-        conditions.append("patent.country = %s")
-        params.append(country)
-
-    if applicant:
-        conditions.append(
-            "EXISTS (SELECT 1 FROM patent_applicant WHERE patent_applicant.patent_number = patent.number AND LOWER(patent_applicant.applicant_name) LIKE LOWER(%s))")
-        params.append(f"%{applicant}%")
-
-    if sdgs:
-        conditions.append(
-            "EXISTS (SELECT 1 FROM patent_sdg_summary WHERE patent_sdg_summary.patent_number = patent.number AND sdg IN %s)")
-        params.append(tuple(sdgs))
-
-    # Combine conditions into the query
-    if conditions:
-        base_query += " WHERE " + " AND ".join(conditions)
-
-    # Add ordering and pagination
-    base_query += " ORDER BY patent.publication_date DESC, patent.number ASC LIMIT %s OFFSET %s;"
-    params.extend([last - first, first])
-
-    # Get total count of patents matching the search criteria
-    count_query = """
-    SELECT COUNT(*)
-    FROM patent
-    """
-    if conditions:
-        count_query += " WHERE " + " AND ".join(conditions)
-    cursor.execute(count_query, params[:-2])  # Exclude pagination params
-    total_patents = cursor.fetchone()[0]
-    logger.debug(f"Total patents matching criteria: {total_patents}")
-    if total_patents == 0:
-        logger.debug("No patents found matching the search criteria.")
-        return {
-            "patents": [],
-            "total_count": 0,
-            "first": first,
-            "last": last,
-            "total_results": 0
-        }
-    logger.debug(f"Executing search query with params: {params}")
-
-    # Execute the query
-    cursor.execute(base_query, params)
-    results = cursor.fetchall()
-    cursor.close()
-    if not results:
-        logger.debug("No patents found matching the search criteria.")
-        return {
-            "patents": [],
-            "total_count": 0,
-            "first": first,
-            "last": last,
-            "total_results": 0
-        }
-    patents = []
-    for result in results:
-        patents.append({
-            "number": result[0],
-            "en_title": result[1],
-            "fr_title": result[2],
-            "de_title": result[3],
-            "en_abstract": result[4],
-            "fr_abstract": result[5],
-            "de_abstract": result[6],
-            "country": result[7],
-            "publication_date": result[8],
-            "is_analyzed": result[9],
-            "applicants": [],
-            "sdgs": [],
-        })
-
-        # Fetch the applicants for each patent
-        fetch_applicants_query = """
-        SELECT applicant_name, patent_number
-        FROM patent_applicant
-        WHERE patent_number = %s;
-        """
+    with db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(fetch_applicants_query, (result[0],))
-        applicants = cursor.fetchall()
-        for applicant in applicants:
-            patents[-1]["applicants"].append({
-                "name": applicant[0],
-                "patent_number": applicant[1]
-            })
-        cursor.close()
 
-        # Fetch the SDGs for each patent
-        fetch_sdgs_query = """
-        SELECT DISTINCT sdg
-        FROM patent_sdg_summary
-        WHERE patent_number = %s;
-        """
-        cursor = conn.cursor()
-        cursor.execute(fetch_sdgs_query, (result[0],))
-        sdgs = cursor.fetchall()
-        for sdg in sdgs:
-            if (sdg[0] != 'None'):
-                patents[-1]["sdgs"].append(sdg[0])
+        # Get total count of patents matching the search criteria
+        total_patents, total_count_exact = None, False
+        if count_strategy != "has_more":
+            total_patents, total_count_exact = _count_patents(
+                cursor, count_query, count_params, count_strategy)
+            logger.debug(f"Total patents matching criteria: {total_patents}")
+            if total_patents == 0 and total_count_exact:
+                logger.debug("No patents found matching the search criteria.")
+                return no_results
+        logger.debug(f"Executing search query with params: {page_params}")
+
+        # Execute the query
+        cursor.execute(page_query, page_params)
+        results = cursor.fetchall()
         cursor.close()
-    # Close the database connection
-    conn.close()
+        if not results:
+            logger.debug("No patents found matching the search criteria.")
+            return no_results
+
+        results, has_more = split_extra_row(
+            results, last - first, count_strategy)
+        patents = [patent_from_row(result) for result in results]
+        _attach_applicants_and_sdgs(conn, patents)
+
     logger.debug("Patent search completed successfully")
 
-    return {
-        "patents": patents,
-        "total_count": total_patents,
-        "first": first,
-        "last": min(last, total_patents),
-        "total_results": len(patents)
-    }
+    return build_page(patents, first, last, total_patents, total_count_exact, has_more,
+                      keyset=after is not None or not text)
 
 
 def update_full_patent(patent: dict) -> None:
@@ -741,63 +1017,61 @@ def update_full_patent(patent: dict) -> None:
 
     logger.debug(f"Updating patent data for number: {number}")
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    # Update patent data in the database
-    update_patent_query = """
-    UPDATE patent
-    SET en_title = %s, fr_title = %s, de_title = %s, en_abstract = %s, fr_abstract = %s, de_abstract = %s, country = %s, publication_date = %s, is_analyzed = %s
-    WHERE number = %s;
-    """
-
-    cursor.execute(update_patent_query, (
-        patent["en_title"],
-        patent["fr_title"],
-        patent["de_title"],
-        patent["en_abstract"],
-        patent["fr_abstract"],
-        patent["de_abstract"],
-        patent["country"],
-        patent["publication_date"],
-        patent["is_analyzed"],
-        number
-    ))
-
-    # Update claims in the patent_claim table
-    for claim in patent["claims"]:
-        update_claim_query = """
-        UPDATE patent_claim
-        SET claim_text = %s
-        WHERE claim_number = %s AND patent_number = %s;
+        # Update patent data in the database
+        update_patent_query = """
+        UPDATE patent
+        SET en_title = %s, fr_title = %s, de_title = %s, en_abstract = %s, fr_abstract = %s, de_abstract = %s, country = %s, publication_date = %s, is_analyzed = %s
+        WHERE number = %s;
         """
 
-        cursor.execute(update_claim_query, (
-            claim["claim_text"],
-            int(claim["claim_number"]),
+        cursor.execute(update_patent_query, (
+            patent["en_title"],
+            patent["fr_title"],
+            patent["de_title"],
+            patent["en_abstract"],
+            patent["fr_abstract"],
+            patent["de_abstract"],
+            patent["country"],
+            patent["publication_date"],
+            patent["is_analyzed"],
             number
         ))
 
-    conn.commit()
-
-    # Update description in the patent_description table
-    for description in patent["description"]:
-        update_description_query = """
-        UPDATE patent_description
-        SET description_text = %s
-        WHERE description_number = %s AND patent_number = %s;
-        """
-
-        cursor.execute(update_description_query, (
-            description["description_text"],
-            int(description["description_number"]),
-            number
-        ))
-    conn.commit()
+        # Update claims in the patent_claim table
+        for claim in patent["claims"]:
+            update_claim_query = """
+            UPDATE patent_claim
+            SET claim_text = %s
+            WHERE claim_number = %s AND patent_number = %s;
+            """
+
+            cursor.execute(update_claim_query, (
+                claim["claim_text"],
+                int(claim["claim_number"]),
+                number
+            ))
+
+        conn.commit()
+
+        # Update description in the patent_description table
+        for description in patent["description"]:
+            update_description_query = """
+            UPDATE patent_description
+            SET description_text = %s
+            WHERE description_number = %s AND patent_number = %s;
+            """
+
+            cursor.execute(update_description_query, (
+                description["description_text"],
+                int(description["description_number"]),
+                number
+            ))
+        conn.commit()
+        cursor.close()
 
-    # Close the database connection
-    cursor.close()
-    conn.close()
     logger.debug(
         f"Patent data updated successfully for number: {number}")
 
@@ -805,6 +1079,9 @@ def update_full_patent(patent: dict) -> None:
 if __name__ == "__main__":
     from pprint import pprint
 
+    # Count the statements of the connections for the round-trip benchmark below
+    db_pool.count_queries = True
+
     # Example usage of the repository functions
     patent_example = {
         "number": "EP000000A1",
@@ -843,3 +1120,22 @@ if __name__ == "__main__":
 
     for patent in search_results["patents"]:
         pprint(patent)
+
+    # Regression benchmark: the number of round trips of the list endpoints
+    # must not depend on the page size
+    for name, list_patents in [
+        ("get_all_patents", lambda first, last: get_all_patents(first, last)),
+        ("search_patents", lambda first, last: search_patents(
+            text="a", first=first, last=last)),
+        ("get_all_patents_by_applicant", lambda first, last: get_all_patents_by_applicant(
+            "John Doe", first, last)),
+    ]:
+        round_trips = {}
+        for page_size in [1, 10, 100]:
+            count_cache.clear()
+            queries_before = get_pool_stats()["queries"]
+            list_patents(0, page_size)
+            round_trips[page_size] = get_pool_stats()["queries"] - queries_before
+        print(f"{name}: round trips by page size {round_trips}")
+        assert len(set(round_trips.values())) == 1, \
+            f"{name} round trips depend on the page size: {round_trips}"
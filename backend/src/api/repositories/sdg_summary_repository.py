@@ -1,7 +1,133 @@
-from api.config.db_config import get_db_connection
+from api.config.db_config import db_connection
 from api.config.logging_config import logger
 
 
+# Queries shared by the synchronous and asynchronous repositories
+
+FETCH_SDG_SUMMARY_QUERY = """
+SELECT patent_number, sdg, sdg_reason, sdg_details, model_name, prompt_version, analyzed_at
+FROM patent_sdg_summary
+WHERE patent_number = %s
+ORDER BY sdg;
+"""
+
+FETCH_SDGS_BY_PATENT_NUMBERS_QUERY = """
+SELECT patent_number, sdg
+FROM patent_sdg_summary
+WHERE patent_number = ANY(%s)
+ORDER BY patent_number, sdg;
+"""
+
+# The patent counts by SDG and country are kept in the `patent_sdg_country_stats`
+# rollup table, updated with each new SDG summary (see `init_db.create_sdg_country_stats_table`)
+FETCH_SDG_COUNTRY_STATS_QUERY = """
+SELECT sdg, country, patent_count
+FROM patent_sdg_country_stats
+WHERE sdg = ANY(%s) AND patent_count > 0
+ORDER BY sdg, country;
+"""
+
+# Inserts an SDG summary and counts its patent in the rollup if the summary is new
+INSERT_SDG_SUMMARY_QUERY = """
+WITH inserted AS (
+    INSERT INTO patent_sdg_summary (patent_number, sdg, sdg_reason, sdg_details, model_name, prompt_version)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT (patent_number, sdg) DO NOTHING
+    RETURNING patent_number, sdg
+)
+INSERT INTO patent_sdg_country_stats (sdg, country, patent_count)
+SELECT inserted.sdg, patent.country, 1
+FROM inserted
+JOIN patent ON patent.number = inserted.patent_number
+WHERE inserted.sdg != 'None' AND patent.country IS NOT NULL
+ON CONFLICT (sdg, country) DO UPDATE
+SET patent_count = patent_sdg_country_stats.patent_count + EXCLUDED.patent_count;
+"""
+
+# Deletes the SDG summaries of a patent and uncounts its patent from the rollup
+DELETE_SDG_SUMMARIES_QUERY = """
+WITH deleted AS (
+    DELETE FROM patent_sdg_summary
+    WHERE patent_number = %s
+    RETURNING patent_number, sdg
+)
+UPDATE patent_sdg_country_stats
+SET patent_count = patent_sdg_country_stats.patent_count - 1
+FROM deleted
+JOIN patent ON patent.number = deleted.patent_number
+WHERE patent_sdg_country_stats.sdg = deleted.sdg
+AND patent_sdg_country_stats.country = patent.country
+AND deleted.sdg != 'None';
+"""
+
+SET_PATENT_ANALYZED_QUERY = """
+UPDATE patent
+SET is_analyzed = %s
+WHERE number = %s;
+"""
+
+REBUILD_SDG_COUNTRY_STATS_QUERIES = [
+    "DELETE FROM patent_sdg_country_stats;",
+    """
+    INSERT INTO patent_sdg_country_stats (sdg, country, patent_count)
+    SELECT pss.sdg, p.country, COUNT(DISTINCT p.number)
+    FROM patent p
+    INNER JOIN patent_sdg_summary pss ON p.number = pss.patent_number
+    WHERE pss.sdg != 'None' AND p.country IS NOT NULL
+    GROUP BY pss.sdg, p.country;
+    """,
+]
+
+
+def sdg_summary_from_row(row: tuple) -> dict:
+    """
+    Convert a row of `FETCH_SDG_SUMMARY_QUERY` to an SDG summary dictionary.
+
+    Args:
+        row (tuple): The row.
+
+    Returns:
+        dict: The SDG summary.
+    """
+    return {
+        "patent_number": row[0],
+        "sdg": row[1],
+        "sdg_reason": row[2],
+        "sdg_details": row[3],
+        "model_name": row[4],
+        "prompt_version": row[5],
+        "analyzed_at": row[6],
+    }
+
+
+def build_stats(sdgs: list[int], rows: list[tuple]) -> dict:
+    """
+    Build the patent statistics from the rows of `FETCH_SDG_COUNTRY_STATS_QUERY`.
+
+    Args:
+        sdgs (list[int]): The valid SDG numbers requested.
+        rows (list[tuple]): The (sdg, country, patent_count) rows.
+
+    Returns:
+        dict: The statistics, see `get_stats`.
+    """
+    stats = {str(sdg): {} for sdg in sdgs}
+    total_patents = 0
+    countries_found = set()
+
+    for sdg, country, count in rows:
+        stats[sdg.removeprefix("SDG")][country] = count
+        countries_found.add(country)
+        total_patents += count
+
+    return {
+        "stats": stats,
+        "sdgs_processed": sdgs,
+        "total_patents": total_patents,
+        "countries_found": sorted(list(countries_found))
+    }
+
+
 def create_sdg_summary(sdg_summary: dict):
     """
     Insert SDG summary data into the PostgreSQL database.
@@ -12,6 +138,8 @@ def create_sdg_summary(sdg_summary: dict):
             - sdg (str): The SDG related to the patent.
             - sdg_reason (str): The reason why the patent is related to the SDG.
             - sdg_details (str): The text related to the SDG in the patent.
+            - model_name (str, optional): The model which produced the summary.
+            - prompt_version (str, optional): The versions of the prompts which produced the summary.
 
     Returns:
         None
@@ -19,42 +147,89 @@ def create_sdg_summary(sdg_summary: dict):
     logger.debug(
         f"Inserting SDG summary data for patent number: {sdg_summary['patent_number']}")
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
+
+        # Insert SDG summary data into the sdg_summary table and update the statistics
+        cursor.execute(INSERT_SDG_SUMMARY_QUERY, (
+            sdg_summary["patent_number"],
+            sdg_summary["sdg"],
+            sdg_summary["sdg_reason"],
+            sdg_summary["sdg_details"],
+            sdg_summary.get("model_name"),
+            sdg_summary.get("prompt_version")
+        ))
+
+        conn.commit()
+        cursor.close()
+
+        # Set is_analyzed to True for the patent in the patents table
+        cursor = conn.cursor()
+        cursor.execute(SET_PATENT_ANALYZED_QUERY,
+                       (True, sdg_summary["patent_number"]))
+        conn.commit()
+        cursor.close()
 
-    # Insert SDG summary data into the sdg_summary table
-    insert_sdg_summary_query = """
-    INSERT INTO patent_sdg_summary (patent_number, sdg, sdg_reason, sdg_details)
-    VALUES (%s, %s, %s, %s)
-    ON CONFLICT (patent_number, sdg) DO NOTHING;
+    logger.debug(
+        f"SDG summary data inserted successfully for patent number: {sdg_summary['patent_number']}")
+
+
+def replace_sdg_summaries(patent_number: str, sdg_summaries: list[dict]) -> None:
     """
+    Replace all the SDG summaries of a patent in a single transaction.
+
+    The previous summaries are uncounted from the statistics rollup and the new
+    ones counted, so concurrent readers see either the old or the new analysis.
+
+    Args:
+        patent_number (str): The patent number.
+        sdg_summaries (list[dict]): The new SDG summaries, see `create_sdg_summary`.
 
-    cursor.execute(insert_sdg_summary_query, (
-        sdg_summary["patent_number"],
-        sdg_summary["sdg"],
-        sdg_summary["sdg_reason"],
-        sdg_summary["sdg_details"]
-    ))
+    Returns:
+        None
+    """
+    replace_sdg_summaries_batch({patent_number: sdg_summaries})
 
-    conn.commit()
-    cursor.close()
 
-    # Set is_analyzed to True for the patent in the patents table
-    update_patent_query = """
-    UPDATE patent
-    SET is_analyzed = TRUE
-    WHERE number = %s;
+def replace_sdg_summaries_batch(sdg_summaries_by_patent: dict[str, list[dict]]) -> None:
     """
-    cursor = conn.cursor()
-    cursor.execute(update_patent_query, (sdg_summary["patent_number"],))
-    conn.commit()
-    cursor.close()
+    Replace the SDG summaries of many patents in a single transaction, e.g. to
+    store the results of a batch analysis.
+
+    Args:
+        sdg_summaries_by_patent (dict[str, list[dict]]): The new SDG summaries by patent
+            number, see `create_sdg_summary`. A patent without summaries is marked as not analyzed.
 
-    # Close the database connection
-    conn.close()
+    Returns:
+        None
+    """
+    logger.debug(
+        f"Replacing the SDG summaries of {len(sdg_summaries_by_patent)} patents")
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(DELETE_SDG_SUMMARIES_QUERY, [
+                               (patent_number,) for patent_number in sdg_summaries_by_patent])
+            cursor.executemany(INSERT_SDG_SUMMARY_QUERY, [(
+                patent_number,
+                sdg_summary["sdg"],
+                sdg_summary["sdg_reason"],
+                sdg_summary["sdg_details"],
+                sdg_summary.get("model_name"),
+                sdg_summary.get("prompt_version")
+            ) for patent_number, sdg_summaries in sdg_summaries_by_patent.items() for sdg_summary in sdg_summaries])
+            cursor.executemany(SET_PATENT_ANALYZED_QUERY, [(
+                bool(sdg_summaries), patent_number) for patent_number, sdg_summaries in sdg_summaries_by_patent.items()])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
 
     logger.debug(
-        f"SDG summary data inserted successfully for patent number: {sdg_summary['patent_number']}")
+        f"SDG summaries of {len(sdg_summaries_by_patent)} patents replaced successfully")
 
 
 def get_sdg_summary_by_patent_number(patent_number: str) -> list:
@@ -70,25 +245,17 @@ def get_sdg_summary_by_patent_number(patent_number: str) -> list:
     logger.debug(
         f"Retrieving SDG summary data for patent number: {patent_number}")
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    # Retrieve SDG summary data for the specified patent number
-    select_sdg_summary_query = """
-    SELECT patent_number, sdg, sdg_reason, sdg_details
-    FROM patent_sdg_summary
-    WHERE patent_number = %s;
-    """
-
-    cursor.execute(select_sdg_summary_query, (patent_number,))
-    rows = cursor.fetchall()
+        # Retrieve SDG summary data for the specified patent number
+        cursor.execute(FETCH_SDG_SUMMARY_QUERY, (patent_number,))
+        rows = cursor.fetchall()
 
-    # Convert the result to a list of dictionaries
-    sdg_summary_list = [
-        {"patent_number": row[0], "sdg": row[1], "sdg_reason": row[2], "sdg_details": row[3]} for row in rows]
+        # Convert the result to a list of dictionaries
+        sdg_summary_list = [sdg_summary_from_row(row) for row in rows]
 
-    cursor.close()
-    conn.close()
+        cursor.close()
 
     logger.debug(
         f"SDG summary data retrieved successfully for patent number: {patent_number}")
@@ -96,6 +263,38 @@ def get_sdg_summary_by_patent_number(patent_number: str) -> list:
     return sdg_summary_list
 
 
+def get_sdgs_by_patent_numbers(patent_numbers: list[str]) -> dict:
+    """
+    Retrieve the SDGs of many patents from the PostgreSQL database in a single query.
+
+    Args:
+        patent_numbers (list[str]): The patent numbers to search for.
+
+    Returns:
+        dict: The SDGs of the summaries of each patent, by patent number. Patents
+            without SDG summary are missing.
+    """
+    logger.debug(f"Retrieving SDGs for {len(patent_numbers)} patents")
+
+    if not patent_numbers:
+        return {}
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(FETCH_SDGS_BY_PATENT_NUMBERS_QUERY,
+                       (list(patent_numbers),))
+        rows = cursor.fetchall()
+        cursor.close()
+
+    sdgs_by_number = {}
+    for patent_number, sdg in rows:
+        sdgs_by_number.setdefault(patent_number, []).append(sdg)
+
+    logger.debug(f"SDGs retrieved successfully for {len(sdgs_by_number)} patents")
+
+    return sdgs_by_number
+
+
 def get_stats(sdgs: list[int]) -> dict:
     """
     Get patent statistics by SDG and country from the PostgreSQL database.
@@ -135,71 +334,48 @@ def get_stats(sdgs: list[int]) -> dict:
     if not valid_sdgs:
         logger.warning(
             "No valid SDG numbers provided (must be between 1 and 17)")
-        return {
-            "stats": {},
-            "sdgs_processed": [],
-            "total_patents": 0,
-            "countries_found": []
-        }
-
-    conn = get_db_connection()
-    stats = {}
-    total_patents = 0
-    countries_found = set()
-
-    try:
-        for sdg in valid_sdgs:
-            logger.debug(f"Processing SDG {sdg}")
-
-            # Query to count patents by country for a specific SDG
-            fetch_stats_query = """
-            SELECT p.country, COUNT(DISTINCT p.number) as patent_count
-            FROM patent p
-            INNER JOIN patent_sdg_summary pss ON p.number = pss.patent_number
-            WHERE pss.sdg = %s AND pss.sdg != 'None'
-            GROUP BY p.country
-            ORDER BY p.country;
-            """
+        return build_stats([], [])
 
+    with db_connection() as conn:
+        try:
+            # Read the counts of every requested SDG from the rollup table
             cursor = conn.cursor()
-            cursor.execute(fetch_stats_query, (f"SDG{sdg}",))
+            cursor.execute(FETCH_SDG_COUNTRY_STATS_QUERY,
+                           ([f"SDG{sdg}" for sdg in valid_sdgs],))
             results = cursor.fetchall()
             cursor.close()
 
-            # Initialize SDG entry in stats
-            stats[str(sdg)] = {}
-            sdg_total = 0
+        except Exception as e:
+            logger.error(f"Error fetching patent statistics: {str(e)}")
+            raise e
 
-            # Process results for current SDG
-            for result in results:
-                country = result[0]
-                count = result[1]
-                stats[str(sdg)][country] = count
-                countries_found.add(country)
-                sdg_total += count
+    logger.debug(
+        f"Patent statistics fetched successfully for {len(valid_sdgs)} SDGs")
 
-            total_patents += sdg_total
-            logger.debug(
-                f"SDG {sdg}: {sdg_total} patents found across {len(stats[str(sdg)])} countries")
+    return build_stats(valid_sdgs, results)
 
-    except Exception as e:
-        logger.error(f"Error fetching patent statistics: {str(e)}")
-        conn.close()
-        raise e
 
-    finally:
-        # Close the database connection
-        conn.close()
+def rebuild_sdg_country_stats() -> None:
+    """
+    Recompute the `patent_sdg_country_stats` rollup table from the SDG summaries.
 
-    logger.debug(
-        f"Patent statistics fetched successfully for {len(valid_sdgs)} SDGs")
+    The table is updated incrementally by `create_sdg_summary`. A rebuild is only
+    needed after changes made outside of the repositories, e.g. patent countries
+    edited by hand or summaries deleted.
 
-    return {
-        "stats": stats,
-        "sdgs_processed": valid_sdgs,
-        "total_patents": total_patents,
-        "countries_found": sorted(list(countries_found))
-    }
+    Returns:
+        None
+    """
+    logger.debug("Rebuilding SDG statistics by country")
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        for query in REBUILD_SDG_COUNTRY_STATS_QUERIES:
+            cursor.execute(query)
+        conn.commit()
+        cursor.close()
+
+    logger.debug("SDG statistics by country rebuilt successfully")
 
 
 if __name__ == "__main__":
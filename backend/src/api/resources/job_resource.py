@@ -0,0 +1,87 @@
+from uuid import UUID
+from fastapi import APIRouter, HTTPException, Query, UploadFile
+
+from api.models.Job import Job
+from api.services import job_service
+from api.config.logging_config import logger
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["Jobs"],
+)
+
+
+@router.post("/analyze/{patent_number}", response_model=Job, status_code=202)
+async def submit_patent_analysis(patent_number: str, force: bool = Query(False, description="Analyze the patent again even if it has stored SDG summaries.")) -> Job:
+    """
+    Queue the analysis of a patent by its number.
+
+    The analysis runs in the background: poll `GET /jobs/{job_id}` for its status and result.
+
+    Args:
+        patent_number (str): The patent number to analyze.
+        force (bool, optional): True to analyze the patent again even if it has stored SDG summaries.
+
+    Returns:
+        Job: The queued job.
+    """
+    logger.debug(f"Queuing analysis of patent {patent_number}")
+
+    try:
+        job = await job_service.submit_patent_analysis(patent_number, force)
+    except Exception as e:
+        logger.error(f"Error queuing analysis of patent {patent_number}: {e}")
+        raise HTTPException(
+            status_code=500, detail="Error queuing patent analysis.")
+
+    return job
+
+
+@router.post("/analyze", response_model=Job, status_code=202)
+async def submit_pdf_analysis(pdf_file: UploadFile) -> Job:
+    """
+    Queue the analysis of a patent PDF file.
+
+    The analysis runs in the background: poll `GET /jobs/{job_id}` for its status and result.
+
+    Args:
+        pdf_file (UploadFile): The PDF file to analyze.
+
+    Returns:
+        Job: The queued job.
+    """
+    logger.debug(f"Queuing analysis of PDF {pdf_file.filename}")
+
+    pdf_bytes = await pdf_file.read()
+    if not pdf_bytes:
+        logger.warning("Empty PDF file.")
+        raise HTTPException(status_code=400, detail="Empty PDF file.")
+
+    try:
+        job = await job_service.submit_pdf_analysis(pdf_bytes, pdf_file.filename)
+    except Exception as e:
+        logger.error(f"Error queuing analysis of PDF {pdf_file.filename}: {e}")
+        raise HTTPException(
+            status_code=500, detail="Error queuing PDF analysis.")
+
+    return job
+
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job(job_id: UUID) -> Job:
+    """
+    Get the status of an analysis job, and its SDG summaries once it succeeded.
+
+    Args:
+        job_id (UUID): The job identifier.
+
+    Returns:
+        Job: The job.
+    """
+    job = await job_service.get_job(str(job_id))
+
+    if not job:
+        logger.warning(f"Job {job_id} not found.")
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    return job
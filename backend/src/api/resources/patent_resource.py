@@ -1,5 +1,9 @@
+import asyncio
+import json
 from api.models.Stats import Stats
 from fastapi import APIRouter, HTTPException, Header, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 from api.models.SDGSummary import SDGSummary
 from api.models.Patent import Patent, FullPatent, PatentList
@@ -11,16 +15,25 @@ router = APIRouter(
     tags=["Patents"],
 )
 
+# Streamed analyses running in the background, referenced until they are done
+_analysis_tasks = set()
+
 
 @router.get("/", response_model=PatentList)
 async def get_all_patents(
-    range_header: str = Header(default="1-100", alias="Range")
+    range_header: str = Header(default="1-100", alias="Range"),
+    after: str = Query(
+        None, description="Cursor returned as `next_cursor` by the previous page. Pages then start after the cursor instead of at the range start."),
+    count: str = Query(
+        "exact", description="How the total count is computed: 'exact' (cached for a short time), 'estimated' (planner estimate for unfiltered listings) or 'has_more' (no count).")
 ) -> PatentList:
     """
     Get all patents in the database within a specified range.
 
     Args:
         range_header (str): The range of patents to retrieve (e.g., "1-100"). The range cannot exceed 100 patents.
+        after (str): The cursor of the previous page. When set, only the size of the range is used.
+        count (str): The count strategy ("exact", "estimated" or "has_more").
 
     Returns:
         PatentList: A list of patents within the specified range.
@@ -42,7 +55,11 @@ async def get_all_patents(
         )
 
     # Call the service function to get all patents
-    patents = patent_service.get_all_patents(first, last)
+    try:
+        patents = await patent_service.get_all_patents(first, last, after, count)
+    except ValueError as e:
+        logger.error(f"Invalid pagination parameters: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
 
     if not patents:
         logger.warning("No patents found.")
@@ -108,7 +125,7 @@ async def get_patent_stats(sdgs: str = Query(..., description="Comma-separated l
 
     # Call the service function to get statistics
     try:
-        stats_result = patent_service.get_stats(sdg_list)
+        stats_result = await patent_service.get_stats(sdg_list)
     except Exception as e:
         logger.error(f"Error getting patent statistics: {e}")
         raise HTTPException(
@@ -133,7 +150,7 @@ async def get_patent_by_number(patent_number: str) -> Patent:
     logger.debug(f"Retrieving patent by number: {patent_number}")
 
     # Call the service function to get the patent
-    patent = patent_service.get_patent_by_number(patent_number)
+    patent = await patent_service.get_patent_by_number(patent_number)
 
     if not patent:
         logger.warning(f"Patent {patent_number} not found.")
@@ -143,20 +160,34 @@ async def get_patent_by_number(patent_number: str) -> Patent:
 
 
 @router.get("/full/{patent_number}", response_model=FullPatent)
-async def get_full_patent_by_number(patent_number: str) -> FullPatent:
+async def get_full_patent_by_number(
+    patent_number: str,
+    fields: str = Query(
+        None, description="Comma-separated parts to fetch among description, claims and sdg_summary. The others are returned empty. Defaults to all of them.")
+) -> FullPatent:
     """
     Retrieve a full patent by its number, including claims and descriptions.
 
     Args:
         patent_number (str): The patent number to search for.
+        fields (str): Comma-separated parts to fetch (e.g. "claims,sdg_summary").
 
     Returns:
         FullPatent: The full patent object if found, None otherwise.
     """
     logger.debug(f"Retrieving full patent by number: {patent_number}")
 
+    field_list = None
+    if fields is not None:
+        field_list = [field.strip()
+                      for field in fields.split(",") if field.strip()]
+
     # Call the service function to get the full patent
-    full_patent = patent_service.get_full_patent_by_number(patent_number)
+    try:
+        full_patent = await patent_service.get_full_patent_by_number(patent_number, field_list)
+    except ValueError as e:
+        logger.error(f"Invalid fields: {fields}")
+        raise HTTPException(status_code=400, detail=str(e))
 
     if not full_patent:
         logger.warning(f"Full patent {patent_number} not found.")
@@ -197,7 +228,7 @@ async def get_all_patents_by_applicant(
         )
 
     # Call the service function to get all patents by applicant
-    patents = patent_service.get_all_patents_by_applicant(
+    patents = await patent_service.get_all_patents_by_applicant(
         applicant_name, first, last)
 
     if not patents:
@@ -212,7 +243,11 @@ async def get_all_patents_by_applicant(
 async def search_patents(
     query: str,
     ops_search: bool = False,
-    range_header: str = Header(default="0-99", alias="Range")
+    range_header: str = Header(default="0-99", alias="Range"),
+    after: str = Query(
+        None, description="Cursor returned as `next_cursor` by the previous page. An empty value starts the cursor pagination, with the results in publication order instead of by relevance."),
+    count: str = Query(
+        "exact", description="How the total count is computed: 'exact' (cached for a short time), 'estimated' (planner estimate for unfiltered listings) or 'has_more' (no count).")
 ) -> PatentList:
     """
     Search for patents based on a query string.
@@ -221,6 +256,8 @@ async def search_patents(
         query (str): The search query string.
         ops_search (bool): Also search in the European Patent Office (EPO) database.
         range_header (str): The range of patents to retrieve (e.g., "0-99"). The range cannot exceed 100 patents.
+        after (str): The cursor of the previous page. When set, only the size of the range is used.
+        count (str): The count strategy ("exact", "estimated" or "has_more").
 
     Returns:
         PatentList: A list of patents matching the search query.
@@ -242,7 +279,11 @@ async def search_patents(
         )
 
     # Call the service function to search patents
-    patents = patent_service.search_patents(query, first, last, ops_search)
+    try:
+        patents = await patent_service.search_patents(query, first, last, ops_search, after, count)
+    except ValueError as e:
+        logger.error(f"Invalid pagination parameters: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
 
     if not patents:
         logger.warning("No patents found for the search query.")
@@ -251,6 +292,30 @@ async def search_patents(
     return patents
 
 
+@router.post("/bulk")
+async def create_patents(patents: list[FullPatent]) -> dict:
+    """
+    Insert many patents with their claims, descriptions and applicants.
+
+    Patents which already exist are left unchanged.
+
+    Args:
+        patents (list[FullPatent]): The patents to insert.
+
+    Returns:
+        dict: The number of patents received and of new patents inserted.
+    """
+    logger.debug(f"Bulk inserting {len(patents)} patents")
+
+    try:
+        inserted = await run_in_threadpool(patent_service.create_patents, patents)
+    except Exception as e:
+        logger.error(f"Error inserting patents: {e}")
+        raise HTTPException(status_code=500, detail="Error inserting patents.")
+
+    return {"received": len(patents), "inserted": inserted}
+
+
 @router.post("/analyze", response_model=list[SDGSummary])
 async def analyze_patent_pdf(pdf_file: UploadFile) -> list[SDGSummary]:
     """
@@ -266,7 +331,9 @@ async def analyze_patent_pdf(pdf_file: UploadFile) -> list[SDGSummary]:
 
     # Call the service function to analyze the PDF
     try:
-        analysis_result = patent_service.analyze_patent_pdf(pdf_file)
+        # The analysis is blocking (OCR and LLM calls), run it in a worker thread
+        analysis_result = await run_in_threadpool(
+            patent_service.analyze_patent_pdf, pdf_file)
     except Exception as e:
         logger.error(f"Error analyzing patent PDF: {e}")
         raise HTTPException(
@@ -276,12 +343,19 @@ async def analyze_patent_pdf(pdf_file: UploadFile) -> list[SDGSummary]:
 
 
 @router.get("/analyze/{patent_number}", response_model=list[SDGSummary])
-async def analyze_patent_by_number(patent_number: str) -> list[SDGSummary]:
+async def analyze_patent_by_number(
+    patent_number: str,
+    force: bool = Query(
+        False, description="Analyze the patent again even if it has stored SDG summaries.")
+) -> list[SDGSummary]:
     """
     Analyze a patent by patent number and extract relevant information.
 
+    The stored SDG summaries of an analyzed patent are returned unless `force` is set.
+
     Args:
         patent_number (str): The patent number to analyze.
+        force (bool): Analyze the patent again and replace its stored SDG summaries.
 
     Returns:
         dict: Extracted information from the patent PDF.
@@ -290,11 +364,93 @@ async def analyze_patent_by_number(patent_number: str) -> list[SDGSummary]:
 
     # Call the service function to analyze the PDF
     try:
-        analysis_result = patent_service.analyze_patent_by_number(
-            patent_number)
+        # The analysis is blocking (OPS and LLM calls), run it in a worker thread
+        analysis_result = await run_in_threadpool(
+            patent_service.analyze_patent_by_number, patent_number, force=force)
     except Exception as e:
         logger.error(f"Error analyzing patent PDF: {e}")
         raise HTTPException(
             status_code=500, detail="Error analyzing patent PDF.")
 
     return analysis_result
+
+
+def format_sse(event: str, data: dict) -> str:
+    """
+    Format a Server-Sent Event.
+
+    Args:
+        event (str): The event name.
+        data (dict): The event data, sent as JSON (dates are sent as ISO strings).
+
+    Returns:
+        str: The event in the `text/event-stream` format.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=lambda value: value.isoformat())}\n\n"
+
+
+@router.get("/analyze/{patent_number}/stream")
+async def stream_patent_analysis(
+    patent_number: str,
+    tokens: bool = Query(
+        False, description="Also stream the text generated by the model as `token` events."),
+    force: bool = Query(
+        False, description="Analyze the patent again even if it has stored SDG summaries.")
+) -> StreamingResponse:
+    """
+    Analyze a patent by patent number and stream the progress as Server-Sent Events.
+
+    Events:
+        - `text_fetched`: the text of the patent is ready (`source`: database or ops, `words`),
+          not sent when the stored SDG summaries of an analyzed patent are returned
+        - `sdgs_classified`: the SDGs of the patent and the reason of the classification
+        - `token`: a chunk generated by the model (`step`: classification or citation, `sdg`, `text`)
+        - `citation_done`: the SDG summary of one SDG
+        - `result`: the list of SDG summaries, sent last
+        - `error`: the analysis failed, sent last
+
+    Args:
+        patent_number (str): The patent number to analyze.
+        tokens (bool): Also stream the generated text.
+        force (bool): Analyze the patent again and replace its stored SDG summaries.
+
+    Returns:
+        StreamingResponse: The `text/event-stream` response.
+    """
+    logger.debug(f"Streaming analysis of patent {patent_number}")
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_event(event: str, data: dict) -> None:
+        # Called from the worker thread running the analysis
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    async def run_analysis() -> None:
+        try:
+            # The analysis is blocking (OPS and LLM calls), run it in a worker thread
+            analysis_result = await run_in_threadpool(
+                patent_service.analyze_patent_by_number, patent_number, on_event, tokens, force)
+            await events.put(("result", [summary.model_dump(mode="json") for summary in analysis_result]))
+        except Exception as e:
+            logger.error(f"Error analyzing patent {patent_number}: {e}")
+            await events.put(("error", {"detail": "Error analyzing patent."}))
+
+    async def event_stream():
+        task = asyncio.create_task(run_analysis())
+        _analysis_tasks.add(task)
+        task.add_done_callback(_analysis_tasks.discard)
+        try:
+            while True:
+                event, data = await events.get()
+                yield format_sse(event, data)
+                if event in ("result", "error"):
+                    break
+        finally:
+            # The analysis goes on if the client disconnects: its summaries are stored
+            if not task.done():
+                logger.debug(
+                    f"Client of the analysis of patent {patent_number} disconnected")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import threading
+from api.config.db_config import db_connection, db_inference_cache_enabled, db_inference_cache_max_entries
+from api.config.logging_config import logger
+
+
+# Gets a cached response and records the access in a single statement
+FETCH_INFERENCE_QUERY = """
+UPDATE llm_inference_cache
+SET hits = hits + 1, accessed_at = now()
+WHERE key = %s
+RETURNING response;
+"""
+
+INSERT_INFERENCE_QUERY = """
+INSERT INTO llm_inference_cache (key, model, prompt_name, prompt_version, temperature, text_hash, sdg, response)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+ON CONFLICT (key) DO UPDATE
+SET response = EXCLUDED.response, accessed_at = now();
+"""
+
+# Deletes the least recently used responses above the maximum number of entries
+EVICT_INFERENCES_QUERY = """
+DELETE FROM llm_inference_cache
+WHERE key IN (
+    SELECT key
+    FROM llm_inference_cache
+    ORDER BY accessed_at DESC
+    OFFSET %s
+);
+"""
+
+# Number of stored responses between two evictions
+EVICTION_INTERVAL = 100
+
+
+def hash_text(text: str) -> str:
+    """
+    Hash an analyzed text for the inference cache.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        str: The SHA-256 hash of the text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class InferenceCache():
+    """
+    Persistent cache of the responses of the language model.
+
+    A response is keyed by the model, the prompt name and version, the
+    temperature, the hash of the analyzed text and the SDG of a citation, so
+    the same text is never sent twice to the model with the same settings.
+    The entries are stored in the `llm_inference_cache` table and the least
+    recently used ones are evicted above `max_entries`.
+    """
+
+    def __init__(self, enabled: bool = True, max_entries: int = 100000):
+        """Initializes the inference cache.
+
+        Args:
+            enabled (bool): False to disable the cache.
+            max_entries (int): The maximum number of cached responses.
+        """
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, model: str, prompt_name: str, prompt_version: int, temperature: float, text_hash: str, sdg: str) -> str:
+        return hashlib.sha256(json.dumps(
+            [model, prompt_name, prompt_version, temperature, text_hash, sdg]).encode("utf-8")).hexdigest()
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, model: str, prompt_name: str, prompt_version: int, temperature: float, text: str, sdg: str = "") -> str:
+        """Gets a cached response.
+
+        Args:
+            model (str): The name of the model.
+            prompt_name (str): The name of the prompt.
+            prompt_version (int): The version of the prompt.
+            temperature (float): The temperature of the generation.
+            text (str): The analyzed text.
+            sdg (str, optional): The SDG of a citation.
+
+        Returns:
+            str: The cached response, None if missing.
+        """
+        if not self.enabled:
+            return None
+
+        key = self._key(model, prompt_name, prompt_version,
+                        temperature, hash_text(text), sdg)
+        try:
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(FETCH_INFERENCE_QUERY, (key,))
+                row = cursor.fetchone()
+                conn.commit()
+                cursor.close()
+        except Exception as e:
+            # The cache is an optimization: generate the response if it is unavailable
+            logger.error(f"Inference cache read failed: {e}")
+            self._count("errors")
+            return None
+
+        self._count("hits" if row else "misses")
+        return row[0] if row else None
+
+    def set(self, model: str, prompt_name: str, prompt_version: int, temperature: float, text: str, sdg: str, response: str) -> None:
+        """Stores a response.
+
+        Args:
+            model (str): The name of the model.
+            prompt_name (str): The name of the prompt.
+            prompt_version (int): The version of the prompt.
+            temperature (float): The temperature of the generation.
+            text (str): The analyzed text.
+            sdg (str): The SDG of a citation ('' for a classification).
+            response (str): The response of the model.
+        """
+        if not self.enabled or not response:
+            return
+
+        text_hash = hash_text(text)
+        key = self._key(model, prompt_name, prompt_version,
+                        temperature, text_hash, sdg)
+
+        with self._lock:
+            self._inserts += 1
+            evict = self._inserts % EVICTION_INTERVAL == 0
+
+        try:
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(INSERT_INFERENCE_QUERY, (key, model, prompt_name,
+                               prompt_version, temperature, text_hash, sdg, response))
+                if evict:
+                    cursor.execute(EVICT_INFERENCES_QUERY, (self.max_entries,))
+                    if cursor.rowcount:
+                        logger.debug(
+                            f"Evicted {cursor.rowcount} responses from the inference cache")
+                conn.commit()
+                cursor.close()
+        except Exception as e:
+            logger.error(f"Inference cache write failed: {e}")
+            self._count("errors")
+
+    def get_stats(self) -> dict:
+        """Gets the hit and miss counters of the cache since the start of the process.
+
+        Returns:
+            dict: The statistics of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+# Cache shared by the classification and citation models
+inference_cache = InferenceCache(
+    enabled=db_inference_cache_enabled,
+    max_entries=db_inference_cache_max_entries
+)
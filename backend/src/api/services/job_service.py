@@ -0,0 +1,187 @@
+import os
+import socket
+import threading
+from api.models.Job import Job
+from api.config.logging_config import logger
+from api.config.job_config import job_workers, job_poll_interval, job_max_attempts, job_stale_after
+from api.repositories import job_repository, async_job_repository
+from api.services import patent_service
+
+
+# Workers running the analysis jobs in the API process, see `start_workers`
+_workers = []
+_worker_names = []
+_stop_event = threading.Event()
+# Set when a job is submitted, so that an idle worker claims it without waiting for the next poll
+_wake_event = threading.Event()
+
+
+async def submit_patent_analysis(patent_number: str, force: bool = False) -> Job:
+    """
+    Queue the analysis of a patent by its number.
+
+    Args:
+        patent_number (str): The patent number to analyze.
+        force (bool, optional): True to analyze the patent again even if it has stored SDG summaries.
+
+    Returns:
+        Job: The queued job.
+    """
+    job = await async_job_repository.create_job("patent", patent_number=patent_number, force=force)
+    _wake_event.set()
+    logger.info(f"Analysis of patent {patent_number} queued as job {job['id']}")
+    return Job(**job)
+
+
+async def submit_pdf_analysis(pdf_bytes: bytes, filename: str = None) -> Job:
+    """
+    Queue the analysis of a patent PDF file.
+
+    Args:
+        pdf_bytes (bytes): The content of the PDF file.
+        filename (str, optional): The name of the file.
+
+    Returns:
+        Job: The queued job.
+    """
+    job = await async_job_repository.create_job("pdf", filename=filename, pdf=pdf_bytes)
+    _wake_event.set()
+    logger.info(f"Analysis of PDF {filename} queued as job {job['id']}")
+    return Job(**job)
+
+
+async def get_job(job_id: str) -> Job:
+    """
+    Get the status and the result of a job.
+
+    Args:
+        job_id (str): The job identifier.
+
+    Returns:
+        Job: The job, None if it does not exist.
+    """
+    job = await async_job_repository.get_job(job_id)
+    return Job(**job) if job else None
+
+
+def run_job(job: dict) -> list[dict]:
+    """
+    Run the analysis of a job.
+
+    Args:
+        job (dict): The claimed job, see `job_repository.claim_job`.
+
+    Returns:
+        list[dict]: The SDG summaries of the analysis.
+
+    Raises:
+        Exception: If the kind of the job is unknown or the analysis fails.
+    """
+    if job["kind"] == "patent":
+        sdg_summaries = patent_service.analyze_patent_by_number(
+            job["patent_number"], force=job["force"])
+    elif job["kind"] == "pdf":
+        sdg_summaries = patent_service.analyze_patent_pdf_bytes(job["pdf"])
+    else:
+        raise Exception(f"Unknown job kind: {job['kind']}")
+
+    return [sdg_summary.model_dump(mode="json") for sdg_summary in sdg_summaries]
+
+
+def _work(worker: str) -> None:
+    """
+    Claim and run the queued jobs until the workers are stopped.
+
+    Args:
+        worker (str): The name of the worker.
+    """
+    logger.debug(f"Analysis worker {worker} started")
+
+    while not _stop_event.is_set():
+        try:
+            job = job_repository.claim_job(worker)
+        except Exception as e:
+            logger.error(f"Analysis worker {worker} failed to claim a job: {e}")
+            _stop_event.wait(job_poll_interval)
+            continue
+
+        if job is None:
+            # Wait for a new job or for the next poll (jobs submitted by other processes)
+            _wake_event.wait(job_poll_interval)
+            _wake_event.clear()
+            continue
+
+        logger.info(
+            f"Analysis worker {worker} running job {job['id']} (attempt {job['attempts']})")
+        try:
+            result = run_job(job)
+            job_repository.complete_job(job["id"], result)
+            logger.info(f"Analysis job {job['id']} succeeded")
+        except Exception as e:
+            logger.error(f"Analysis job {job['id']} failed: {e}")
+            try:
+                job_repository.fail_job(job["id"], str(e), job_max_attempts)
+            except Exception as e:
+                logger.error(
+                    f"Failed to record the failure of analysis job {job['id']}: {e}")
+
+    logger.debug(f"Analysis worker {worker} stopped")
+
+
+def start_workers(workers: int = job_workers) -> None:
+    """
+    Start the worker threads running the analysis jobs.
+
+    Several API processes can run workers on the same database: the jobs are
+    claimed with `SELECT ... FOR UPDATE SKIP LOCKED`.
+
+    Args:
+        workers (int, optional): The number of worker threads.
+    """
+    if _workers:
+        return
+
+    try:
+        job_repository.requeue_stale_jobs(job_stale_after, job_max_attempts)
+    except Exception as e:
+        logger.error(f"Failed to queue the stale analysis jobs again: {e}")
+
+    _stop_event.clear()
+    for index in range(workers):
+        worker = f"{socket.gethostname()}-{os.getpid()}-{index}"
+        thread = threading.Thread(
+            target=_work, args=(worker,), name=f"job-worker-{index}", daemon=True)
+        thread.start()
+        _workers.append(thread)
+        _worker_names.append(worker)
+
+    logger.info(f"{workers} analysis workers started")
+
+
+def stop_workers(timeout: float = 5) -> None:
+    """
+    Stop the worker threads once their current job is done.
+
+    Jobs still running after the timeout are queued again, see
+    `job_repository.requeue_worker_jobs`. The jobs of a process which was
+    killed are queued again by the next start once they are stale, see
+    `job_repository.requeue_stale_jobs`.
+
+    Args:
+        timeout (float, optional): The number of seconds to wait for each worker.
+    """
+    _stop_event.set()
+    _wake_event.set()
+    for thread in _workers:
+        thread.join(timeout)
+
+    if any(thread.is_alive() for thread in _workers):
+        try:
+            job_repository.requeue_worker_jobs(_worker_names)
+        except Exception as e:
+            logger.error(f"Failed to queue the interrupted analysis jobs again: {e}")
+
+    _workers.clear()
+    _worker_names.clear()
+
+    logger.info("Analysis workers stopped")
@@ -0,0 +1,168 @@
+import threading
+from typing import Any
+from ai.models.ClassifyPatent import ClassifyPatent
+from ai.models.CitationPatent import CitationPatent
+from ai.models.prompt.sdg_label_prompt import sdg_label_prompt_parts
+from api.config.ai_config import ai_client, ai_model, prompt_name, ai_models, ai_num_ctx, ai_keep_alive
+from api.config.logging_config import logger
+from api.services.inference_cache import inference_cache
+
+
+# Name of the configuration of the `ai` section (model and prompt_name)
+DEFAULT_MODEL = "default"
+DEFAULT_PROMPT_NAME = "sdg_label_prompt"
+DEFAULT_TEMPERATURE = 0.2
+
+
+class ModelRegistry():
+    """
+    Registry of the classification and citation models of the process.
+
+    Each named configuration (model, classification prompt, temperature) is
+    registered once, and its models are created on first use and then shared
+    by all the analyses, so that the static parts of the prompts are rendered
+    once per process instead of on every analysis.
+    """
+
+    def __init__(self, client: Any, cache: Any = None, num_ctx: int = None, keep_alive: str = None):
+        """Initializes the model registry.
+
+        Args:
+            client (Any): The client of the language model.
+            cache (InferenceCache, optional): The cache of the responses of the models.
+            num_ctx (int, optional): The context size of the models.
+            keep_alive (str, optional): How long the server keeps a model loaded after a request.
+        """
+        self.client = client
+        self.cache = cache
+        self.num_ctx = num_ctx
+        self.keep_alive = keep_alive
+        self._lock = threading.Lock()
+        self._configs = {}
+        self._classifiers = {}
+        self._citation_models = {}
+
+    def register(self, name: str, model_name: str, prompt_name: str = DEFAULT_PROMPT_NAME, temperature: float = DEFAULT_TEMPERATURE) -> None:
+        """Registers a named model configuration, replacing any previous one.
+
+        Args:
+            name (str): The name of the configuration.
+            model_name (str): The name of the language model.
+            prompt_name (str, optional): The name of the classification prompt.
+            temperature (float, optional): The temperature of the generations.
+
+        Raises:
+            ValueError: If the classification prompt is unknown.
+        """
+        # Render the prompt now, so that a wrong configuration fails on startup
+        sdg_label_prompt_parts(prompt_name)
+
+        with self._lock:
+            self._configs[name] = {
+                "model_name": model_name,
+                "prompt_name": prompt_name,
+                "temperature": temperature,
+            }
+            self._classifiers.pop(name, None)
+            self._citation_models.pop(name, None)
+
+        logger.debug(
+            f"Model configuration '{name}' registered: {model_name}, {prompt_name}, temperature {temperature}")
+
+    def get_config(self, name: str = DEFAULT_MODEL) -> dict:
+        """Gets a named model configuration.
+
+        Args:
+            name (str, optional): The name of the configuration.
+
+        Returns:
+            dict: The model name, prompt name and temperature of the configuration.
+
+        Raises:
+            Exception: If the configuration is not registered.
+        """
+        config = self._configs.get(name)
+        if config is None:
+            raise Exception(f"Unknown model configuration: {name}")
+        return config
+
+    def get_names(self) -> list[str]:
+        """Gets the names of the registered configurations.
+
+        Returns:
+            list[str]: The names of the configurations.
+        """
+        return list(self._configs)
+
+    def get_classifier(self, name: str = DEFAULT_MODEL) -> ClassifyPatent:
+        """Gets the classification model of a configuration, created on first use.
+
+        Args:
+            name (str, optional): The name of the configuration.
+
+        Returns:
+            ClassifyPatent: The shared classification model.
+
+        Raises:
+            Exception: If the configuration is not registered.
+        """
+        classifier = self._classifiers.get(name)
+        if classifier is not None:
+            return classifier
+
+        with self._lock:
+            if name not in self._classifiers:
+                config = self.get_config(name)
+                self._classifiers[name] = ClassifyPatent(
+                    self.client, config["model_name"], config["prompt_name"], temperature=config["temperature"], cache=self.cache,
+                    num_ctx=self.num_ctx, keep_alive=self.keep_alive)
+                logger.debug(f"Classification model '{name}' created")
+            return self._classifiers[name]
+
+    def get_citation_model(self, name: str = DEFAULT_MODEL) -> CitationPatent:
+        """Gets the citation model of a configuration, created on first use.
+
+        Args:
+            name (str, optional): The name of the configuration.
+
+        Returns:
+            CitationPatent: The shared citation model.
+
+        Raises:
+            Exception: If the configuration is not registered.
+        """
+        citation_model = self._citation_models.get(name)
+        if citation_model is not None:
+            return citation_model
+
+        with self._lock:
+            if name not in self._citation_models:
+                config = self.get_config(name)
+                self._citation_models[name] = CitationPatent(
+                    self.client, config["model_name"], temperature=config["temperature"], cache=self.cache,
+                    num_ctx=self.num_ctx, keep_alive=self.keep_alive)
+                logger.debug(f"Citation model '{name}' created")
+            return self._citation_models[name]
+
+
+def create_model_registry() -> ModelRegistry:
+    """
+    Create the model registry of the `ai` configuration: the "default"
+    configuration and the named ones of `ai.models`, which default to the
+    values of the "default" configuration.
+
+    Returns:
+        ModelRegistry: The model registry.
+    """
+    registry = ModelRegistry(ai_client, cache=inference_cache,
+                             num_ctx=ai_num_ctx, keep_alive=ai_keep_alive)
+    registry.register(DEFAULT_MODEL, ai_model,
+                      prompt_name or DEFAULT_PROMPT_NAME)
+    for name, config in ai_models.items():
+        registry.register(name, config.get("model", ai_model), config.get("prompt_name", prompt_name or DEFAULT_PROMPT_NAME),
+                          float(config.get("temperature", DEFAULT_TEMPERATURE)))
+    return registry
+
+
+# Models shared by the analyses of the process
+model_registry = create_model_registry()
@@ -0,0 +1,230 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from api.config.logging_config import logger
+from api.config.ops_config import ops_cache_enabled, ops_cache_path, ops_cache_max_size
+
+
+# Published documents never change for a given kind code, so only the numbers
+# ending with a kind code (e.g. EP4322066A1 or EP.4322066.A1) are cached
+CACHEABLE_NUMBER_PATTERN = re.compile(r"^[A-Z]{2}\.?[0-9]+\.?[A-Z][0-9]?$")
+
+CREATE_CACHE_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS ops_response (
+        endpoint TEXT NOT NULL,
+        format TEXT NOT NULL,
+        number TEXT NOT NULL,
+        data BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        accessed_at REAL NOT NULL,
+        PRIMARY KEY (endpoint, format, number)
+    )
+"""
+CREATE_CACHE_INDEX_QUERY = "CREATE INDEX IF NOT EXISTS ops_response_accessed_at_idx ON ops_response (accessed_at)"
+FETCH_CACHE_SIZE_QUERY = "SELECT COALESCE(SUM(size), 0) FROM ops_response"
+FETCH_CACHE_ENTRY_QUERY = "SELECT data FROM ops_response WHERE endpoint = ? AND format = ? AND number = ?"
+TOUCH_CACHE_ENTRY_QUERY = "UPDATE ops_response SET accessed_at = ? WHERE endpoint = ? AND format = ? AND number = ?"
+FETCH_CACHE_ENTRY_SIZE_QUERY = "SELECT size FROM ops_response WHERE endpoint = ? AND format = ? AND number = ?"
+INSERT_CACHE_ENTRY_QUERY = """
+    INSERT OR REPLACE INTO ops_response (endpoint, format, number, data, size, accessed_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+FETCH_LEAST_RECENTLY_USED_QUERY = "SELECT endpoint, format, number, size FROM ops_response ORDER BY accessed_at LIMIT ?"
+DELETE_CACHE_ENTRY_QUERY = "DELETE FROM ops_response WHERE endpoint = ? AND format = ? AND number = ?"
+
+# Share of the maximum size kept after an eviction, so that evictions are not run on every insert
+EVICTION_TARGET = 0.9
+
+
+def is_cacheable(number: str) -> bool:
+    """Checks if the OPS data of a patent number can be cached.
+
+    Args:
+        number (str): The patent number.
+
+    Returns:
+        bool: True if the number has a kind code.
+    """
+    return bool(number) and CACHEABLE_NUMBER_PATTERN.match(number) is not None
+
+
+class OpsCache():
+    """
+    On-disk cache of OPS responses, stored as zlib compressed JSON in SQLite.
+
+    The entries are keyed by endpoint (biblio, description, claims), number
+    format and patent number, and the least recently used entries are evicted
+    when the cache exceeds its maximum size.
+    """
+
+    def __init__(self, path: str, max_size: int, enabled: bool = True):
+        """Initializes the cache.
+
+        Args:
+            path (str): The path of the SQLite database.
+            max_size (int): The maximum size of the compressed entries in bytes.
+            enabled (bool): False to disable the cache.
+        """
+        self.path = path
+        self.max_size = max_size
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._connection = None
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens the database on first use and creates its table.
+
+        Must be called with the lock held.
+
+        Returns:
+            sqlite3.Connection: The connection, shared by the OPS workers.
+        """
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(CREATE_CACHE_TABLE_QUERY)
+            self._connection.execute(CREATE_CACHE_INDEX_QUERY)
+            self._size = self._connection.execute(
+                FETCH_CACHE_SIZE_QUERY).fetchone()[0]
+            logger.info(
+                f"OPS cache opened at {self.path} ({self._size} bytes)")
+
+        return self._connection
+
+    def get(self, endpoint: str, format: str, number: str):
+        """Gets a cached OPS response.
+
+        Args:
+            endpoint (str): The OPS endpoint (biblio, description, claims).
+            format (str): The format of the patent number (docdb, epodoc).
+            number (str): The patent number.
+
+        Returns:
+            The cached JSON data, or None if it is not cached.
+        """
+        if not self.enabled or not is_cacheable(number):
+            return None
+
+        key = (endpoint, format, number)
+        try:
+            with self._lock:
+                connection = self._connect()
+                row = connection.execute(
+                    FETCH_CACHE_ENTRY_QUERY, key).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                connection.execute(TOUCH_CACHE_ENTRY_QUERY,
+                                   (time.time(), *key))
+                self.hits += 1
+        except sqlite3.Error as e:
+            logger.error(f"OPS cache read failed: {e}")
+            return None
+
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, endpoint: str, format: str, number: str, data) -> None:
+        """Caches an OPS response.
+
+        Args:
+            endpoint (str): The OPS endpoint (biblio, description, claims).
+            format (str): The format of the patent number (docdb, epodoc).
+            number (str): The patent number.
+            data: The JSON data of the response.
+        """
+        if not self.enabled or not is_cacheable(number) or data is None:
+            return
+
+        key = (endpoint, format, number)
+        compressed = zlib.compress(json.dumps(
+            data, separators=(",", ":")).encode("utf-8"))
+        try:
+            with self._lock:
+                connection = self._connect()
+                previous = connection.execute(
+                    FETCH_CACHE_ENTRY_SIZE_QUERY, key).fetchone()
+                connection.execute(INSERT_CACHE_ENTRY_QUERY,
+                                   (*key, compressed, len(compressed), time.time()))
+                self._size += len(compressed) - \
+                    (previous[0] if previous else 0)
+
+                if self._size > self.max_size:
+                    self._evict(connection)
+        except sqlite3.Error as e:
+            logger.error(f"OPS cache write failed: {e}")
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        """Deletes the least recently used entries until the cache is below its target size.
+
+        Must be called with the lock held.
+
+        Args:
+            connection (sqlite3.Connection): The database connection.
+        """
+        target = self.max_size * EVICTION_TARGET
+        evicted = 0
+        connection.execute("BEGIN")
+        try:
+            while self._size > target:
+                rows = connection.execute(
+                    FETCH_LEAST_RECENTLY_USED_QUERY, (100,)).fetchall()
+                if not rows:
+                    break
+                for endpoint, format, number, size in rows:
+                    connection.execute(DELETE_CACHE_ENTRY_QUERY,
+                                       (endpoint, format, number))
+                    self._size -= size
+                    evicted += 1
+                    if self._size <= target:
+                        break
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            self._size = connection.execute(
+                FETCH_CACHE_SIZE_QUERY).fetchone()[0]
+            raise
+
+        logger.debug(f"Evicted {evicted} entries from the OPS cache")
+
+    def get_stats(self) -> dict:
+        """Gets the size and the hit counters of the cache.
+
+        Returns:
+            dict: The statistics of the cache.
+        """
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": self._size,
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def close(self) -> None:
+        """Closes the database."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+# Cache shared by the OPS service functions
+ops_cache = OpsCache(
+    path=ops_cache_path,
+    max_size=ops_cache_max_size,
+    enabled=ops_cache_enabled
+)
@@ -0,0 +1,493 @@
+import base64
+import random
+import re
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from api.config.logging_config import logger
+from api.config.ops_config import (ops_api_url, ops_consumer_key, ops_consumer_secret_key,
+                                   ops_pool_size, ops_timeout, ops_token_refresh_margin,
+                                   ops_max_workers, ops_max_retries, ops_backoff_base, ops_backoff_max)
+
+
+# Services of the OPS throttling policy, announced in the `X-Throttling-Control` header:
+# "busy (images=green:200, inpadoc=yellow:60, other=green:1000, retrieval=green:200, search=red:15)"
+THROTTLING_SERVICES = ("search", "retrieval", "inpadoc", "images", "other")
+THROTTLING_CONTROL_PATTERN = re.compile(r"(\w+)=(\w+):(\d+)")
+
+# Share of the concurrent requests and factor of the interval between requests
+# allowed for each traffic light colour of a service (black: no request allowed)
+THROTTLING_COLOURS = {
+    "green": (1.0, 1.0),
+    "yellow": (0.5, 1.5),
+    "red": (0.25, 3.0),
+    "black": (0.0, None),
+}
+
+# Status codes of the transient errors which are retried
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def get_throttling_service(path: str) -> str:
+    """Gets the OPS throttling service of a request.
+
+    Args:
+        path (str): The path of the resource, relative to the API URL.
+
+    Returns:
+        str: One of `THROTTLING_SERVICES`.
+    """
+    if "/published-data/search" in path:
+        return "search"
+    if "/published-data/images" in path:
+        return "images"
+    if "/family" in path or "/legal" in path:
+        return "inpadoc"
+    if "/published-data/" in path:
+        return "retrieval"
+    return "other"
+
+
+class OpsThrottle():
+    """
+    Scheduler of the requests to OPS following its throttling policy.
+
+    Each service has a traffic light colour and a number of requests per minute
+    announced by OPS in every response. The number of concurrent requests and
+    the interval between two requests of a service are adapted to its colour,
+    and no request is sent while a service is black or rejected requests.
+    """
+
+    def __init__(self, max_concurrency: int = 4, black_wait: float = 60):
+        """Initializes the scheduler.
+
+        Args:
+            max_concurrency (int): The maximum number of concurrent requests of a green service.
+            black_wait (float): Seconds to wait before retrying a black service.
+        """
+        self.max_concurrency = max_concurrency
+        self.black_wait = black_wait
+
+        self._condition = threading.Condition()
+        self._system_state = None
+        self._services = {service: {
+            "colour": "green",
+            "limit": None,
+            "in_flight": 0,
+            "next_request_at": 0.0,
+            "blocked_until": 0.0,
+        } for service in THROTTLING_SERVICES}
+
+        # Quota usage and counters reported by `get_state`
+        self._individual_quota_per_hour_used = None
+        self._registered_quota_per_week_used = None
+        self._requests = 0
+        self._retries = 0
+        self._throttled = 0
+
+    def _get_wait(self, state: dict, now: float) -> float:
+        """Gets the seconds to wait before a request of a service can be sent.
+
+        Must be called with the condition lock held.
+
+        Args:
+            state (dict): The state of the service.
+            now (float): The current time (monotonic clock).
+
+        Returns:
+            float: 0 if the request can be sent now, None to wait for a running request.
+        """
+        share, _ = THROTTLING_COLOURS.get(state["colour"], (1.0, 1.0))
+        if state["colour"] == "black" and state["blocked_until"] <= now:
+            # Try again with a single request once the wait is over
+            share = 1 / self.max_concurrency
+
+        wait = max(state["blocked_until"] - now,
+                   state["next_request_at"] - now, 0.0)
+        if wait > 0:
+            return wait
+
+        if state["in_flight"] >= max(1, int(self.max_concurrency * share)):
+            return None
+
+        return 0.0
+
+    def acquire(self, service: str) -> None:
+        """Waits until a request of a service can be sent.
+
+        Args:
+            service (str): One of `THROTTLING_SERVICES`.
+        """
+        with self._condition:
+            state = self._services[service]
+            while True:
+                now = time.monotonic()
+                wait = self._get_wait(state, now)
+                if wait == 0:
+                    break
+                self._condition.wait(timeout=wait)
+
+            # Space the requests according to the rate announced by OPS
+            _, factor = THROTTLING_COLOURS.get(
+                state["colour"], (1.0, 1.0))
+            if state["limit"] and factor:
+                state["next_request_at"] = now + 60 / state["limit"] * factor
+
+            state["in_flight"] += 1
+            self._requests += 1
+
+    def release(self, service: str, headers: dict = None) -> None:
+        """Records the end of a request and the throttling state of its response.
+
+        Args:
+            service (str): One of `THROTTLING_SERVICES`.
+            headers (dict, optional): The headers of the response, if any.
+        """
+        with self._condition:
+            self._services[service]["in_flight"] -= 1
+            if headers is not None:
+                self._update(headers)
+            self._condition.notify_all()
+
+    def _update(self, headers: dict) -> None:
+        """Parses the throttling and quota headers of a response.
+
+        Must be called with the condition lock held.
+
+        Args:
+            headers (dict): The headers of the response.
+        """
+        throttling_control = headers.get("X-Throttling-Control")
+        if throttling_control:
+            self._system_state = throttling_control.split("(")[0].strip()
+            now = time.monotonic()
+            for service, colour, limit in THROTTLING_CONTROL_PATTERN.findall(throttling_control):
+                state = self._services.get(service)
+                if state is None:
+                    continue
+                if colour != state["colour"]:
+                    logger.info(
+                        f"OPS throttling of {service} changed from {state['colour']} to {colour} ({limit} requests/min)")
+                if colour == "black":
+                    # Every black response, including the one of the single request sent
+                    # once the wait is over, postpones the next request
+                    state["blocked_until"] = max(
+                        state["blocked_until"], now + self.black_wait)
+                state["colour"] = colour
+                state["limit"] = int(limit)
+
+        individual_quota = headers.get("X-IndividualQuotaPerHour-Used")
+        if individual_quota is not None:
+            self._individual_quota_per_hour_used = int(individual_quota)
+        registered_quota = headers.get("X-RegisteredQuotaPerWeek-Used")
+        if registered_quota is not None:
+            self._registered_quota_per_week_used = int(registered_quota)
+
+    def block(self, service: str, seconds: float) -> None:
+        """Stops sending requests of a service for a while, e.g. after a rejection.
+
+        Args:
+            service (str): One of `THROTTLING_SERVICES`.
+            seconds (float): The duration of the pause.
+        """
+        with self._condition:
+            state = self._services[service]
+            state["blocked_until"] = max(
+                state["blocked_until"], time.monotonic() + seconds)
+            self._throttled += 1
+            self._condition.notify_all()
+
+    def count_retry(self) -> None:
+        """Records a retried request."""
+        with self._condition:
+            self._retries += 1
+
+    def get_state(self) -> dict:
+        """Gets the throttling state and the quota usage.
+
+        Returns:
+            dict: The state of the scheduler.
+
+        Example:
+            ```
+            {
+                "system_state": "busy",
+                "individual_quota_per_hour_used": 1523400,
+                "registered_quota_per_week_used": 68923400,
+                "requests": 1250,
+                "retries": 3,
+                "throttled": 1,
+                "services": {
+                    "search": {"colour": "yellow", "limit": 15, "in_flight": 1, "blocked_for": 0.0},
+                    ...
+                }
+            }
+            ```
+        """
+        with self._condition:
+            now = time.monotonic()
+            return {
+                "system_state": self._system_state,
+                "individual_quota_per_hour_used": self._individual_quota_per_hour_used,
+                "registered_quota_per_week_used": self._registered_quota_per_week_used,
+                "requests": self._requests,
+                "retries": self._retries,
+                "throttled": self._throttled,
+                "services": {service: {
+                    "colour": state["colour"],
+                    "limit": state["limit"],
+                    "in_flight": state["in_flight"],
+                    "blocked_for": round(max(state["blocked_until"] - now, 0.0), 3),
+                } for service, state in self._services.items()},
+            }
+
+
+class OpsClient():
+    """
+    HTTP client of the EPO Open Patent Services (OPS) shared by the whole process.
+
+    Requests go through a keep-alive session with a pool of connections to the
+    OPS host, so TLS handshakes are only paid when a connection is opened. The
+    OAuth access token is requested once and reused until shortly before it
+    expires, or until OPS rejects it.
+
+    Requests are scheduled by an `OpsThrottle` and transient failures (throttling
+    rejections, server errors, network errors) are retried with a jittered
+    exponential backoff.
+    """
+
+    def __init__(self, api_url: str, consumer_key: str, consumer_secret_key: str, pool_size: int = 10, timeout: float = 30, token_refresh_margin: float = 60, max_concurrency: int = 4, max_retries: int = 3, backoff_base: float = 1, backoff_max: float = 60):
+        """Initializes the OPS client.
+
+        Args:
+            api_url (str): The Ops API URL.
+            consumer_key (str): The consumer key for authentication.
+            consumer_secret_key (str): The consumer secret key for authentication.
+            pool_size (int): The maximum number of connections kept open to OPS.
+            timeout (float): Seconds to wait for OPS to answer a request.
+            token_refresh_margin (float): Seconds before its expiry after which the token is renewed.
+            max_concurrency (int): The maximum number of concurrent requests of a service.
+            max_retries (int): The number of retries of a failed request.
+            backoff_base (float): Seconds to wait before the first retry, doubled for each retry.
+            backoff_max (float): The maximum number of seconds to wait before a retry.
+        """
+        self.api_url = api_url
+        self.consumer_key = consumer_key
+        self.consumer_secret_key = consumer_secret_key
+        self.timeout = timeout
+        self.token_refresh_margin = token_refresh_margin
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.throttle = OpsThrottle(max_concurrency=max_concurrency)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._access_token = None
+        self._token_renew_at = 0.0
+        self._token_lock = threading.Lock()
+
+    def _request_access_token(self) -> tuple:
+        """Requests a new access token from Ops API.
+
+        Returns:
+            tuple: The access token and the time to renew it (monotonic clock).
+
+        Raises:
+            Exception: If the request fails or the access token is not found.
+        """
+        logger.debug("Requesting access token from Ops API")
+
+        # Encode the consumer key and secret key in base64
+        base_64_encoded = base64.b64encode(
+            bytes(f"{self.consumer_key}:{self.consumer_secret_key}", 'utf-8')).decode('utf-8')
+
+        url = f"{self.api_url}/auth/accesstoken"
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Authorization': f'Basic {base_64_encoded}'
+        }
+        data = {
+            'grant_type': 'client_credentials'
+        }
+
+        try:
+            # Make the request to get the access token
+            response = self.session.post(
+                url, headers=headers, data=data, timeout=self.timeout)
+            response.raise_for_status()  # Raise an error for bad responses
+
+            # Extract the access token and its lifetime (in seconds, sent as a string)
+            token_data = response.json()
+            access_token = token_data.get('access_token')
+            if not access_token:
+                raise ValueError("Access token not found in the response.")
+            expires_in = float(token_data.get('expires_in', 0))
+
+            # Renew before the expiry, but keep short-lived tokens for half their lifetime
+            renew_after = max(expires_in - self.token_refresh_margin, expires_in / 2)
+            return access_token, time.monotonic() + renew_after
+
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Request failed: {e}")
+
+    def get_access_token(self) -> str:
+        """Gets the cached access token, renewing it when it is about to expire.
+
+        Returns:
+            str: The access token.
+
+        Raises:
+            Exception: If a new access token cannot be obtained.
+        """
+        with self._token_lock:
+            if self._access_token is None or time.monotonic() >= self._token_renew_at:
+                self._access_token, self._token_renew_at = self._request_access_token()
+            return self._access_token
+
+    def invalidate_access_token(self, access_token: str) -> None:
+        """Forgets an access token rejected by OPS, so that the next request renews it.
+
+        Args:
+            access_token (str): The rejected token.
+        """
+        with self._token_lock:
+            if self._access_token == access_token:
+                self._access_token = None
+
+    def _get_backoff(self, attempt: int, response: requests.Response = None) -> float:
+        """Gets the seconds to wait before retrying a request.
+
+        Args:
+            attempt (int): The number of the failed attempt (from 0).
+            response (requests.Response, optional): The rejected response, if any.
+
+        Returns:
+            float: The `Retry-After` delay of the response, or a random delay up to
+                an exponential bound (full jitter).
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+
+        return random.uniform(0, min(self.backoff_base * 2 ** attempt, self.backoff_max))
+
+    def _is_throttled(self, response: requests.Response) -> bool:
+        """Checks if OPS rejected a request because of its throttling or quotas.
+
+        Args:
+            response (requests.Response): The response.
+
+        Returns:
+            bool: True if the request was rejected by the fair use policy.
+        """
+        if response.status_code == 429:
+            return True
+        if response.status_code != 403:
+            return False
+        text = response.text.lower()
+        return "X-Rejection-Reason" in response.headers or "quota" in text or "throttl" in text or "fair use" in text
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Sends an authenticated request to Ops API.
+
+        The request waits for the throttling scheduler, and is sent again with a
+        new token if OPS rejects the cached one, or after a backoff if it failed
+        with a transient error.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The path of the resource, relative to the API URL.
+            **kwargs: Additional arguments of `requests.Session.request` (params, data...).
+
+        Returns:
+            requests.Response: The response, whatever its status code.
+
+        Raises:
+            requests.exceptions.RequestException: If OPS cannot be reached.
+        """
+        headers = {'Accept': 'application/json'}
+        headers.update(kwargs.pop('headers', {}))
+        kwargs.setdefault('timeout', self.timeout)
+        service = get_throttling_service(path)
+        token_renewed = False
+
+        attempt = 0
+        while True:
+            access_token = self.get_access_token()
+            headers['Authorization'] = f'Bearer {access_token}'
+
+            self.throttle.acquire(service)
+            try:
+                response = self.session.request(
+                    method, f"{self.api_url}{path}", headers=headers, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self.throttle.release(service)
+                if attempt >= self.max_retries:
+                    raise
+                backoff = self._get_backoff(attempt)
+                logger.warning(
+                    f"Ops API request failed ({e}), retrying in {backoff:.1f}s")
+                self.throttle.count_retry()
+                time.sleep(backoff)
+                attempt += 1
+                continue
+            self.throttle.release(service, response.headers)
+
+            # OPS answers 400 or 401 with an "invalid_access_token" fault for expired tokens
+            if response.status_code in (400, 401) and "access_token" in response.text.lower() and not token_renewed:
+                logger.debug("Ops API rejected the access token, renewing it")
+                self.invalidate_access_token(access_token)
+                token_renewed = True
+                continue
+
+            throttled = self._is_throttled(response)
+            if (throttled or response.status_code in RETRY_STATUS_CODES) and attempt < self.max_retries:
+                backoff = self._get_backoff(attempt, response)
+                logger.warning(
+                    f"Ops API answered {response.status_code} for {service}, retrying in {backoff:.1f}s")
+                self.throttle.count_retry()
+                if throttled:
+                    # Hold every request of the service, not only this one
+                    self.throttle.block(service, backoff)
+                else:
+                    time.sleep(backoff)
+                attempt += 1
+                continue
+
+            return response
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        """Sends an authenticated GET request to Ops API, see `request`."""
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        """Sends an authenticated POST request to Ops API, see `request`."""
+        return self.request("POST", path, **kwargs)
+
+    def get_quota(self) -> dict:
+        """Gets the current OPS throttling state and quota usage, see `OpsThrottle.get_state`."""
+        return self.throttle.get_state()
+
+    def close(self) -> None:
+        """Closes the connections of the session."""
+        self.session.close()
+
+
+ops_client = OpsClient(
+    ops_api_url,
+    ops_consumer_key,
+    ops_consumer_secret_key,
+    pool_size=ops_pool_size,
+    timeout=ops_timeout,
+    token_refresh_margin=ops_token_refresh_margin,
+    max_concurrency=ops_max_workers,
+    max_retries=ops_max_retries,
+    backoff_base=ops_backoff_base,
+    backoff_max=ops_backoff_max
+)
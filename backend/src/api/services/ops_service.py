@@ -3,64 +3,69 @@ from api.models.Claim import Claim
 from api.models.Patent import FullPatent, Patent, PatentList
 from api.config.logging_config import logger
 from api.repositories import sdg_summary_repository
+from api.services.ops_client import OpsClient, ops_client
+from api.services.ops_cache import ops_cache
+from api.config.ops_config import ops_max_workers
+from concurrent.futures import ThreadPoolExecutor
 import requests
-import base64
 
-from api.config.ops_config import ops_api_url, ops_consumer_key, ops_consumer_secret_key
 
+# Workers fetching patent data from OPS, shared by all the requests so that the
+# number of concurrent calls stays within the OPS throttling limits
+ops_executor = ThreadPoolExecutor(
+    max_workers=ops_max_workers, thread_name_prefix="ops")
 
-def get_access_token(api_url: str, consumer_key: str, consumer_secret_key: str) -> str:
-    """Get access token from Ops API.
+
+def get_published_data(client: OpsClient, constituent: str, type: str, format: str, number: str, use_cache: bool = True) -> dict:
+    """Get a constituent of a publication from the cache, or from Ops API.
+
+    Publications are immutable for a given kind code, so their responses are
+    cached on disk, see `ops_cache`.
 
     Args:
-        api_url (str): The Ops API URL.
-        consumer_key (str): The consumer key for authentication.
-        consumer_secret_key (str): The consumer secret key for authentication.
+        client (OpsClient): The Ops API client.
+        constituent (str): The constituent of the publication (biblio, description, claims).
+        type (str): Reference type (application, priority, publication).
+        format (str): The format of the patent data (docdb, epodoc).
+        number (str): The patent number.
+        use_cache (bool): False to bypass the cache and fetch a fresh response, which is then cached.
     Returns:
-        str: The access token.
+        dict: The JSON response.
     Raises:
-        Exception: If the request fails or the access token is not found.
+        requests.exceptions.RequestException: If the request fails.
+        ValueError: If the response is empty.
     """
-    logger.debug("Requesting access token from Ops API")
+    cacheable = type == "publication"
+    if use_cache and cacheable:
+        patent_data = ops_cache.get(constituent, format, number)
+        if patent_data is not None:
+            logger.debug(f"Found {constituent} of {number} in the OPS cache")
+            return patent_data
 
-    # Encode the consumer key and secret key in base64
-    base_64_encoded = base64.b64encode(
-        bytes(f"{consumer_key}:{consumer_secret_key}", 'utf-8')).decode('utf-8')
+    path = f"/rest-services/published-data/{type}/{format}/{number}/{constituent}"
 
-    url = f"{api_url}/auth/accesstoken"
-    headers = {
-        'Content-Type': 'application/x-www-form-urlencoded',
-        'Authorization': f'Basic {base_64_encoded}'
-    }
-    data = {
-        'grant_type': 'client_credentials'
-    }
-
-    try:
-        # Make the request to get the access token
-        response = requests.post(url, headers=headers, data=data)
-        response.raise_for_status()  # Raise an error for bad responses
+    response = client.get(path)
+    response.raise_for_status()  # Raise an error for bad responses
 
-        # Extract the access token from the response
-        access_token = response.json().get('access_token')
-        if not access_token:
-            raise ValueError("Access token not found in the response.")
+    patent_data = response.json()
+    if not patent_data:
+        raise ValueError("Patent data not found in the response.")
 
-        return access_token
+    if cacheable:
+        ops_cache.set(constituent, format, number, patent_data)
 
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Request failed: {e}")
+    return patent_data
 
 
-def get_patent_description(api_url: str, access_token: str, type: str = "publication", format: str = "epodoc", number: str = "EP1000000") -> list[str]:
+def get_patent_description(client: OpsClient, type: str = "publication", format: str = "epodoc", number: str = "EP1000000", use_cache: bool = True) -> list[str]:
     """Get patent data from Ops API.
 
     Args:
-        api_url (str): The Ops API URL.
-        access_token (str): The access token for authentication.
+        client (OpsClient): The Ops API client.
         type (str): Reference type (application, priority, publication).
         format (str): The format of the patent data (docdb, epodoc).
         number (str): The patent number.
+        use_cache (bool): False to bypass the OPS cache.
     Returns:
         list[str]: The patent data in the specified format.
     Raises:
@@ -69,21 +74,10 @@ def get_patent_description(api_url: str, access_token: str, type: str = "publica
     logger.debug(
         f"Requesting patent description by number: {number}, type: {type}, format: {format}")
 
-    url = f"{api_url}/rest-services/published-data/{type}/{format}/{number}/description"
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Accept': 'application/json'
-    }
-
     try:
-        # Make the request to get the patent data
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Raise an error for bad responses
-
-        # Extract the patent data from the response
-        patent_data = response.json()
-        if not patent_data:
-            raise ValueError("Patent data not found in the response.")
+        # Get the patent data from the cache or from the API
+        patent_data = get_published_data(
+            client, "description", type, format, number, use_cache)
 
         # Extract only the description from the patent data
         description_data = patent_data.get("ops:world-patent-data", {}).get("ftxt:fulltext-documents", {
@@ -106,15 +100,15 @@ def get_patent_description(api_url: str, access_token: str, type: str = "publica
         raise Exception(f"Unexpected response structure: {e}")
 
 
-def get_patent_claims(api_url: str, access_token: str, type: str = "publication", format: str = "epodoc", number: str = "EP1000000") -> list[str]:
+def get_patent_claims(client: OpsClient, type: str = "publication", format: str = "epodoc", number: str = "EP1000000", use_cache: bool = True) -> list[str]:
     """Get patent claims from Ops API.
 
     Args:
-        api_url (str): The Ops API URL.
-        access_token (str): The access token for authentication.
+        client (OpsClient): The Ops API client.
         type (str): Reference type (application, priority, publication).
         format (str): The format of the patent data (docdb, epodoc).
         number (str): The patent number.
+        use_cache (bool): False to bypass the OPS cache.
     Returns:
         list[str]: A list of patent claims in the specified format.
     Raises:
@@ -122,21 +116,10 @@ def get_patent_claims(api_url: str, access_token: str, type: str = "publication"
     """
     logger.debug("Requesting patent claims from Ops API")
 
-    url = f"{api_url}/rest-services/published-data/{type}/{format}/{number}/claims"
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Accept': 'application/json'
-    }
-
     try:
-        # Make the request to get the patent claims
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Raise an error for bad responses
-
-        # Extract the patent claims from the response
-        patent_data = response.json()
-        if not patent_data:
-            raise ValueError("Patent data not found in the response.")
+        # Get the patent claims from the cache or from the API
+        patent_data = get_published_data(
+            client, "claims", type, format, number, use_cache)
 
         # Extract only the claims from the patent data
         claims_data = patent_data.get("ops:world-patent-data", {}).get("ftxt:fulltext-documents", {}).get(
@@ -160,137 +143,300 @@ def get_patent_claims(api_url: str, access_token: str, type: str = "publication"
         raise Exception(f"Unexpected response structure: {e}")
 
 
-def get_patent_biblio(api_url: str, access_token: str, type: str = "publication", format: str = "epodoc", number: str = "EP1000000") -> dict:
+# Maximum number of publications of a bulk bibliographic data request
+OPS_BIBLIO_BATCH_SIZE = 100
+
+
+def parse_exchange_document(exchange_document: dict, number: str) -> dict:
+    """Extract the bibliographic data of a patent from an OPS exchange document.
+
+    Args:
+        exchange_document (dict): An `exchange-document` of a biblio response.
+        number (str): The patent number.
+    Returns:
+        dict: The patent bibliographic data.
+    """
+    # Extract the publication date
+    publication_reference = exchange_document.get(
+        "bibliographic-data", {}).get("publication-reference", {}).get("document-id", [])
+    if isinstance(publication_reference, dict):
+        publication_reference = [publication_reference]
+
+    publication_date = None
+    for doc_id in publication_reference:
+        if doc_id.get("@document-id-type") == "docdb":
+            publication_date = doc_id.get("date", {}).get("$")
+            break
+
+    # Extract applicants
+    applicants = exchange_document.get(
+        "bibliographic-data", {}).get("parties", {}).get("applicants", {}).get("applicant", [])
+
+    if isinstance(applicants, dict):
+        applicants = [applicants]
+
+    applicants_name = [applicant.get(
+        "applicant-name", {}).get("name", {}).get("$") for applicant in applicants]
+
+    # Extract the contry code (assume that it is the code in brackets given at the end of the first applicant name)
+    country_code = applicants_name[0].split()[-1].strip("[]")
+
+    # Extract the patent titles
+    invention_titles = exchange_document.get(
+        "bibliographic-data", {}).get("invention-title", [])
+
+    if isinstance(invention_titles, dict):
+        invention_titles = [invention_titles]
+
+    titles = {}
+    if invention_titles:
+        for title in invention_titles:
+            lang = title.get("@lang")
+            title_text = title.get("$")
+            if lang and title_text:
+                titles[lang] = title_text
+
+    # Extract abstracts
+    result_abstracts = exchange_document.get("abstract", [])
+    if isinstance(result_abstracts, dict):
+        result_abstracts = [result_abstracts]
+    abstracts = {}
+    if result_abstracts:
+        for abstract in result_abstracts:
+            lang = abstract.get("@lang")
+            abstract_text = abstract.get("p", {}).get("$")
+            if lang and abstract_text:
+                abstracts[lang] = abstract_text
+
+    return {
+        "number": number,
+        "title": titles,
+        "abstract": abstracts,
+        "applicants": applicants_name,
+        "country": country_code,
+        "publication_date": publication_date
+    }
+
+
+def get_exchange_documents(patent_data: dict) -> list[dict]:
+    """Get the exchange documents of a biblio response.
+
+    Args:
+        patent_data (dict): The JSON biblio response.
+    Returns:
+        list[dict]: The exchange documents.
+    """
+    exchange_documents = patent_data.get(
+        "ops:world-patent-data", {}).get("exchange-documents", {}).get("exchange-document", [])
+    if isinstance(exchange_documents, dict):
+        exchange_documents = [exchange_documents]
+    return exchange_documents
+
+
+def get_patent_biblio(client: OpsClient, type: str = "publication", format: str = "epodoc", number: str = "EP1000000", use_cache: bool = True) -> dict:
     """Get patent bibliographic data from Ops API.
 
     Args:
-        api_url (str): The Ops API URL.
-        access_token (str): The access token for authentication.
+        client (OpsClient): The Ops API client.
         type (str): Reference type (application, priority, publication).
         format (str): The format of the patent data (docdb, epodoc).
         number (str): The patent number.
+        use_cache (bool): False to bypass the OPS cache.
     Returns:
         dict: The patent bibliographic data in the specified format.
     """
     logger.debug(
         f"Requesting patent bibliographic data by number: {number}, type: {type}, format: {format}")
 
-    url = f"{api_url}/rest-services/published-data/{type}/{format}/{number}/biblio"
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Accept': 'application/json'
-    }
+    try:
+        # Get the patent bibliographic data from the cache or from the API
+        patent_data = get_published_data(
+            client, "biblio", type, format, number, use_cache)
+
+        return parse_exchange_document(get_exchange_documents(patent_data)[0], number)
+
+    except requests.exceptions.RequestException as e:
+        raise Exception(f"Request failed: {e}")
+    except KeyError as e:
+        raise Exception(f"Unexpected response structure: {e}")
+
+
+def get_patents_biblio_batch(client: OpsClient, references: list[tuple]) -> dict:
+    """Get the bibliographic data of up to `OPS_BIBLIO_BATCH_SIZE` publications in one request.
+
+    Args:
+        client (OpsClient): The Ops API client.
+        references (list[tuple]): The (country, doc_number, kind) docdb references of the publications.
+    Returns:
+        dict: The bibliographic data by patent number (country, number and kind code).
+            Publications unknown to OPS are missing.
+    Raises:
+        Exception: If the request fails.
+    """
+    logger.debug(
+        f"Requesting bibliographic data of {len(references)} publications")
+
+    # The docdb numbers are sent as a comma separated list in the body of the request
+    body = ",".join(
+        f"{country}.{doc_number}.{kind}" for country, doc_number, kind in references)
 
     try:
-        # Make the request to get the patent bibliographic data
-        response = requests.get(url, headers=headers)
+        response = client.post("/rest-services/published-data/publication/docdb/biblio",
+                               data=body, headers={'Content-Type': 'text/plain'})
         response.raise_for_status()  # Raise an error for bad responses
 
-        # Extract the bibliographic data from the response
         patent_data = response.json()
         if not patent_data:
             raise ValueError("Patent data not found in the response.")
 
-        exchange_documents = patent_data.get(
-            "ops:world-patent-data", {}).get("exchange-documents", {}).get("exchange-document", [])
-        if isinstance(exchange_documents, dict):
-            exchange_documents = [exchange_documents]
-        first_exchange_document = exchange_documents[0]
-
-        # Extract the publication date
-        publication_reference = first_exchange_document.get(
-            "bibliographic-data", {}).get("publication-reference", {}).get("document-id", [])
-        if isinstance(publication_reference, dict):
-            publication_reference = [publication_reference]
-
-        publication_date = None
-        for doc_id in publication_reference:
-            if doc_id.get("@document-id-type") == "docdb":
-                publication_date = doc_id.get("date", {}).get("$")
-                break
-
-        # Extract applicants
-        applicants = first_exchange_document.get(
-            "bibliographic-data", {}).get("parties", {}).get("applicants", {}).get("applicant", [])
-
-        if isinstance(applicants, dict):
-            applicants = [applicants]
-
-        applicants_name = [applicant.get(
-            "applicant-name", {}).get("name", {}).get("$") for applicant in applicants]
-
-        # Extract the contry code (assume that it is the code in brackets given at the end of the first applicant name)
-        country_code = applicants_name[0].split()[-1].strip("[]")
-
-        # Extract the patent titles
-        invention_titles = first_exchange_document.get(
-            "bibliographic-data", {}).get("invention-title", [])
-
-        if isinstance(invention_titles, dict):
-            invention_titles = [invention_titles]
-
-        titles = {}
-        if invention_titles:
-            for title in invention_titles:
-                lang = title.get("@lang")
-                title_text = title.get("$")
-                if lang and title_text:
-                    titles[lang] = title_text
-
-        # Extract abstracts
-        result_abstracts = first_exchange_document.get("abstract", [])
-        if isinstance(result_abstracts, dict):
-            result_abstracts = [result_abstracts]
-        abstracts = {}
-        if result_abstracts:
-            for abstract in result_abstracts:
-                lang = abstract.get("@lang")
-                abstract_text = abstract.get("p", {}).get("$")
-                if lang and abstract_text:
-                    abstracts[lang] = abstract_text
-
-        return {
-            "number": number,
-            "title": titles,
-            "abstract": abstracts,
-            "applicants": applicants_name,
-            "country": country_code,
-            "publication_date": publication_date
-        }
-
     except requests.exceptions.RequestException as e:
         raise Exception(f"Request failed: {e}")
-    except KeyError as e:
-        raise Exception(f"Unexpected response structure: {e}")
 
+    biblios = {}
+    for exchange_document in get_exchange_documents(patent_data):
+        number = f"{exchange_document.get('@country', '')}{exchange_document.get('@doc-number', '')}{exchange_document.get('@kind', '')}"
+        if exchange_document.get("@status") == "not found" or number in biblios:
+            continue
+
+        try:
+            biblios[number] = parse_exchange_document(
+                exchange_document, number)
+        except (KeyError, IndexError, AttributeError) as e:
+            logger.error(
+                f"Unexpected bibliographic data for patent {number}: {e}")
+            continue
+
+        # Cache each document as the response of a single biblio request
+        ops_cache.set("biblio", "docdb", number, {"ops:world-patent-data": {
+            "exchange-documents": {"exchange-document": exchange_document}}})
+
+    return biblios
+
+
+def get_patents_biblio(client: OpsClient, references: list[tuple], use_cache: bool = True) -> dict:
+    """Get the bibliographic data of many publications with bulk requests.
+
+    The publications missing from the OPS cache are grouped by `OPS_BIBLIO_BATCH_SIZE`
+    and the batches are fetched concurrently by the OPS workers.
 
-def get_full_patent(api_url: str, consumer_key: str, consumer_secret_key: str, patent_number: str) -> FullPatent:
-    """Get patents from Ops API based on the given date and type.
     Args:
-        api_url (str): The Ops API URL.
-        consumer_key (str): The consumer key for authentication.
-        consumer_secret_key (str): The consumer secret key for authentication.
-        query (str): The search query for patents in CQL language.
+        client (OpsClient): The Ops API client.
+        references (list[tuple]): The (country, doc_number, kind) docdb references of the publications.
+        use_cache (bool): False to bypass the OPS cache.
     Returns:
-        list[dict]: A list of patents with detailed information.
+        dict: The bibliographic data by patent number (country, number and kind code).
+            Publications which could not be retrieved are missing.
     """
-    logger.debug(f"Retrieving full patent by number: {patent_number}")
+    biblios = {}
+    missing_references = []
+    for reference in references:
+        number = "".join(reference)
+        patent_data = ops_cache.get(
+            "biblio", "docdb", number) if use_cache else None
+        try:
+            biblios[number] = parse_exchange_document(
+                get_exchange_documents(patent_data)[0], number)
+        except (KeyError, IndexError, AttributeError):
+            missing_references.append(reference)
 
-    # Get the access token
-    access_token = get_access_token(api_url, consumer_key, consumer_secret_key)
+    logger.debug(
+        f"Found {len(biblios)} of {len(references)} bibliographic data in the OPS cache")
 
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Accept': 'application/json'
-    }
+    batches = [missing_references[start:start + OPS_BIBLIO_BATCH_SIZE]
+               for start in range(0, len(missing_references), OPS_BIBLIO_BATCH_SIZE)]
+    futures = [ops_executor.submit(get_patents_biblio_batch, client, batch)
+               for batch in batches]
 
-    patent = {}
+    for batch, future in zip(batches, futures):
+        try:
+            biblios.update(future.result())
+        except Exception as e:
+            # Log the error and continue with the next batch
+            logger.error(
+                f"An error occurred while retrieving {len(batch)} bibliographic data: {e}")
+
+    return biblios
+
+
+def build_full_patent(number: str, format: str, biblio: dict, description: list[str], claims: list[str]) -> FullPatent:
+    """Build a full patent from its OPS constituents.
+    Args:
+        number (str): The patent number.
+        format (str): The format of the patent number (docdb, epodoc).
+        biblio (dict): The bibliographic data, see `parse_exchange_document`.
+        description (list[str]): The description paragraphs, see `get_patent_description`.
+        claims (list[str]): The claims, see `get_patent_claims`.
+    Returns:
+        FullPatent: The patent with its description and claims.
+    """
+    # Process the description
+    description_object = []
+    for desc in description:
+        if not desc.startswith("["):
+            continue
+
+        # Skip the [ and the last ]
+        description_number = desc[1:5].strip()
+        description_text = desc[6:].strip()
+        description_object.append(Description(
+            description_number=description_number,
+            patent_number=number,
+            description_text=description_text
+        ))
+
+    # Process the claims
+    claims_object = []
+    for claim in claims:
+        # Extract the claim number and text
+        claim_number = claim.split(".")[0].strip()
+        # Skip the number (one or two digits) and the dot
+        claim_text = claim[len(claim_number)+1:].strip()
+        claims_object.append(Claim(
+            claim_number=claim_number,
+            patent_number=number,
+            claim_text=claim_text
+        ))
+
+    return FullPatent(**{
+        "number": number,
+        "en_title": biblio.get("title", {}).get("en"),
+        "de_title": biblio.get("title", {}).get("de"),
+        "fr_title": biblio.get("title", {}).get("fr"),
+        "en_abstract": biblio.get("abstract", {}).get("en"),
+        "de_abstract": biblio.get("abstract", {}).get("de"),
+        "fr_abstract": biblio.get("abstract", {}).get("fr"),
+        "country": biblio.get("country"),
+        "format": format,
+        "type": "publication",
+        "publication_date": biblio.get("publication_date"),
+        "applicants": [
+            {
+                "name": applicant,
+                "patent_number": number
+            }
+            for applicant in biblio.get("applicants", [])
+        ],
+        "description": description_object,
+        "claims": claims_object
+    })
 
-    # Construct the URL for the patent search
-    url = f"{api_url}/rest-services/published-data/search?Range=1-1&q=pn = {patent_number}"
+
+def get_full_patent(client: OpsClient, patent_number: str, use_cache: bool = True) -> FullPatent:
+    """Get patents from Ops API based on the given date and type.
+    Args:
+        client (OpsClient): The Ops API client.
+        patent_number (str): The patent number.
+        use_cache (bool): False to bypass the OPS cache.
+    Returns:
+        FullPatent: The patent with its description and claims.
+    """
+    logger.debug(f"Retrieving full patent by number: {patent_number}")
+
+    patent = None
 
     # Make the request to get the patents matching the criteria
-    response = requests.get(url, headers=headers)
+    response = client.get("/rest-services/published-data/search",
+                          params={"Range": "1-1", "q": f"pn = {patent_number}"})
     response.raise_for_status()  # Raise an error for bad responses
 
     # Extract the patents from the response
@@ -318,95 +464,147 @@ def get_full_patent(api_url: str, consumer_key: str, consumer_secret_key: str, p
             country = document_id.get("country", {}).get("$", "")
             number = f"{country}{doc_number}{kind}"
 
-            # Fetch detailed data for each patent
-            biblio = get_patent_biblio(
-                api_url, access_token, type="publication", format=format, number=number)
-            description = get_patent_description(
-                api_url, access_token, type="publication", format=format, number=number)
-            claims = get_patent_claims(
-                api_url, access_token, type="publication", format=format, number=number)
-
-            # Process the description
-            description_object = []
-            for desc in description:
-                if not desc.startswith("["):
-                    continue
-
-                # Skip the [ and the last ]
-                description_number = desc[1:5].strip()
-                description_text = desc[6:].strip()
-                description_object.append(Description(
-                    description_number=description_number,
-                    patent_number=number,
-                    description_text=description_text
-                ))
-
-            # Process the claims
-            claims_object = []
-            for claim in claims:
-                # Extract the claim number and text
-                claim_number = claim.split(".")[0].strip()
-                # Skip the number (one or two digits) and the dot
-                claim_text = claim[len(claim_number)+1:].strip()
-                claims_object.append(Claim(
-                    claim_number=claim_number,
-                    patent_number=number,
-                    claim_text=claim_text
-                ))
-
-            # Add the patent to the list
-            patent = {
-                "number": number,
-                "en_title": biblio.get("title", {}).get("en"),
-                "de_title": biblio.get("title", {}).get("de"),
-                "fr_title": biblio.get("title", {}).get("fr"),
-                "en_abstract": biblio.get("abstract", {}).get("en"),
-                "de_abstract": biblio.get("abstract", {}).get("de"),
-                "fr_abstract": biblio.get("abstract", {}).get("fr"),
-                "country": biblio.get("country"),
-                "format": format,
-                "type": "publication",
-                "publication_date": biblio.get("publication_date"),
-                "applicants": [
-                    {
-                        "name": applicant,
-                        "patent_number": number
-                    }
-                    for applicant in biblio.get("applicants", [])
-                ],
-                "description": description_object,
-                "claims": claims_object
-            }
+            # Fetch the bibliographic data, the description and the claims concurrently
+            biblio_future, description_future, claims_future = [ops_executor.submit(
+                get_constituent, client, type="publication", format=format, number=number, use_cache=use_cache)
+                for get_constituent in (get_patent_biblio, get_patent_description, get_patent_claims)]
+            biblio = biblio_future.result()
+            description = description_future.result()
+            claims = claims_future.result()
+
+            patent = build_full_patent(
+                number, format, biblio, description, claims)
 
         except Exception as e:
             # Log the error and continue with the next publication
             logger.error(
                 f"An error occurred while processing patent {number}: {e}")
 
-    return FullPatent(**patent) if patent else None
+    return patent if patent else None
 
 
-def get_patents(api_url: str, consumer_key: str, consumer_secret_key: str, query: str, first: int = 1, last: int = 10) -> PatentList:
+def search_publications(client: OpsClient, query: str, first: int = 1, last: int = 100) -> tuple[int, list[tuple]]:
+    """Search publications in Ops API.
+    Args:
+        client (OpsClient): The Ops API client.
+        query (str): The search query in CQL language.
+        first (int): The index of the first result (from 1).
+        last (int): The index of the last result (at most 2000, at most 100 results per request).
+    Returns:
+        tuple[int, list[tuple]]: The total number of results and the (country, doc_number, kind, format)
+            references of the requested results.
+    Raises:
+        requests.exceptions.HTTPError: If the request fails.
+    """
+    # Construct the parameters of the patent search
+    params = {
+        "Range": f"{first}-{last}",
+        "q": query
+    }
+
+    logger.debug(f"Requesting patents with parameters: {params}")
+
+    response = client.get(
+        "/rest-services/published-data/search", params=params)
+
+    # OPS answers 404 when no publication matches the query
+    if response.status_code == 404:
+        return 0, []
+    response.raise_for_status()  # Raise an error for bad responses
+
+    # Extract the patents from the response
+    patent_data = response.json()
+    if not patent_data:
+        raise ValueError("Patent data not found in the response.")
+
+    # Extract the total count of patents
+    total_count = int(patent_data.get("ops:world-patent-data", {}
+                                      ).get("ops:biblio-search", {}).get("@total-result-count", 0))
+
+    # Extract publication references
+    publications = patent_data.get("ops:world-patent-data", {}).get(
+        "ops:biblio-search", {}).get("ops:search-result", {}).get("ops:publication-reference", [])
+
+    if isinstance(publications, dict):
+        publications = [publications]
+
+    logger.debug(
+        f"Found {len(publications)} publications in the response.")
+
+    # Extract the number and format of each publication
+    references = []
+    for publication in publications:
+        document_id = publication.get("document-id", {})
+        doc_number = document_id.get(
+            "doc-number", {}).get("$", "")
+        format = document_id.get("@document-id-type", "")
+        kind = document_id.get("kind", {}).get("$", "")
+        country = document_id.get("country", {}).get("$", "")
+        references.append((country, doc_number, kind, format))
+
+    return total_count, references
+
+
+def get_full_patents(client: OpsClient, references: list[tuple], use_cache: bool = True) -> tuple[list[FullPatent], list[str]]:
+    """Get many full patents from Ops API, e.g. a page of search results.
+
+    The bibliographic data is fetched with bulk requests, and the descriptions
+    and claims concurrently by the OPS workers.
+
+    Args:
+        client (OpsClient): The Ops API client.
+        references (list[tuple]): The (country, doc_number, kind, format) references, see `search_publications`.
+        use_cache (bool): False to bypass the OPS cache.
+    Returns:
+        tuple[list[FullPatent], list[str]]: The patents, and the numbers of the patents which could not be retrieved.
+    """
+    biblios = get_patents_biblio(
+        client, [(country, doc_number, kind) for country, doc_number, kind, _ in references], use_cache)
+
+    # Fetch the description and the claims of each patent concurrently
+    futures = {}
+    for country, doc_number, kind, format in references:
+        number = f"{country}{doc_number}{kind}"
+        if number not in biblios:
+            continue
+        futures[number] = (format, [ops_executor.submit(
+            get_constituent, client, type="publication", format=format, number=number, use_cache=use_cache)
+            for get_constituent in (get_patent_description, get_patent_claims)])
+
+    patents = []
+    failed = []
+    for country, doc_number, kind, _ in references:
+        number = f"{country}{doc_number}{kind}"
+        try:
+            if number not in futures:
+                raise ValueError(
+                    "Bibliographic data not found in the response.")
+            format, (description_future, claims_future) = futures[number]
+            patents.append(build_full_patent(
+                number, format, biblios[number], description_future.result(), claims_future.result()))
+        except Exception as e:
+            # Log the error and continue with the next publication
+            logger.error(
+                f"An error occurred while processing patent {number}: {e}")
+            failed.append(number)
+
+    return patents, failed
+
+
+def get_patents(client: OpsClient, query: str, first: int = 1, last: int = 10, use_cache: bool = True) -> PatentList:
     """Get patents from Ops API based on the given date and type.
     Args:
-        api_url (str): The Ops API URL.
-        consumer_key (str): The consumer key for authentication.
-        consumer_secret_key (str): The consumer secret key for authentication.
+        client (OpsClient): The Ops API client.
         query (str): The search query for patents in CQL language.
+        first (int): The index of the first result (from 1).
+        last (int): The index of the last result (at most 2000).
+        use_cache (bool): False to bypass the OPS cache of the bibliographic data.
     Returns:
         list[dict]: A list of patents with detailed information.
     """
     logger.debug(
         f"Retrieving patents with query: {query}, first: {first}, last: {last}")
 
-    # Get the access token
-    access_token = get_access_token(api_url, consumer_key, consumer_secret_key)
-
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Accept': 'application/json'
-    }
-
     first_range = min(first, 2000)  # Ensure first does not exceed 2000
     last_range = min(last, 2000)  # Ensure last does not exceed 2000
     patents = []
@@ -415,57 +613,27 @@ def get_patents(api_url: str, consumer_key: str, consumer_secret_key: str, query
         raise ValueError(
             "Invalid range: first must be >= 1, last must be >= first, and last must be <= 2000.")
 
-    # Construct the URL for the patent search
-    url = f"{api_url}/rest-services/published-data/search?Range={first_range}-{last_range}&q=pn any \"EP\" and {query}"
-
-    logger.debug(f"Requesting patents from URL: {url}")
-
     try:
         # Make the request to get the patents matching the criteria
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Raise an error for bad responses
-
-        # Extract the patents from the response
-        patent_data = response.json()
-        if not patent_data:
-            raise ValueError("Patent data not found in the response.")
-
-        # Extract the total count of patents
-        total_count = int(patent_data.get("ops:world-patent-data", {}
-                                          ).get("ops:biblio-search", {}).get("@total-result-count", 0))
-
-        # Extract publication references
-        publications = patent_data.get("ops:world-patent-data", {}).get(
-            "ops:biblio-search", {}).get("ops:search-result", {}).get("ops:publication-reference", [])
+        total_count, references = search_publications(
+            client, f"pn any \"EP\" and {query}", first_range, last_range)
 
-        if isinstance(publications, dict):
-            publications = [publications]
+        # Fetch the detailed data of the patents with bulk requests
+        biblios = get_patents_biblio(
+            client, [(country, doc_number, kind) for country, doc_number, kind, _ in references], use_cache)
 
-        logger.debug(
-            f"Found {len(publications)} publications in the response.")
+        # Get SDGs of the whole page from repository in one query
+        sdgs_by_number = sdg_summary_repository.get_sdgs_by_patent_numbers(
+            [f"{country}{doc_number}{kind}" for country, doc_number, kind, _ in references])
 
         # Process each publication
-        for publication in publications:
-            number = None
-
+        for country, doc_number, kind, format in references:
+            number = f"{country}{doc_number}{kind}"
             try:
-                document_id = publication.get("document-id", {})
-                doc_number = document_id.get(
-                    "doc-number", {}).get("$", "")
-                format = document_id.get("@document-id-type", "")
-                kind = document_id.get("kind", {}).get("$", "")
-                country = document_id.get("country", {}).get("$", "")
-                number = f"{country}{doc_number}{kind}"
-
-                # Fetch detailed data for each patent
-                biblio = get_patent_biblio(
-                    api_url, access_token, type="publication", format=format, number=number)
-
-                # Get SDGs from repository
-                sdg_summaries = sdg_summary_repository.get_sdg_summary_by_patent_number(
-                    patent_number=number)
-
-                print(sdg_summaries)
+                biblio = biblios.get(number)
+                if biblio is None:
+                    raise ValueError(
+                        "Bibliographic data not found in the response.")
 
                 # Add the patent to the list
                 patents.append({
@@ -477,7 +645,7 @@ def get_patents(api_url: str, consumer_key: str, consumer_secret_key: str, query
                     "format": format,
                     "type": "publication",
                     "publicationDate": biblio.get("publication_date"),
-                    "sdgs": [sdg_summary.get("sdg") for sdg_summary in sdg_summaries],
+                    "sdgs": sdgs_by_number.get(number, []),
                 })
 
             except Exception as e:
@@ -527,17 +695,13 @@ if __name__ == "__main__":
     from pprint import pprint
 
     patent = get_full_patent(
-        api_url=ops_api_url,
-        consumer_key=ops_consumer_key,
-        consumer_secret_key=ops_consumer_secret_key,
+        client=ops_client,
         patent_number="EP4322066A1",
     )
     pprint(patent)
 
     # patents = get_patents(
-    #     api_url=ops_api_url,
-    #     consumer_key=ops_consumer_key,
-    #     consumer_secret_key=ops_consumer_secret_key,
+    #     client=ops_client,
     #     query="microwave",
     #     first=1,
     #     last=10
@@ -1,18 +1,27 @@
 from io import BytesIO
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable
 from api.models.Stats import Stats
 from api.services import ops_service
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
 from api.repositories import patent_repository, sdg_summary_repository
+from api.repositories import async_patent_repository, async_sdg_summary_repository
 from api.models.Patent import Patent, FullPatent, PatentList
 from api.models.SDGSummary import SDGSummary
 from api.config.logging_config import logger
 from ai.models.ClassifyPatent import ClassifyPatent
 from ai.models.CitationPatent import CitationPatent
+from ai.models.ParagraphSelector import ParagraphSelector
+from ai.models.prompt.sdg_label_prompt import SDG_LABEL_PROMPT_VERSION
+from ai.models.prompt.sdg_citation_prompt import SDG_CITATION_PROMPT_VERSION
 
 
-from api.config.ai_config import ai_client, ai_model, prompt_name
-from api.config.ops_config import ops_api_url, ops_consumer_key, ops_consumer_secret_key
+from api.config.ai_config import ai_num_parallel
+from api.config.analysis_config import analysis_max_words, analysis_select_paragraphs
+from api.services.ops_client import ops_client
+from api.services.model_registry import model_registry
 
 from pdf2image import convert_from_bytes
 from PyPDF2 import PdfReader
@@ -20,6 +29,18 @@ from pytesseract import image_to_string
 import numpy as np
 
 
+# Provenance recorded with the stored SDG summaries of an analysis, formatted with the classification prompt name
+ANALYSIS_PROMPT_VERSION = f"{{prompt_name}}:v{SDG_LABEL_PROMPT_VERSION},sdg_citation_prompt:v{SDG_CITATION_PROMPT_VERSION}"
+
+# Ranks the description paragraphs of the analyzed patents
+paragraph_selector = ParagraphSelector()
+
+# Workers generating the citations of the SDGs of a patent, shared by all the analyses
+# so that the number of concurrent generations matches the parallelism of Ollama
+citation_executor = ThreadPoolExecutor(
+    max_workers=ai_num_parallel, thread_name_prefix="citation")
+
+
 def create_patent(patent: Patent):
     """
     Create a new patent in the database.
@@ -37,7 +58,29 @@ def create_patent(patent: Patent):
     logger.info(f"Patent {patent.number} created successfully.")
 
 
-def get_patent_by_number(patent_number: str) -> Patent:
+def create_patents(patents: list[FullPatent]) -> int:
+    """
+    Create many patents in the database, e.g. to backfill it.
+
+    Patents which already exist are left unchanged.
+
+    Args:
+        patents (list[FullPatent]): The patents to be created.
+
+    Returns:
+        int: The number of new patents created.
+    """
+    logger.debug(f"Creating {len(patents)} patents")
+
+    # Call the repository function to insert the patents in batches
+    inserted = patent_repository.create_patents(
+        [patent.model_dump() for patent in patents])
+    logger.info(f"{inserted} new patents created out of {len(patents)}.")
+
+    return inserted
+
+
+async def get_patent_by_number(patent_number: str) -> Patent:
     """
     Retrieve a patent by its number.
 
@@ -50,7 +93,7 @@ def get_patent_by_number(patent_number: str) -> Patent:
     logger.debug(f"Retrieving patent by number: {patent_number}")
 
     # Call the repository function to get the patent
-    patent_data = patent_repository.get_patent_by_number(patent_number)
+    patent_data = await async_patent_repository.get_patent_by_number(patent_number)
 
     if patent_data:
         return Patent(**patent_data)
@@ -59,21 +102,26 @@ def get_patent_by_number(patent_number: str) -> Patent:
     return None
 
 
-def get_full_patent_by_number(patent_number: str) -> FullPatent:
+async def get_full_patent_by_number(patent_number: str, fields: list[str] = None) -> FullPatent:
     """
     Retrieve a full patent by its number, including claims and descriptions.
 
     Args:
         patent_number (str): The patent number to search for.
+        fields (list[str], optional): The parts to fetch among "description", "claims"
+            and "sdg_summary", the others are left empty. Defaults to all of them.
 
     Returns:
         FullPatent: The full patent object if found, None otherwise.
+
+    Raises:
+        ValueError: If a field is unknown.
     """
     logger.debug(f"Retrieving full patent by number: {patent_number}")
 
     # Call the repository function to get the full patent
-    full_patent_data = patent_repository.get_full_patent_by_number(
-        patent_number)
+    full_patent_data = await async_patent_repository.get_full_patent_by_number(
+        patent_number, fields)
 
     if full_patent_data:
         return FullPatent(**full_patent_data)
@@ -82,37 +130,45 @@ def get_full_patent_by_number(patent_number: str) -> FullPatent:
     return None
 
 
-def get_all_patents(first: int = 0, last: int = 99) -> PatentList:
+async def get_all_patents(first: int = 0, last: int = 99, after: str = None, count_strategy: str = "exact") -> PatentList:
     """
     Retrieve all patents from the database.
 
     Args:
         first (int): The index of the first patent to retrieve.
         last (int): The index of the last patent to retrieve.
+        after (str, optional): The cursor of the last patent of the previous page.
+        count_strategy (str): How the total count is computed ("exact", "estimated" or "has_more").
 
     Returns:
         PatentList: A list of all patent objects.
+
+    Raises:
+        ValueError: If the cursor or the count strategy is invalid.
     """
     logger.debug("Retrieving all patents.")
 
     # Call the repository function to get all patents
-    patents_data = patent_repository.get_all_patents(first, last)
+    patents_data = await async_patent_repository.get_all_patents(first, last, after, count_strategy)
 
     if patents_data:
         patents = [Patent(**patent) for patent in patents_data["patents"]]
         return PatentList(
             total_count=patents_data["total_count"],
+            total_count_exact=patents_data["total_count_exact"],
+            has_more=patents_data["has_more"],
             total_results=patents_data["total_results"],
             first=patents_data["first"],
             last=patents_data["last"],
-            patents=patents
+            patents=patents,
+            next_cursor=patents_data["next_cursor"]
         )
 
     logger.warning("No patents found.")
     return []
 
 
-def get_all_patents_by_applicant(applicant_name: str, first: int = 0, last: int = 99) -> list[Patent]:
+async def get_all_patents_by_applicant(applicant_name: str, first: int = 0, last: int = 99) -> list[Patent]:
     """
     Get all patents by applicant name.
 
@@ -127,7 +183,7 @@ def get_all_patents_by_applicant(applicant_name: str, first: int = 0, last: int
     logger.debug(f"Retrieving all patents by applicant: {applicant_name}")
 
     # Call the repository function to get all patents by applicant
-    patents_data = patent_repository.get_all_patents_by_applicant(
+    patents_data = await async_patent_repository.get_all_patents_by_applicant(
         applicant_name, first, last)
 
     if patents_data:
@@ -144,7 +200,7 @@ def get_all_patents_by_applicant(applicant_name: str, first: int = 0, last: int
     return []
 
 
-def search_patents(query: str, first: int = 0, last: int = 99, ops_search: bool = False) -> PatentList:
+async def search_patents(query: str, first: int = 0, last: int = 99, ops_search: bool = False, after: str = None, count_strategy: str = "exact") -> PatentList:
     """
     Search for patents based on a query string.
 
@@ -153,17 +209,22 @@ def search_patents(query: str, first: int = 0, last: int = 99, ops_search: bool
         first (int): The index of the first patent to retrieve.
         last (int): The index of the last patent to retrieve.
         ops_search (bool): Also search in the European Patent Office (EPO) database.
+        after (str, optional): The cursor of the last patent of the previous page (database search only).
+        count_strategy (str): How the total count is computed ("exact", "estimated" or "has_more").
 
     Returns:
         PatentList: A list of patents matching the search query.
+
+    Raises:
+        ValueError: If the cursor or the count strategy is invalid.
     """
     logger.debug(f"Searching patents with query: {query}")
 
     if ops_search:
         logger.debug("Searching patents in the OPS database.")
-        # Call the OPS service to search patents
-        patents_data = ops_service.get_patents(
-            ops_api_url, ops_consumer_key, ops_consumer_secret_key, query, first+1, last)
+        # Call the OPS service to search patents (blocking HTTP calls run in a worker thread)
+        patents_data = await run_in_threadpool(
+            ops_service.get_patents, ops_client, query, first+1, last)
 
         if patents_data:
             return patents_data
@@ -177,7 +238,7 @@ def search_patents(query: str, first: int = 0, last: int = 99, ops_search: bool
     print(f"Parsed arguments: {args}")
 
     # Call the repository function to search patents
-    patents_data = patent_repository.search_patents(
+    patents_data = await async_patent_repository.search_patents(
         text=args.get("text"),
         patent_number=args.get("patent_number"),
         publication_date=args.get("publication_date"),
@@ -185,17 +246,22 @@ def search_patents(query: str, first: int = 0, last: int = 99, ops_search: bool
         applicant=args.get("applicant"),
         sdgs=args.get("sdgs"),
         first=first,
-        last=last
+        last=last,
+        after=after,
+        count_strategy=count_strategy
     )
 
     if patents_data:
         patents = [Patent(**patent) for patent in patents_data["patents"]]
         return PatentList(
             total_count=patents_data["total_count"],
+            total_count_exact=patents_data["total_count_exact"],
+            has_more=patents_data["has_more"],
             total_results=patents_data["total_results"],
             first=patents_data["first"],
             last=patents_data["last"],
-            patents=patents
+            patents=patents,
+            next_cursor=patents_data["next_cursor"]
         )
 
     logger.warning("No patents found for the search query.")
@@ -266,6 +332,42 @@ def parse_cql_to_args(cql_query: str) -> dict:
     return args
 
 
+def generate_citations(model_citation: CitationPatent, patent_text: str, sdgs: list[str], reason: str, on_done: Callable[[int, tuple], None] = None, token_callback: Callable[[str], Callable[[str], None]] = None, refresh: bool = False) -> list[tuple]:
+    """
+    Generate the citations of the SDGs of a patent concurrently.
+
+    Args:
+        model_citation (CitationPatent): The citation model.
+        patent_text (str): The text of the patent.
+        sdgs (list[str]): The SDGs of the patent.
+        reason (str): The reason of the classification.
+        on_done (Callable[[int, tuple], None], optional): Called with the index of the SDG and its
+            citation as soon as it is generated.
+        token_callback (Callable[[str], Callable[[str], None]], optional): Gives the `on_token`
+            callback of the citation of an SDG.
+        refresh (bool, optional): Ask the model again even if the citations are in the inference cache.
+
+    Returns:
+        list[tuple]: The (summary, citations and explanations) of each SDG, in the order of `sdgs`.
+
+    Raises:
+        Exception: If the generation of a citation fails.
+    """
+    futures = {citation_executor.submit(
+        model_citation.citation, patent_text, sdg, reason,
+        on_token=token_callback(sdg) if token_callback else None, refresh=refresh): index
+        for index, sdg in enumerate(sdgs)}
+
+    citations = [None] * len(sdgs)
+    for future in as_completed(futures):
+        index = futures[future]
+        citations[index] = future.result()
+        if on_done is not None:
+            on_done(index, citations[index])
+
+    return citations
+
+
 def analyze_patent_pdf(pdf_file: UploadFile) -> list[SDGSummary]:
     """
     Analyze a patent PDF file and return the analysis results.
@@ -288,6 +390,19 @@ def analyze_patent_pdf(pdf_file: UploadFile) -> list[SDGSummary]:
         logger.error("Failed to read PDF file bytes.")
         return []
 
+    return analyze_patent_pdf_bytes(pdf_bytes)
+
+
+def analyze_patent_pdf_bytes(pdf_bytes: bytes) -> list[SDGSummary]:
+    """
+    Analyze the content of a patent PDF file and return the analysis results.
+
+    Args:
+        pdf_bytes (bytes): The content of the PDF file.
+
+    Returns:
+        list[SDGSummary]: A list of SDG summaries extracted from the patent PDF.
+    """
     # Extract text from the PDF
     text = extract_text_from_pdf(pdf_bytes)
     if not text:
@@ -304,14 +419,13 @@ def analyze_patent_pdf(pdf_file: UploadFile) -> list[SDGSummary]:
     logger.debug(f"Filtered text: {filtered_text[:500]}...")
 
     # Call the repository function to analyze the patent PDF
-    classifier = ClassifyPatent(ai_client, ai_model, "sdg_label_prompt")
-    model_citation = CitationPatent(ai_client, ai_model)
+    classifier = model_registry.get_classifier()
+    model_citation = model_registry.get_citation_model()
     sdgs, reason = classifier.analyze_patent(filtered_text)
 
     sdg_summary = []
-    for sdg in sdgs:
-        summary_content, formatted_citations_explanations = model_citation.citation(
-            filtered_text, sdg, reason)
+    citations = generate_citations(model_citation, filtered_text, sdgs, reason)
+    for sdg, (summary_content, formatted_citations_explanations) in zip(sdgs, citations):
         sdg_summary.append(
             {
                 "patent_number": None,
@@ -410,60 +524,152 @@ def filter(text):
     return filtered_lines
 
 
-def analyze_patent_by_number(patent_number: str) -> list[SDGSummary]:
+def build_patent_text(patent: FullPatent, max_words: int = analysis_max_words, select_paragraphs: bool = analysis_select_paragraphs) -> str:
+    """
+    Build the text of a patent sent to the language model: its abstract and
+    numbered description paragraphs, truncated to `max_words` words.
+
+    When `select_paragraphs` is set, a single abstract is kept (english if any,
+    the others being translations) and the description paragraphs closest to
+    the SDG targets are selected within the remaining budget, see `ParagraphSelector`.
+    Otherwise the three abstracts are followed by the first paragraphs, which
+    with the default budget of 3000 words is the text analyzed before the
+    selection was introduced.
+
+    Args:
+        patent (FullPatent): The patent with its description.
+        max_words (int, optional): The maximum number of words. Defaults to `analysis.max_words`.
+        select_paragraphs (bool, optional): Select the paragraphs closest to the SDGs.
+            Defaults to `analysis.select_paragraphs`.
+
+    Returns:
+        str: The text to analyze.
+    """
+    paragraphs = [f"{desc.description_number}: {desc.description_text}"
+                  for desc in patent.description]
+
+    if select_paragraphs:
+        abstract = patent.en_abstract or patent.fr_abstract or patent.de_abstract
+        abstracts = [abstract] if abstract else []
+        budget = max_words - sum(len(abstract.split())
+                                 for abstract in abstracts)
+        paragraphs = [paragraphs[index]
+                      for index in paragraph_selector.select(paragraphs, budget)]
+    else:
+        abstracts = [abstract for abstract in (patent.fr_abstract, patent.en_abstract, patent.de_abstract)
+                     if abstract]
+
+    patent_text = "\n".join(abstracts + paragraphs)
+    return " ".join(patent_text.split()[:max_words])
+
+
+def build_sdg_summary(patent_number: str, sdg: str, citation: tuple, classifier: ClassifyPatent) -> dict:
+    """
+    Build the SDG summary of a citation, with the provenance of the analysis.
+
+    Args:
+        patent_number (str): The patent number.
+        sdg (str): The SDG of the citation.
+        citation (tuple): The summary and the formatted citations, see `CitationPatent.citation`.
+        classifier (ClassifyPatent): The classification model of the analysis.
+
+    Returns:
+        dict: The SDG summary.
+    """
+    summary_content, formatted_citations_explanations = citation
+    return {
+        "patent_number": patent_number,
+        "sdg": sdg,
+        "sdg_reason": summary_content,
+        "sdg_details": formatted_citations_explanations,
+        "model_name": classifier.model_name,
+        "prompt_version": ANALYSIS_PROMPT_VERSION.format(prompt_name=classifier.prompt_name)
+    }
+
+
+def analyze_patent_by_number(patent_number: str, on_event: Callable[[str, dict], None] = None, stream_tokens: bool = False, force: bool = False) -> list[SDGSummary]:
     """
     Analyze a patent by its number and return the analysis results.
 
+    The stored SDG summaries of an analyzed patent are returned without running
+    the model, unless `force` is set: the patent is then analyzed again, without
+    reading the inference cache, and its summaries replaced once all of them
+    are generated.
+
     Args:
         patent_number (str): The patent number to analyze.
+        on_event (Callable[[str, dict], None], optional): Called with the progress of the analysis:
+            "text_fetched", "sdgs_classified", "citation_done" for each SDG and, if
+            `stream_tokens` is set, "token" for each chunk generated by the model.
+        stream_tokens (bool, optional): Stream the responses of the model to `on_event`.
+        force (bool, optional): Analyze the patent again even if it has stored SDG summaries.
 
     Returns:
         list[SDGSummary]: A list of SDG summaries extracted from the patent.
     """
     logger.debug(f"Analyzing patent by number: {patent_number}")
-    patent_text = ""
-    patent = get_full_patent_by_number(patent_number)
+
+    def emit(event: str, data: dict) -> None:
+        if on_event is not None:
+            on_event(event, data)
+
+    if not force:
+        stored_summaries = sdg_summary_repository.get_sdg_summary_by_patent_number(
+            patent_number)
+        if stored_summaries:
+            logger.info(
+                f"Patent {patent_number} already analyzed, returning the stored SDG summaries.")
+            emit("sdgs_classified", {"sdgs": [summary["sdg"] for summary in stored_summaries],
+                                     "reason": None, "source": "database"})
+            for summary in stored_summaries:
+                emit("citation_done", summary)
+            return [SDGSummary(**summary) for summary in stored_summaries]
+
+    def token_callback(step: str, sdg: str = None) -> Callable[[str], None]:
+        if on_event is None or not stream_tokens:
+            return None
+        return lambda token: on_event("token", {"step": step, "sdg": sdg, "text": token})
+
+    source = "database"
+    # Only the abstracts and the description are analyzed
+    patent_data = patent_repository.get_full_patent_by_number(
+        patent_number, fields=["description"])
+    patent = FullPatent(**patent_data) if patent_data else None
 
     # If the patent is not found in our database, dowload it from OPS API
     if not patent:
         logger.info(
             f"Patent {patent_number} not found in the database, downloading from OPS API.")
-        patent = ops_service.get_full_patent(
-            ops_api_url, ops_consumer_key, ops_consumer_secret_key, patent_number)
+        source = "ops"
+        patent = ops_service.get_full_patent(ops_client, patent_number)
         if not patent:
             logger.error(f"Failed to download patent {patent_number}.")
             return []
         patent_repository.create_patent(patent.model_dump())
 
-    if patent.fr_abstract:
-        patent_text += f"{patent.fr_abstract}\n"
-    if patent.en_abstract:
-        patent_text += f"{patent.en_abstract}\n"
-    if patent.de_abstract:
-        patent_text += f"{patent.de_abstract}\n"
+    patent_text = build_patent_text(patent)
+    emit("text_fetched", {"patent_number": patent_number, "source": source,
+                          "words": len(patent_text.split())})
 
-    for desc in patent.description:
-        patent_text += f"{desc.description_number}: {desc.description_text}\n"
+    # Call the repository function to analyze the patent PDF
+    classifier = model_registry.get_classifier()
+    model_citation = model_registry.get_citation_model()
+    sdgs, reason = classifier.analyze_patent(
+        patent_text, on_token=token_callback("classification"), refresh=force)
+    emit("sdgs_classified", {"sdgs": sdgs, "reason": reason})
 
-    patent_text = " ".join(patent_text.split()[:3000])
+    def report_citation(index: int, citation: tuple) -> None:
+        # Report each citation as soon as it is generated
+        emit("citation_done", build_sdg_summary(
+            patent_number, sdgs[index], citation, classifier))
 
-    # Call the repository function to analyze the patent PDF
-    classifier = ClassifyPatent(ai_client, ai_model, "sdg_label_prompt")
-    model_citation = CitationPatent(ai_client, ai_model)
-    sdgs, reason = classifier.analyze_patent(patent_text)
+    citations = generate_citations(model_citation, patent_text, sdgs, reason, on_done=report_citation,
+                                   token_callback=lambda sdg: token_callback("citation", sdg), refresh=force)
+    sdg_summary = [build_sdg_summary(patent_number, sdg, citation, classifier)
+                   for sdg, citation in zip(sdgs, citations)]
 
-    sdg_summary = []
-    for sdg in sdgs:
-        summary_content, formatted_citations_explanations = model_citation.citation(
-            patent_text, sdg, reason)
-        sdg_summary_detail = {
-            "patent_number": patent_number,
-            "sdg": sdg,
-            "sdg_reason": summary_content,
-            "sdg_details": formatted_citations_explanations
-        }
-        sdg_summary.append(sdg_summary_detail)
-        sdg_summary_repository.create_sdg_summary(sdg_summary_detail)
+    # Store the whole analysis at once, replacing the previous one of a forced analysis
+    sdg_summary_repository.replace_sdg_summaries(patent_number, sdg_summary)
 
     if sdg_summary:
         return [SDGSummary(**summary) for summary in sdg_summary]
@@ -472,7 +678,7 @@ def analyze_patent_by_number(patent_number: str) -> list[SDGSummary]:
     return []
 
 
-def get_stats(sdgs: list[int]) -> Stats:
+async def get_stats(sdgs: list[int]) -> Stats:
     """
     Get statistics for patents related to specific SDGs.
 
@@ -485,7 +691,7 @@ def get_stats(sdgs: list[int]) -> Stats:
     logger.debug(f"Getting patent stats for SDGs: {sdgs}")
 
     # Call the repository function to get patent stats
-    stats = sdg_summary_repository.get_stats(sdgs)
+    stats = await async_sdg_summary_repository.get_stats(sdgs)
 
     if not stats:
         logger.warning("No patent stats found for the given SDGs.")
@@ -497,7 +703,14 @@ def get_stats(sdgs: list[int]) -> Stats:
 if __name__ == "__main__":
     from pprint import pprint
 
+    import asyncio
+    from api.config.async_db_config import open_async_db_pool
+
+    async def test_search_patents(query: str) -> PatentList:
+        await open_async_db_pool()
+        return await search_patents(query)
+
     # Test search_patents function
     test_query = "text='mobile device with user activated'"
-    result = search_patents(test_query)
+    result = asyncio.run(test_search_patents(test_query))
     pprint(result.model_dump())